@@ -1,31 +1,133 @@
 """
 Main Flask app for the GroupProject.
-Handles app setup, blueprint registration, analytics, and student profile.
+Application factory: configuration, blueprint registration, request hooks and the init command.
 
-This module initializes the Flask application, configures session management, sets up user authentication,
-registers blueprints for modular routing, and manages database connections for each request.
+create_app() builds a configured application without touching the database, so it is safe to
+call in a pre-fork server's master process (see wsgi.py and gunicorn.conf.py). Creating or
+upgrading the schema and the default admin is a separate one-time step:
+
+    flask --app app init-db      Create/upgrade the database and ensure an admin exists
+    python app.py                Development server (runs init-db first if the schema is outdated)
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, send_file
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, User, Student, Class, Attendance
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import Flask, current_app, redirect, url_for
+from flask_login import LoginManager, current_user
+from models import db, User, configure_database
+from models import DEFAULT_DATABASE, DEFAULT_PRAGMAS, DEFAULT_MAX_CONNECTIONS, DEFAULT_STALE_TIMEOUT
 from routes.auth import auth_bp
 from routes.admin import admin_bp
 from routes.teacher import teacher_bp
 from routes.analytics import analytics_bp
 from routes.student import student_bp
-import datetime
+from routes.jobs import jobs_bp
+from routes.api import api_bp
+from migrations import LATEST_VERSION, migrate, schema_version
+from services.user_cache import user_cache, DEFAULT_USER_CACHE_SIZE, DEFAULT_USER_CACHE_TTL
+from services.view_cache import view_cache, DEFAULT_VIEW_CACHE_SIZE, DEFAULT_VIEW_CACHE_MAX_BYTES, DEFAULT_VIEW_CACHE_TTL
+from services import jobs, metrics, passwords, rate_limit, schedules, stats
+import click
+import logging
+
+DEFAULT_SECRET_KEY = 'your_secret_key_here'  # Set SECRET_KEY in CLASSESAPP_SETTINGS in production
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'  # Redirect to login page if not authenticated
 
 # =============================
-# Flask App and Login Manager
+# Application Factory
 # =============================
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
 
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'  # Secret key for session management (should be set securely in production)
+    Settings come from the defaults below, then the Python file named by the
+    CLASSESAPP_SETTINGS environment variable, then the config argument.
+    No database connection is opened here.
+
+    Args:
+        config (dict | None): Settings overriding the defaults and the settings file.
+    Returns:
+        Flask: The application.
+    """
+    app = Flask(__name__)
+    # Defaults live in models.py and services/;
+    # override them in a config file named by CLASSESAPP_SETTINGS
+    app.config.from_mapping(
+        SECRET_KEY=DEFAULT_SECRET_KEY,
+        DATABASE=DEFAULT_DATABASE,
+        DATABASE_PRAGMAS=DEFAULT_PRAGMAS,
+        DATABASE_MAX_CONNECTIONS=DEFAULT_MAX_CONNECTIONS,
+        DATABASE_STALE_TIMEOUT=DEFAULT_STALE_TIMEOUT,
+        USER_CACHE_SIZE=DEFAULT_USER_CACHE_SIZE,
+        USER_CACHE_TTL=DEFAULT_USER_CACHE_TTL,
+        VIEW_CACHE_SIZE=DEFAULT_VIEW_CACHE_SIZE,
+        VIEW_CACHE_MAX_BYTES=DEFAULT_VIEW_CACHE_MAX_BYTES,
+        VIEW_CACHE_TTL=DEFAULT_VIEW_CACHE_TTL,
+        METRICS_N_PLUS_ONE_THRESHOLD=metrics.DEFAULT_N_PLUS_ONE_THRESHOLD,
+        JOBS_DIR=jobs.DEFAULT_JOBS_DIR,
+        JOB_WORKERS=jobs.DEFAULT_JOB_WORKERS,
+        JOB_STALE_SECONDS=jobs.DEFAULT_JOB_STALE_SECONDS,
+        PASSWORD_HASH_METHOD=passwords.DEFAULT_PASSWORD_HASH_METHOD,
+        PASSWORD_SALT_LENGTH=passwords.DEFAULT_PASSWORD_SALT_LENGTH,
+        PASSWORD_HASH_WORKERS=passwords.DEFAULT_PASSWORD_HASH_WORKERS,
+        PASSWORD_HASH_QUEUE=passwords.DEFAULT_PASSWORD_HASH_QUEUE,
+        PASSWORD_HASH_WAIT=passwords.DEFAULT_PASSWORD_HASH_WAIT,
+        LOGIN_IP_BURST=rate_limit.DEFAULT_LOGIN_IP_BURST,
+        LOGIN_IP_RATE=rate_limit.DEFAULT_LOGIN_IP_RATE,
+        LOGIN_USER_BURST=rate_limit.DEFAULT_LOGIN_USER_BURST,
+        LOGIN_USER_RATE=rate_limit.DEFAULT_LOGIN_USER_RATE,
+        LOGIN_FAILURE_BURST=rate_limit.DEFAULT_LOGIN_FAILURE_BURST,
+        LOGIN_FAILURE_RATE=rate_limit.DEFAULT_LOGIN_FAILURE_RATE,
+        RATE_LIMIT_KEYS=rate_limit.DEFAULT_RATE_LIMIT_KEYS,
+        ANALYTICS_ENGINE=stats.DEFAULT_ANALYTICS_ENGINE,
+        SCHEDULE_HORIZON_DAYS=schedules.DEFAULT_SCHEDULE_HORIZON_DAYS,
+        CLASS_MINUTES=schedules.DEFAULT_CLASS_MINUTES,
+        SCHEDULE_EXTEND_INTERVAL=schedules.DEFAULT_SCHEDULE_EXTEND_INTERVAL,
+    )
+    app.config.from_envvar('CLASSESAPP_SETTINGS', silent=True)
+    if config:
+        app.config.update(config)
 
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'  # Redirect to login page if not authenticated
+    # Database and caches
+    configure_database(app.config['DATABASE'],
+                       pragmas=app.config['DATABASE_PRAGMAS'],
+                       max_connections=app.config['DATABASE_MAX_CONNECTIONS'],
+                       stale_timeout=app.config['DATABASE_STALE_TIMEOUT'])
+    user_cache.configure(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+    view_cache.configure(maxsize=app.config['VIEW_CACHE_SIZE'], max_bytes=app.config['VIEW_CACHE_MAX_BYTES'],
+                         ttl=app.config['VIEW_CACHE_TTL'])
+    metrics.init_app(app)    # Query/template timing, Server-Timing headers and /admin/metrics
+    jobs.init_app(app)       # Background export workers and result directory
+    passwords.init_app(app)  # Password hash parameters and the bounded hashing pool
+    stats.init_app(app)      # Analytics engine: SQL counters or the NumPy columnar snapshot
+    schedules.init_app(app)  # Class series horizon, class length for double-booking, series extension hook
+    rate_limit.login_ip_limiter.configure(app.config['LOGIN_IP_BURST'], app.config['LOGIN_IP_RATE'],
+                                          app.config['RATE_LIMIT_KEYS'])
+    rate_limit.login_user_limiter.configure(app.config['LOGIN_USER_BURST'], app.config['LOGIN_USER_RATE'],
+                                            app.config['RATE_LIMIT_KEYS'])
+    rate_limit.login_failure_limiter.configure(app.config['LOGIN_FAILURE_BURST'], app.config['LOGIN_FAILURE_RATE'],
+                                               app.config['RATE_LIMIT_KEYS'])
+    login_manager.init_app(app)
+
+    # Request hooks
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+
+    # Import and register all blueprints for modular routing
+    app.register_blueprint(auth_bp)      # Authentication routes (login, logout, register)
+    app.register_blueprint(admin_bp)     # Admin dashboard and management routes
+    app.register_blueprint(teacher_bp)   # Teacher dashboard and management routes
+    app.register_blueprint(analytics_bp) # Analytics and reporting routes
+    app.register_blueprint(student_bp)   # Student profile and dashboard routes
+    app.register_blueprint(jobs_bp)      # Background export jobs
+    app.register_blueprint(api_bp)       # JSON API (/api/v1)
+    app.add_url_rule('/', 'index', index)
+
+    app.cli.add_command(init_db_command)
+    return app
 
 # =============================
 # User Loader for Flask-Login
@@ -34,51 +136,54 @@ login_manager.login_view = 'login'  # Redirect to login page if not authenticate
 def load_user(user_id):
     """
     Load a user by user_id for Flask-Login.
+    Served from the in-process user cache; only a cache miss queries the database.
 
     Args:
         user_id (str): The unique identifier for the user (primary key).
     Returns:
-        User | None: The User object if found, else None.
+        UserSnapshot | None: Read-only snapshot of the user if found, else None.
     """
-    return User.get_or_none(User.user_id == user_id)
+    return user_cache.get(user_id)
 
 # =============================
 # Database Connection Handlers
 # =============================
-@app.before_request
 def before_request():
     """
-    Ensure the database is connected before each request.
+    Start the request's metrics and ensure the database is connected.
     This prevents errors from using a closed connection.
+    Connections come from a per-thread pool, so this is cheap after the first request.
     """
+    metrics.start_request()
     if db.is_closed():
         db.connect()
 
-@app.teardown_request
+def after_request(response):
+    """
+    Add the Server-Timing header (database, template and total time) to each response.
+
+    Args:
+        response (Response): The outgoing response.
+    Returns:
+        Response: The response with timing information.
+    """
+    return metrics.add_server_timing(response)
+
 def teardown_request(exception):
     """
-    Close the database connection after each request to free resources.
+    Return the database connection to the pool after each request,
+    then log and aggregate the request's metrics.
 
     Args:
         exception (Exception | None): Exception raised during request, if any.
     """
     if not db.is_closed():
         db.close()
-
-# =============================
-# Register Blueprints
-# =============================
-# Import and register all blueprints for modular routing
-app.register_blueprint(auth_bp)      # Authentication routes (login, logout, register)
-app.register_blueprint(admin_bp)     # Admin dashboard and management routes
-app.register_blueprint(teacher_bp)   # Teacher dashboard and management routes
-app.register_blueprint(analytics_bp) # Analytics and reporting routes
-app.register_blueprint(student_bp)   # Student profile and dashboard routes
+    metrics.finish_request(current_app._get_current_object(), exception)
 
 # =============================
 # Home Route
 # =============================
-@app.route('/')
 def index():
     """
     Redirect to the appropriate dashboard based on user role.
@@ -94,19 +199,56 @@ def index():
     else:
         return redirect(url_for('teacher.teacher_dashboard'))
 
+# =============================
+# Database Initialization
+# =============================
+def init_database(admin_username=DEFAULT_ADMIN_USERNAME, admin_password=DEFAULT_ADMIN_PASSWORD):
+    """
+    Create or upgrade the schema and make sure at least one admin exists.
+    Run once per deployment (and after upgrades), before starting the workers.
+
+    Args:
+        admin_username (str): Username for the default admin, if none exists.
+        admin_password (str): Password for the default admin, if none exists.
+    Returns:
+        tuple[list[int], bool]: Migration versions applied, and whether an admin was created.
+    """
+    with db.connection_context():
+        applied = migrate()  # Create or upgrade the schema (see migrations.py)
+        if User.select().where(User.is_admin == True).exists():
+            return applied, False
+        User.create(username=admin_username, password=passwords.hash_password(admin_password), is_admin=True)
+        return applied, True
+
+@click.command('init-db')
+@click.option('--admin-username', default=DEFAULT_ADMIN_USERNAME, show_default=True,
+              help='Username of the admin created if none exists.')
+@click.option('--admin-password', default=DEFAULT_ADMIN_PASSWORD, show_default=True,
+              help='Password of the admin created if none exists.')
+def init_db_command(admin_username, admin_password):
+    """
+    Create or upgrade the database and ensure an admin user exists.
+    """
+    applied, created = init_database(admin_username, admin_password)
+    click.echo(f'Schema version {LATEST_VERSION}' + (f' (applied {applied})' if applied else ' (up to date)'))
+    if created:
+        click.echo(f'Default admin created: username={admin_username}, password={admin_password}')
 
 # =============================
-# App Entry Point
+# Development Server
 # =============================
 if __name__ == '__main__':
     """
-    Main entry point for running the Flask application.
-    Ensures database tables exist and at least one admin user is present before starting the server.
+    Development server (single process, debug mode); use wsgi.py in production.
+    Runs the init step first if the database is missing or outdated.
     """
-    db.connect()
-    db.create_tables([User, Student, Class, Attendance], safe=True)
-    # Ensure at least one admin exists; create a default admin if not present
-    if not User.select().where(User.is_admin == True).exists():
-        User.create(username='admin', password=generate_password_hash('admin123'), is_admin=True)
-        print('Default admin created: username=admin, password=admin123')
+    logging.basicConfig(level=logging.INFO)  # Show the per-request metrics log lines
+    app = create_app()
+    with db.connection_context():
+        outdated = schema_version() < LATEST_VERSION
+    if outdated:
+        applied, created = init_database()
+        print(f'Database initialized (applied {applied})')
+        if created:
+            print(f'Default admin created: username={DEFAULT_ADMIN_USERNAME}, password={DEFAULT_ADMIN_PASSWORD}')
     app.run(debug=True)
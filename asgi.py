@@ -0,0 +1,19 @@
+"""
+ASGI entry point for the GroupProject Flask app.
+
+Wraps the WSGI application for ASGI servers; requests still run synchronously on the
+adapter's thread pool, so this is for deployments that standardize on an ASGI server:
+
+    uvicorn asgi:app --workers 4
+
+Requires the optional asgiref package (pip install asgiref).
+"""
+
+from wsgi import app as wsgi_app
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:  # Optional dependency
+    raise ImportError('asgi.py needs the asgiref package: pip install asgiref') from e
+
+app = WsgiToAsgi(wsgi_app)
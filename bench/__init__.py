@@ -0,0 +1,9 @@
+"""
+Benchmark suite for the GroupProject Flask app.
+
+    datagen.py  Seeded synthetic data generator (fills a fresh SQLite database)
+    run.py      Drives the real routes through app.test_client() and writes JSON results
+
+Usage:
+    python -m bench.run --sizes small,medium --output bench_results.json
+"""
@@ -0,0 +1,113 @@
+"""
+Synthetic data generator for the benchmark suite.
+Fills a fresh SQLite database with teachers, students, classes, rosters and attendance.
+
+Generation is seeded, so the same size and seed always produce the same database.
+
+Usage:
+    python -m bench.datagen PATH [--size small|medium|large] [--seed N]
+"""
+
+from peewee import chunked
+from werkzeug.security import generate_password_hash
+from models import db, configure_database, User, Student, Class, Attendance, SQLITE_MAX_VARIABLES
+from migrations import migrate
+from services.counters import rebuild_counters
+from services.rollups import rebuild_rollups
+from services.enrollment import backfill_enrollments
+import argparse
+import datetime
+import os
+import random
+
+# Password shared by every generated teacher (and the admin)
+PASSWORD = 'bench'
+
+# Dataset sizes: number of teachers, students and classes, and share of students marked per class
+SIZES = {
+    'small': {'teachers': 10, 'students': 200, 'classes': 100, 'roster': 0.2},
+    'medium': {'teachers': 50, 'students': 2000, 'classes': 1000, 'roster': 0.05},
+    'large': {'teachers': 200, 'students': 10000, 'classes': 2000, 'roster': 0.03},
+}
+
+# =============================
+# Generator
+# =============================
+def _insert(model, rows):
+    """
+    Insert rows in chunks that fit SQLite's bound-variable limit.
+
+    Args:
+        model (Model): Target model.
+        rows (list[dict]): Rows to insert (all with the same keys).
+    """
+    if not rows:
+        return
+    for batch in chunked(rows, max(1, SQLITE_MAX_VARIABLES // len(rows[0]))):
+        model.insert_many(batch).execute()
+
+def generate(path, size='small', seed=0, now=None):
+    """
+    Create a new database at path and fill it with synthetic data.
+
+    Half of the classes are in the past and half in the future; only past classes have
+    attendance, with about 80% of each marked roster present.
+
+    Args:
+        path (str): Database file to create (an existing file is replaced).
+        size (str | dict): Name from SIZES or a dict with the same keys.
+        seed (int): Random seed.
+        now (datetime.datetime | None): Reference time for past/future classes (defaults to now).
+    Returns:
+        dict: Number of rows created per table.
+    """
+    spec = SIZES[size] if isinstance(size, str) else size
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now().replace(second=0, microsecond=0)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    configure_database(path)
+    db.connect()
+    migrate()
+    password = generate_password_hash(PASSWORD)
+    with db.atomic():
+        User.create(username='admin', password=password, is_admin=True)
+        _insert(User, [{'username': f'teacher{i}', 'password': password, 'is_admin': False}
+                       for i in range(spec['teachers'])])
+        teacher_ids = [u for (u,) in User.select(User.user_id).where(User.is_admin == False).tuples()]
+        _insert(Student, [{'name': f'Student {i}', 'email': f'student{i}@example.com'}
+                          for i in range(spec['students'])])
+        student_ids = [s for (s,) in Student.select(Student.student_id).tuples()]
+        half = spec['classes'] // 2
+        _insert(Class, [{'user': rng.choice(teacher_ids),
+                         'title': f'Course {rng.randrange(40)}',
+                         'datetime': now + datetime.timedelta(hours=(i - half) * 6 + 1)}
+                        for i in range(spec['classes'])])
+        past_ids = [c for (c,) in Class.select(Class.class_id).where(Class.datetime < now).tuples()]
+        roster_size = max(1, int(len(student_ids) * spec['roster']))
+        attendance = []
+        for class_id in past_ids:
+            for student_id in rng.sample(student_ids, roster_size):
+                attendance.append({'class_ref': class_id, 'student': student_id,
+                                   'attend': rng.random() < 0.8})
+        _insert(Attendance, attendance)
+        # Rosters: students marked in a class, and their series' rosters for future classes
+        enrollments = backfill_enrollments()
+    rebuild_counters()
+    rebuild_rollups()
+    counts = {'teachers': len(teacher_ids), 'students': len(student_ids),
+              'classes': spec['classes'], 'attendance': len(attendance), 'enrollments': enrollments}
+    db.close()
+    return counts
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic classesApp database.')
+    parser.add_argument('path', help='Database file to create')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.path, args.size, args.seed))
@@ -0,0 +1,345 @@
+"""
+Load test for the GroupProject Flask app under a production server.
+Starts gunicorn (gunicorn.conf.py, wsgi:app) against a generated database with an increasing
+number of worker processes and drives it with concurrent HTTP clients.
+
+For every worker count this reports throughput (requests per second) and latency percentiles,
+and the speedup over the first run, showing how throughput scales across CPU cores.
+The client processes share the machine with the server, so leave spare cores for them
+(or point --url at a server running elsewhere).
+
+Usage:
+    python -m bench.load [--workers 1,2,4] [--threads 4] [--clients 16] [--duration 10] [--size medium]
+    python -m bench.load --url http://host:8000 --clients 32    # load an already running server
+"""
+
+from bench.datagen import PASSWORD, SIZES, generate
+from bench.run import _git_commit, _percentile
+from models import db, Student
+import argparse
+import datetime
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+# Requests issued round-robin by every client: read-heavy pages and API calls
+DEFAULT_PATHS = ('/analytics', '/admin_dashboard', '/api/v1/classes', '/api/v1/stats/students',
+                 '/student/{student_id}')
+STARTUP_TIMEOUT = 30  # seconds to wait for the server to accept connections
+
+# =============================
+# Client
+# =============================
+def _login(url, username, password):
+    """
+    Log in and return the session cookie.
+
+    Args:
+        url (str): Server base URL.
+        username (str): Username.
+        password (str): Password.
+    Returns:
+        str: Cookie header value.
+    Raises:
+        RuntimeError: If the login did not set a session cookie.
+    """
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    body = urllib.parse.urlencode({'username': username, 'password': password})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    cookies = [c.split(';', 1)[0] for c in response.headers.get_all('Set-Cookie') or []]
+    session = [c for c in cookies if c.startswith('session=')]
+    if not session:
+        raise RuntimeError(f'login as {username} failed (HTTP {response.status})')
+    return '; '.join(session)
+
+def _client(url, cookie, paths, deadline, results):
+    """
+    Issue requests over one keep-alive connection until the deadline (runs in its own process).
+
+    Args:
+        url (str): Server base URL.
+        cookie (str): Session cookie.
+        paths (list[str]): Paths requested round-robin.
+        deadline (float): time.time() at which to stop.
+        results (Queue): Receives (latencies in ms, error count).
+    """
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    latencies, errors, i = [], 0, 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Cookie': cookie})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    results.put((latencies, errors))
+
+def drive(url, paths, clients, duration, username='admin', password=PASSWORD):
+    """
+    Load a running server with concurrent clients for a fixed time.
+
+    Args:
+        url (str): Server base URL.
+        paths (list[str]): Paths requested round-robin by every client.
+        clients (int): Concurrent client processes.
+        duration (float): Seconds to run.
+        username (str): User the clients log in as.
+        password (str): That user's password.
+    Returns:
+        dict: Requests, errors, requests per second and latency percentiles in ms.
+    """
+    cookie = _login(url, username, password)
+    results = multiprocessing.Queue()
+    start = time.time()
+    deadline = start + duration
+    procs = [multiprocessing.Process(target=_client, args=(url, cookie, paths, deadline, results))
+             for _ in range(clients)]
+    for p in procs:
+        p.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for p in procs:
+        p.join()
+    elapsed = time.time() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'latency_ms': {
+            'p50': _percentile(latencies, 50) if latencies else None,
+            'p90': _percentile(latencies, 90) if latencies else None,
+            'p99': _percentile(latencies, 99) if latencies else None,
+        },
+    }
+
+# =============================
+# Server
+# =============================
+def _free_port():
+    """
+    Pick an unused local TCP port.
+
+    Returns:
+        int: Port number.
+    """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _wait_until_ready(proc, port):
+    """
+    Wait until the server accepts connections.
+
+    Args:
+        proc (Popen): Server process.
+        port (int): Port it listens on.
+    Raises:
+        RuntimeError: If the server exited or did not start in time.
+    """
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {proc.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('gunicorn did not start in time')
+
+def start_server(settings_path, workers, threads, port):
+    """
+    Start gunicorn with the project's configuration.
+
+    Args:
+        settings_path (str): Flask settings file (CLASSESAPP_SETTINGS).
+        workers (int): Worker processes.
+        threads (int): Threads per worker.
+        port (int): Port to listen on.
+    Returns:
+        Popen: The running server.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, CLASSESAPP_SETTINGS=settings_path, CLASSESAPP_BIND=f'127.0.0.1:{port}',
+               WEB_CONCURRENCY=str(workers), CLASSESAPP_THREADS=str(threads))
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                             '--access-logfile', '/dev/null', '--log-level', 'warning', 'wsgi:app'],
+                            cwd=root, env=env)
+    try:
+        _wait_until_ready(proc, port)
+    except RuntimeError:
+        stop_server(proc)
+        raise
+    return proc
+
+def stop_server(proc):
+    """
+    Shut a server down gracefully.
+
+    Args:
+        proc (Popen): Server process.
+    """
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+def _write_settings(workdir, database):
+    """
+    Write a Flask settings file for the load test.
+    Login rate limits are raised since every client logs in from the same address.
+
+    Args:
+        workdir (str): Directory for the file and export results.
+        database (str): Database file.
+    Returns:
+        str: Path of the settings file.
+    """
+    path = os.path.join(workdir, 'settings.py')
+    with open(path, 'w') as f:
+        f.write(f'DATABASE = {database!r}\n'
+                f"JOBS_DIR = {os.path.join(workdir, 'exports')!r}\n"
+                'LOGIN_IP_BURST = 1000000\n'
+                'LOGIN_USER_BURST = 1000000\n')
+    return path
+
+def _paths(database):
+    """
+    Load-test paths with placeholders filled from the database.
+
+    Args:
+        database (str): Database file.
+    Returns:
+        list[str]: Paths.
+    """
+    db.connect(reuse_if_open=True)
+    student_id = Student.select(Student.student_id).order_by(Student.student_id).limit(1).scalar()
+    db.close()
+    return [p.format(student_id=student_id) for p in DEFAULT_PATHS]
+
+# =============================
+# Runner
+# =============================
+def run(worker_counts, threads, clients, duration, size='medium', seed=0):
+    """
+    Load the app at each worker count against one generated database.
+
+    Args:
+        worker_counts (list[int]): Worker processes per run.
+        threads (int): Threads per worker.
+        clients (int): Concurrent client processes (the same for every run).
+        duration (float): Seconds per run.
+        size (str): Dataset size name from bench.datagen.SIZES.
+        seed (int): Data generator seed.
+    Returns:
+        dict: JSON-serializable report.
+    """
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'size': size,
+            'threads': threads,
+            'clients': clients,
+            'duration': duration,
+        },
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='classesapp-load-') as workdir:
+        database = os.path.join(workdir, f'load_{size}.db')
+        report['meta']['rows'] = generate(database, size, seed)
+        settings = _write_settings(workdir, database)
+        paths = _paths(database)
+        report['meta']['paths'] = paths
+        for workers in worker_counts:
+            port = _free_port()
+            proc = start_server(settings, workers, threads, port)
+            try:
+                url = f'http://127.0.0.1:{port}'
+                drive(url, paths, clients, min(2.0, duration))  # warm-up: connections and caches
+                result = drive(url, paths, clients, duration)
+            finally:
+                stop_server(proc)
+            report['runs'].append(dict(result, workers=workers))
+    return report
+
+def print_report(report):
+    """
+    Print a report as a table.
+
+    Args:
+        report (dict): Result of run() (or a single drive() result wrapped in runs).
+    """
+    meta = report['meta']
+    print(f"commit {meta.get('commit')}, {meta.get('cpus')} CPUs, {meta.get('clients')} clients")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    baseline = report['runs'][0]['rps'] if report['runs'] else 0
+    for r in report['runs']:
+        lat = r['latency_ms']
+        speedup = r['rps'] / baseline if baseline else 0.0
+        print(f"{r.get('workers', '-'):>8}{r['rps']:>10.1f}{speedup:>8.2f}x"
+              f"{lat['p50'] or 0:>10.2f}{lat['p90'] or 0:>10.2f}{lat['p99'] or 0:>10.2f}{r['errors']:>8}")
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    cpus = os.cpu_count() or 1
+    default_workers = ','.join(str(n) for n in (1, 2, 4, 8, 16) if n <= max(1, cpus))
+    parser = argparse.ArgumentParser(description='Load-test the classesApp under gunicorn.')
+    parser.add_argument('--workers', default=default_workers, help='Comma-separated worker counts')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run')
+    parser.add_argument('--size', choices=sorted(SIZES), default='medium')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='Load an already running server instead of starting gunicorn')
+    parser.add_argument('--username', default='admin', help='User to log in as with --url')
+    parser.add_argument('--password', default=PASSWORD, help='Password for --username')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+    if args.url:
+        paths = [p for p in DEFAULT_PATHS if '{' not in p]
+        result = drive(args.url.rstrip('/'), paths, args.clients, args.duration, args.username, args.password)
+        report = {'meta': {'commit': _git_commit(), 'cpus': cpus, 'clients': args.clients, 'url': args.url},
+                  'runs': [result]}
+    else:
+        worker_counts = [int(n) for n in args.workers.split(',') if n.strip()]
+        report = run(worker_counts, args.threads, args.clients, args.duration, args.size, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nWrote {args.output}')
@@ -0,0 +1,336 @@
+"""
+Route benchmarks for the GroupProject Flask app.
+Drives the real Flask routes through app.test_client() against generated databases.
+
+For every dataset size and route this reports latency percentiles, the number of SQL
+statements per request and the peak Python memory allocated while handling one request.
+Results are written as JSON so runs from different commits can be compared.
+
+The page cache (services/view_cache.py) is emptied before every measured request, so the
+routes and the analytics engine are measured rather than the cache; the *_cached benchmarks
+measure cache hits separately.
+
+Usage:
+    python -m bench.run [--sizes small,medium] [--iterations 20] [--engine sql|numpy] [--output FILE]
+    python -m bench.run --compare OLD.json NEW.json
+"""
+
+from bench.datagen import PASSWORD, SIZES, generate
+from models import db, User, Student, Class, Attendance
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# =============================
+# Query Counting
+# =============================
+class QueryCounter:
+    """
+    Counts SQL statements executed through the shared database while installed.
+
+    Attributes:
+        count (int): Statements executed since the last reset.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.count = 0
+
+    def __call__(self, sql, seconds):
+        self.count += 1
+
+    def install(self):
+        """
+        Start counting (registers as a database query listener).
+        """
+        self.database.query_listeners.append(self)
+
+    def uninstall(self):
+        """
+        Stop counting.
+        """
+        self.database.query_listeners.remove(self)
+
+# =============================
+# Benchmark Definitions
+# =============================
+def _fixtures():
+    """
+    Pick the rows the benchmarks operate on from the current database.
+
+    Returns:
+        dict: teacher username, one of their past class IDs, all student IDs and a
+        student ID with attendance history.
+    """
+    db.connect(reuse_if_open=True)
+    now = datetime.datetime.now()
+    class_obj = (Class.select(Class, User).join(User)
+                 .where(Class.datetime < now).order_by(Class.datetime.desc()).first())
+    student_id = (Attendance.select(Attendance.student)
+                  .where(Attendance.attend == True).order_by(Attendance.student).limit(1).scalar())
+    student_ids = [s for (s,) in Student.select(Student.student_id).tuples()]
+    db.close()
+    return {'teacher': class_obj.user.username, 'class_id': class_obj.class_id,
+            'student_ids': student_ids, 'student_id': student_id}
+
+def benchmarks(fixtures):
+    """
+    Requests to benchmark.
+
+    Args:
+        fixtures (dict): Result of _fixtures().
+    Returns:
+        list[dict]: name, role ('admin' or 'teacher'), method, path, optional form data (or
+        forms, submitted in turn so every request writes changes) and cached (True to measure
+        page cache hits instead of rendering).
+    """
+    # Complementary attendance sheets: each save flips every mark (an unchanged sheet writes nothing)
+    forms = [{f'present_{s}': 'on' for s in fixtures['student_ids'][start::2]} for start in (0, 1)]
+    return [
+        {'name': 'analytics_admin', 'role': 'admin', 'method': 'GET', 'path': '/analytics'},
+        {'name': 'analytics_teacher', 'role': 'teacher', 'method': 'GET', 'path': '/analytics'},
+        {'name': 'admin_dashboard', 'role': 'admin', 'method': 'GET', 'path': '/admin_dashboard'},
+        {'name': 'analytics_admin_cached', 'role': 'admin', 'method': 'GET', 'path': '/analytics', 'cached': True},
+        {'name': 'admin_dashboard_cached', 'role': 'admin', 'method': 'GET', 'path': '/admin_dashboard',
+         'cached': True},
+        {'name': 'export_csv_admin', 'role': 'admin', 'method': 'GET', 'path': '/admin/export_attendance/csv'},
+        {'name': 'export_csv_teacher', 'role': 'teacher', 'method': 'GET', 'path': '/teacher/export_attendance/csv'},
+        {'name': 'mark_attendance_post', 'role': 'teacher', 'method': 'POST',
+         'path': f"/teacher/attendance/{fixtures['class_id']}", 'forms': forms},
+        {'name': 'student_profile', 'role': 'admin', 'method': 'GET',
+         'path': f"/student/{fixtures['student_id']}"},
+        {'name': 'search_typeahead', 'role': 'admin', 'method': 'GET', 'path': '/admin/search?q=stu'},
+    ]
+
+# =============================
+# Runner
+# =============================
+def _percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of samples.
+
+    Args:
+        samples (list[float]): Measurements.
+        pct (float): Percentile between 0 and 100.
+    Returns:
+        float: The percentile value.
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def _prepare(bench):
+    """
+    Empty the page cache before a measured request, unless the benchmark measures cache hits.
+
+    Args:
+        bench (dict): Benchmark definition.
+    """
+    from services.view_cache import view_cache
+    if not bench.get('cached'):
+        view_cache.clear()
+
+def _request(client, bench):
+    """
+    Issue one benchmark request and read the whole (possibly streamed) body.
+
+    Args:
+        client (FlaskClient): Logged-in test client.
+        bench (dict): Benchmark definition.
+    Returns:
+        Response: The response.
+    Raises:
+        RuntimeError: If the route answered with an error status.
+    """
+    data = bench.get('data')
+    if 'forms' in bench:
+        bench['sent'] = bench.get('sent', 0) + 1
+        data = bench['forms'][bench['sent'] % len(bench['forms'])]
+    response = client.open(bench['path'], method=bench['method'], data=data)
+    response.get_data()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{bench['name']}: HTTP {response.status_code}")
+    return response
+
+def run_size(app, size, iterations, workdir, seed=0):
+    """
+    Generate a dataset and benchmark every route against it.
+
+    Args:
+        app (Flask): The application.
+        size (str): Dataset size name from SIZES.
+        iterations (int): Timed requests per route.
+        workdir (str): Directory for the generated database.
+        seed (int): Data generator seed.
+    Returns:
+        dict: Dataset row counts and per-route results.
+    """
+    from services.columnar import columnar_stats
+    from services.user_cache import user_cache
+    from services.view_cache import view_cache
+    path = os.path.join(workdir, f'bench_{size}.db')
+    counts = generate(path, size, seed)
+    user_cache.clear()
+    view_cache.clear()
+    columnar_stats.clear()
+    fixtures = _fixtures()
+    clients = {}
+    for role, username in (('admin', 'admin'), ('teacher', fixtures['teacher'])):
+        clients[role] = app.test_client()
+        clients[role].post('/login', data={'username': username, 'password': PASSWORD})
+    counter = QueryCounter(db)
+    results = []
+    for bench in benchmarks(fixtures):
+        client = clients[bench['role']]
+        _request(client, bench)  # warm-up (connections, user cache, analytics engine)
+        _prepare(bench)
+        counter.install()
+        try:
+            counter.count = 0
+            _request(client, bench)
+            queries = counter.count
+        finally:
+            counter.uninstall()
+        _prepare(bench)
+        tracemalloc.start()
+        _request(client, bench)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        samples = []
+        for _ in range(iterations):
+            _prepare(bench)
+            start = time.perf_counter()
+            _request(client, bench)
+            samples.append((time.perf_counter() - start) * 1000)
+        results.append({
+            'name': bench['name'],
+            'iterations': iterations,
+            'latency_ms': {
+                'p50': _percentile(samples, 50),
+                'p90': _percentile(samples, 90),
+                'p99': _percentile(samples, 99),
+                'mean': statistics.fmean(samples),
+                'min': min(samples),
+                'max': max(samples),
+            },
+            'queries': queries,
+            'peak_memory_kb': peak / 1024,
+        })
+    return {'size': size, 'rows': counts, 'results': results}
+
+def _git_commit():
+    """
+    Current git commit of the working tree, if available.
+
+    Returns:
+        str | None: Commit hash.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, iterations, seed=0, engine='sql'):
+    """
+    Benchmark every route at each dataset size.
+
+    Args:
+        sizes (list[str]): Dataset size names.
+        iterations (int): Timed requests per route.
+        seed (int): Data generator seed.
+        engine (str): Analytics engine ('sql' or 'numpy').
+    Returns:
+        dict: JSON-serializable report.
+    """
+    from app import create_app
+    from services import stats
+    app = create_app({'ANALYTICS_ENGINE': engine})
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'analytics_engine': stats.analytics_engine().name,
+        },
+        'datasets': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='classesapp-bench-') as workdir:
+        for size in sizes:
+            report['datasets'].append(run_size(app, size, iterations, workdir, seed))
+    return report
+
+def print_report(report):
+    """
+    Print a report as a table.
+
+    Args:
+        report (dict): Result of run().
+    """
+    print(f"commit {report['meta']['commit']}")
+    for dataset in report['datasets']:
+        print(f"\n[{dataset['size']}] {dataset['rows']}")
+        print(f"{'route':<24}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KiB':>11}")
+        for r in dataset['results']:
+            lat = r['latency_ms']
+            print(f"{r['name']:<24}{lat['p50']:>10.2f}{lat['p90']:>10.2f}{lat['p99']:>10.2f}"
+                  f"{r['queries']:>9}{r['peak_memory_kb']:>11.0f}")
+
+def compare(old, new):
+    """
+    Print p50 latency and query-count changes between two reports.
+
+    Args:
+        old (dict): Baseline report.
+        new (dict): Report to compare against the baseline.
+    """
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    baseline = {(d['size'], r['name']): r for d in old['datasets'] for r in d['results']}
+    for dataset in new['datasets']:
+        print(f"\n[{dataset['size']}]")
+        print(f"{'route':<24}{'old p50':>10}{'new p50':>10}{'change':>9}{'queries':>12}")
+        for r in dataset['results']:
+            before = baseline.get((dataset['size'], r['name']))
+            if before is None:
+                continue
+            old_p50, new_p50 = before['latency_ms']['p50'], r['latency_ms']['p50']
+            change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0.0
+            print(f"{r['name']:<24}{old_p50:>10.2f}{new_p50:>10.2f}{change:>+8.0f}%"
+                  f"{before['queries']:>6} -> {r['queries']}")
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the classesApp routes.')
+    parser.add_argument('--sizes', default='small,medium', help=f"Comma-separated sizes from {', '.join(SIZES)}")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=['sql', 'numpy'], default='sql', help='Analytics engine to benchmark')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two JSON reports and exit')
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        sys.exit(0)
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    report = run(sizes, args.iterations, args.seed, args.engine)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nWrote {args.output}')
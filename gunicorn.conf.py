@@ -0,0 +1,36 @@
+"""
+Gunicorn settings for the GroupProject Flask app.
+
+    flask --app app init-db                    # once, before starting the server
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker is a separate process with its own SQLite connection pool, caches and
+background job threads; threads within a worker share them. SQLite allows any number of
+concurrent readers in WAL mode, while writes are serialized by the database lock
+(busy_timeout in models.DEFAULT_PRAGMAS makes writers wait instead of failing).
+Cached users are only invalidated in the worker that changed them; the other workers see a
+role change or archived user after at most USER_CACHE_TTL seconds (services/user_cache.py).
+
+Environment variables:
+    CLASSESAPP_BIND      Address to listen on (default 127.0.0.1:8000)
+    WEB_CONCURRENCY      Worker processes (default: number of CPUs)
+    CLASSESAPP_THREADS   Threads per worker (default 4)
+    CLASSESAPP_SETTINGS  Flask settings file (see app.create_app)
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('CLASSESAPP_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('CLASSESAPP_THREADS', 4))
+worker_class = 'gthread'
+# Import the app once in the master and fork the workers from it (faster start, shared
+# read-only memory); models.py drops inherited database connections in each child
+preload_app = True
+# Connections to idle keep-alive clients are held by a worker thread
+keepalive = 5
+# Restart a worker that has not answered for this long (e.g. stuck behind a long export)
+timeout = 60
+graceful_timeout = 30
+accesslog = '-'
@@ -0,0 +1,280 @@
+"""
+Schema migrations for the GroupProject Flask app.
+Creates the database on first run and upgrades existing classesApp.db files in place.
+
+The schema version is stored in SQLite's PRAGMA user_version. Each migration runs in its
+own transaction together with the version bump, so an interrupted upgrade can be re-run.
+
+Usage:
+    python migrations.py                 Upgrade classesApp.db to the latest version
+    python migrations.py --check-plans   Fail if a hot query falls back to a full table scan
+"""
+
+from models import db, User, Student, Class, Attendance, ClassStats, StudentStats, StudentTeacherStats, configure_database
+from models import DataGeneration, Job, Enrollment, Deletion, AttendanceRollup, StudentRollup, SearchEntry, Schedule
+from services.attendance import remove_duplicate_attendance
+from services.counters import rebuild_counters
+from services.enrollment import backfill_enrollments
+from services.rollups import rebuild_rollups
+from services.search import create_search_triggers, rebuild_search_index
+import argparse
+import datetime
+import sys
+
+# Models created directly (at the latest schema) on a brand new database
+MODELS = [User, Student, Schedule, Class, Attendance, ClassStats, StudentStats, StudentTeacherStats, DataGeneration, Job,
+          Enrollment, Deletion, AttendanceRollup, StudentRollup, SearchEntry]
+
+# =============================
+# Migrations
+# =============================
+def _attendance_unique_roster():
+    """
+    Version 1: one attendance row per (class, student), required for bulk upserts.
+    """
+    remove_duplicate_attendance()
+    db.execute_sql('CREATE UNIQUE INDEX IF NOT EXISTS "attendance_class_ref_id_student_id" '
+                   'ON "attendance" ("class_ref_id", "student_id")')
+
+def _hot_lookup_indexes():
+    """
+    Version 2: indexes for the attendance and class lookups used by every dashboard.
+    """
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "attendance_class_ref_id_attend" '
+                   'ON "attendance" ("class_ref_id", "attend")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "attendance_student_id_attend" '
+                   'ON "attendance" ("student_id", "attend")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "class_user_id_datetime" '
+                   'ON "class" ("user_id", "datetime")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "class_datetime" ON "class" ("datetime")')
+
+def _attendance_counters():
+    """
+    Version 3: materialized attendance counters, backfilled from Attendance.
+    """
+    db.create_tables([ClassStats, StudentStats, StudentTeacherStats], safe=True)
+    rebuild_counters()
+
+def _background_jobs():
+    """
+    Version 4: data generation counter and the background job table.
+    """
+    db.create_tables([DataGeneration, Job], safe=True)
+
+def _class_rosters():
+    """
+    Version 5: class rosters, backfilled from attendance history and course series. Classes
+    left without a roster (no attendance, no series) get every student, as their attendance
+    sheet listed before the upgrade.
+    """
+    db.create_tables([Enrollment], safe=True)
+    backfill_enrollments()
+
+def _row_versions():
+    """
+    Version 6: row versions on Student, Class and Attendance, and the deletion log (delta export).
+    Existing rows start at version 0.
+    """
+    for table in ('student', 'class', 'attendance'):
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "version" INTEGER NOT NULL DEFAULT 0')
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "updated_at" DATETIME')
+        db.execute_sql(f'CREATE INDEX IF NOT EXISTS "{table}_version" ON "{table}" ("version")')
+    db.create_tables([Deletion], safe=True)
+
+def _attendance_rollups():
+    """
+    Version 7: weekly and monthly attendance rollups (trend analytics), backfilled from Attendance.
+    """
+    db.create_tables([AttendanceRollup, StudentRollup], safe=True)
+    rebuild_rollups()
+
+def _search_index():
+    """
+    Version 8: full-text search index over students, users and classes, with its triggers.
+    """
+    db.create_tables([SearchEntry], safe=True)
+    create_search_triggers()
+    rebuild_search_index()
+
+def _archiving():
+    """
+    Version 9: archived_at on User, Student and Class, with partial indexes over active rows
+    (hot queries) and over archived rows (purging).
+    """
+    for table in ('user', 'student', 'class'):
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "archived_at" DATETIME')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "student_active" '
+                   'ON "student" ("student_id") WHERE ("archived_at" IS NULL)')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "class_active_datetime" '
+                   'ON "class" ("datetime", "class_id") WHERE ("archived_at" IS NULL)')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "class_active_user_id_datetime" '
+                   'ON "class" ("user_id", "datetime") WHERE ("archived_at" IS NULL)')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "student_archived_at" '
+                   'ON "student" ("archived_at") WHERE ("archived_at" IS NOT NULL)')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "class_archived_at" '
+                   'ON "class" ("archived_at") WHERE ("archived_at" IS NOT NULL)')
+
+def _schedules():
+    """
+    Version 10: recurring class series (Schedule) and the session's series on Class.
+    """
+    db.create_tables([Schedule], safe=True)
+    db.execute_sql('ALTER TABLE "class" ADD COLUMN "schedule_id" INTEGER REFERENCES "schedule" ("schedule_id")')
+    db.execute_sql('CREATE UNIQUE INDEX IF NOT EXISTS "class_schedule_datetime" '
+                   'ON "class" ("schedule_id", "datetime") WHERE ("schedule_id" IS NOT NULL)')
+
+# Ordered (version, migration) pairs; append new migrations at the end
+MIGRATIONS = [
+    (1, _attendance_unique_roster),
+    (2, _hot_lookup_indexes),
+    (3, _attendance_counters),
+    (4, _background_jobs),
+    (5, _class_rosters),
+    (6, _row_versions),
+    (7, _attendance_rollups),
+    (8, _search_index),
+    (9, _archiving),
+    (10, _schedules),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# =============================
+# Migration Runner
+# =============================
+def schema_version():
+    """
+    Current schema version of the connected database.
+
+    Returns:
+        int: Value of PRAGMA user_version (0 for new or pre-migration databases).
+    """
+    return db.pragma('user_version')
+
+def migrate():
+    """
+    Bring the connected database up to LATEST_VERSION.
+
+    A database without tables is created straight from the models. Databases created
+    before versioning (user_version 0 with existing tables) run every migration.
+
+    Returns:
+        list[int]: Versions applied by this call (empty if already up to date).
+    """
+    version = schema_version()
+    if version == 0 and not User.table_exists():
+        with db.atomic():
+            db.create_tables(MODELS, safe=True)
+            create_search_triggers()
+            db.pragma('user_version', LATEST_VERSION)
+        return [LATEST_VERSION]
+    applied = []
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        with db.atomic():
+            migration()
+            db.pragma('user_version', target)
+        applied.append(target)
+    return applied
+
+# =============================
+# Query Plan Check
+# =============================
+def hot_queries():
+    """
+    Representative queries for the hot request paths, with placeholder parameters.
+
+    Returns:
+        list[tuple[str, Query]]: (description, query) pairs.
+    """
+    now = datetime.datetime.now()
+    return [
+        ('teacher dashboard classes',
+         Class.select().where((Class.user == 1) & Class.archived_at.is_null() & (Class.datetime >= now))
+         .order_by(Class.datetime)),
+        ('admin dashboard past classes',
+         Class.select().where(Class.archived_at.is_null() & (Class.datetime < now))
+         .order_by(Class.datetime.desc(), Class.class_id.desc()).limit(26)),
+        ('admin dashboard students page',
+         Student.select().where(Student.archived_at.is_null() & (Student.student_id > 1))
+         .order_by(Student.student_id).limit(26)),
+        ('archived students to purge',
+         Student.select(Student.student_id).where(Student.archived_at.is_null(False) & (Student.archived_at <= now))),
+        ('teacher double-booking check',
+         Class.select(Class.datetime, Class.title)
+         .where((Class.user == 1) & Class.archived_at.is_null()
+                & (Class.datetime > now - datetime.timedelta(hours=1)) & (Class.datetime < now))),
+        ('series due for more sessions',
+         Schedule.select().where(Schedule.expanded_until.is_null(False) & (Schedule.expanded_until < now))),
+        ('attendance sheet for a class',
+         Attendance.select().where(Attendance.class_ref == 1)),
+        ('attended students of a class',
+         Attendance.select().where((Attendance.class_ref == 1) & (Attendance.attend == True))),
+        ('attended classes of a student',
+         (Attendance.select(Attendance, Class).join(Class)
+          .where((Attendance.student == 1) & (Attendance.attend == True)))),
+        ('attendance upsert conflict lookup',
+         Attendance.select().where((Attendance.class_ref == 1) & (Attendance.student == 1))),
+        ('class roster',
+         Student.select().join(Enrollment, on=(Enrollment.student == Student.student_id))
+         .where((Enrollment.class_ref == 1) & Student.archived_at.is_null())),
+        ('weekly attendance trend for a teacher',
+         AttendanceRollup.select().where((AttendanceRollup.granularity == 'week') & (AttendanceRollup.teacher == 1)
+                                         & (AttendanceRollup.period >= now.date()))),
+        ('monthly attendance trend for a student',
+         StudentRollup.select().where((StudentRollup.granularity == 'month') & (StudentRollup.student == 1)
+                                      & (StudentRollup.period >= now.date()))),
+        ('student timeline page',
+         (Attendance.select(Class.class_id, Class.datetime, User.username).join(Class).join(User)
+          .where((Attendance.student == 1) & (Class.datetime < now))
+          .order_by(Class.datetime.desc(), Class.class_id.desc()).limit(26))),
+        ('typeahead search',
+         SearchEntry.select(SearchEntry.rowid, SearchEntry.name).where(SearchEntry.match('"da"*')).limit(200)),
+    ]
+
+def full_scans(query):
+    """
+    Tables read with a full table scan by a query, according to EXPLAIN QUERY PLAN.
+
+    Args:
+        query (Query): A peewee query.
+    Returns:
+        list[str]: Plan details for every SCAN step that does not use an index.
+    """
+    sql, params = query.sql()
+    plan = db.execute_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    return [row[-1] for row in plan if row[-1].startswith('SCAN ') and 'INDEX' not in row[-1]]
+
+def check_query_plans():
+    """
+    Check every hot query for full table scans.
+
+    Returns:
+        list[str]: One message per offending query (empty if all queries use indexes).
+    """
+    problems = []
+    for name, query in hot_queries():
+        for detail in full_scans(query):
+            problems.append(f'{name}: {detail}')
+    return problems
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upgrade the classesApp database schema.')
+    parser.add_argument('--database', default=None, help="Database file (default: classesApp.db, ':memory:' for a scratch DB)")
+    parser.add_argument('--check-plans', action='store_true', help='Exit non-zero if a hot query does a full table scan')
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    applied = migrate()
+    print(f'Schema version {schema_version()}' + (f' (applied {applied})' if applied else ' (up to date)'))
+    if args.check_plans:
+        problems = check_query_plans()
+        for problem in problems:
+            print('Full table scan in ' + problem)
+        db.close()
+        sys.exit(1 if problems else 0)
+    db.close()
@@ -5,13 +5,100 @@ Includes User, Student, Class, and Attendance models.
 """
 
 from peewee import *
+from playhouse.pool import PooledSqliteDatabase
+from playhouse.sqlite_ext import FTS5Model, SearchField
 from flask_login import UserMixin
 import datetime
+import os
+import threading
+import time
 
 # =============================
 # Database Connection
 # =============================
-db = SqliteDatabase('classesApp.db')  # SQLite database for the app
+# Connection settings; app.py exposes these through app.config (DATABASE_*)
+DEFAULT_DATABASE = 'classesApp.db'
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',        # Readers no longer block behind a writer
+    'synchronous': 1,             # NORMAL: fsync only at WAL checkpoints
+    'cache_size': -16 * 1024,     # 16 MiB page cache per connection (negative = KiB)
+    'mmap_size': 64 * 1024 * 1024,  # Memory-map the first 64 MiB of the file
+    'busy_timeout': 5000,         # Wait up to 5 s for a lock instead of failing with "database is locked"
+}
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_STALE_TIMEOUT = 300  # Recycle pooled connections idle for this many seconds
+# Conservative bound-variable limit for chunked statements (SQLite builds before 3.32 default to 999)
+SQLITE_MAX_VARIABLES = 999
+
+class InstrumentedSqliteDatabase(PooledSqliteDatabase):
+    """
+    Pooled SQLite database that reports every executed statement to registered listeners.
+
+    Attributes:
+        query_listeners (list[callable]): Called as listener(sql, seconds) after each statement
+            (used by services/metrics.py and the benchmark suite).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_listeners = []
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        if not self.query_listeners:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for listener in self.query_listeners:
+                listener(sql, elapsed)
+
+# Pooled SQLite database for the app; each worker thread checks out its own connection
+db = InstrumentedSqliteDatabase(None)
+
+def configure_database(path=DEFAULT_DATABASE, pragmas=None, max_connections=DEFAULT_MAX_CONNECTIONS,
+                       stale_timeout=DEFAULT_STALE_TIMEOUT):
+    """
+    (Re)initialize the shared database with the given file and connection settings.
+
+    Args:
+        path (str): SQLite database file (':memory:' for a scratch database).
+        pragmas (dict | None): PRAGMA settings applied to every new connection (defaults to DEFAULT_PRAGMAS).
+        max_connections (int): Maximum number of pooled connections across all threads.
+        stale_timeout (int): Seconds after which an idle pooled connection is recycled.
+    Returns:
+        InstrumentedSqliteDatabase: The shared database instance.
+    """
+    # Drop pooled connections so none keeps pointing at a previous database file
+    if not db.deferred:
+        db.close_all()
+    # A pooled connection is only ever used by one thread at a time, but may be
+    # handed to a different thread once returned, so sqlite3's thread check is disabled
+    db.init(path, pragmas=dict(DEFAULT_PRAGMAS if pragmas is None else pragmas),
+            max_connections=max_connections, stale_timeout=stale_timeout,
+            check_same_thread=False)
+    return db
+
+configure_database()
+
+def _forget_connections_after_fork():
+    """
+    Give a forked child (e.g. a pre-fork server worker) an empty connection pool.
+
+    SQLite connections must not be shared across processes, so connections inherited
+    from the parent are dropped without being closed (closing them could disturb the
+    parent's locks), and the pool's locks are replaced in case another thread held them
+    at fork time. The child then opens its own connections on first use.
+    """
+    db._state.reset()
+    db._lock = threading.Lock()
+    db._pool_lock = threading.RLock()
+    db._pool_available = threading.Condition(db._pool_lock)
+    db._connections = []
+    db._in_use = {}
+
+os.register_at_fork(after_in_child=_forget_connections_after_fork)
 
 # =============================
 # Base Model
@@ -35,11 +122,13 @@ class User(UserMixin, BaseModel):
         username (str): Login username (unique).
         password (str): Hashed password.
         is_admin (bool): True for admin, False for teacher.
+        archived_at (datetime): When the user was archived (None while active; see services/deletion.py).
     """
     user_id = AutoField(unique=True)
     username = CharField(unique=True)
     password = CharField()
     is_admin = BooleanField(default=False)
+    archived_at = DateTimeField(null=True)
 
     def get_id(self):
         """
@@ -62,11 +151,54 @@ class Student(BaseModel):
         name (str): Student's name.
         email (str): Student's email (unique).
         grade (str): Overall progress/grade (nullable).
+        version (int): Data generation of the last change (see services/generation.py).
+        updated_at (datetime): Time of the last change.
+        archived_at (datetime): When the student was archived (None while active).
     """
     student_id = AutoField(unique=True)
     name = CharField()
     email = CharField(unique=True)
     grade = CharField(null=True)
+    version = IntegerField(default=0, index=True)
+    updated_at = DateTimeField(null=True)
+    archived_at = DateTimeField(null=True)
+
+# =============================
+# Schedule Model
+# =============================
+class Schedule(BaseModel):
+    """
+    Recurring class series, like an RRULE with FREQ=WEEKLY: a session at the same time of day on
+    each of the weekdays, every `interval` weeks, from the first session until the last date.
+    Sessions are created as Class rows a few weeks ahead (see services/schedules.py).
+
+    Attributes:
+        schedule_id (int): Primary key.
+        user (User): Teacher of every session.
+        title (str): Class title of every session.
+        starts_at (datetime): First session; its time of day is used for every session.
+        until (date): Last day a session may fall on (inclusive).
+        interval (int): Weeks between repeats (1 weekly, 2 biweekly).
+        weekdays (str): Comma-separated RRULE day codes, e.g. 'MO,WE'.
+        exceptions (str): Comma-separated dates (YYYY-MM-DD) without a session (like EXDATE).
+        expanded_until (datetime): Sessions before this time exist as Class rows
+            (None once every session does).
+        created_at (datetime): When the series was created.
+    """
+    schedule_id = AutoField()
+    user = ForeignKeyField(User, backref='schedules')
+    title = CharField()
+    starts_at = DateTimeField()
+    until = DateField()
+    interval = IntegerField(default=1)
+    weekdays = CharField()
+    exceptions = TextField(default='')
+    expanded_until = DateTimeField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+
+# Series that still have sessions to create, by how far they have been created
+Schedule.add_index(Schedule.index(Schedule.expanded_until, name='schedule_pending_expanded_until',
+                                  where=Schedule.expanded_until.is_null(False)))
 
 # =============================
 # Class Model
@@ -80,11 +212,43 @@ class Class(BaseModel):
         user (User): Teacher for the class.
         title (str): Class title.
         datetime (datetime): Date and time of the class.
+        version (int): Data generation of the last change (see services/generation.py).
+        updated_at (datetime): Time of the last change.
+        archived_at (datetime): When the class was archived (None while active).
+        schedule (Schedule): Recurring series the session was created from (None for one-off classes).
     """
     class_id = AutoField(unique=True)
     user = ForeignKeyField(User, backref='classes')
     title = CharField()
-    datetime = DateTimeField()
+    datetime = DateTimeField(index=True)
+    version = IntegerField(default=0, index=True)
+    updated_at = DateTimeField(null=True)
+    archived_at = DateTimeField(null=True)
+    # Indexed by class_schedule_datetime below
+    schedule = ForeignKeyField(Schedule, null=True, backref='classes', index=False)
+
+    class Meta:
+        indexes = (
+            # Teacher dashboards, exports and analytics filter by teacher and order by date
+            (('user', 'datetime'), False),
+        )
+
+# Partial indexes over active (not archived) rows: the dashboards and lists only read these,
+# so archived history does not make their index lookups any larger
+Student.add_index(Student.index(Student.student_id, name='student_active',
+                                where=Student.archived_at.is_null()))
+Class.add_index(Class.index(Class.datetime, Class.class_id, name='class_active_datetime',
+                            where=Class.archived_at.is_null()))
+Class.add_index(Class.index(Class.user, Class.datetime, name='class_active_user_id_datetime',
+                            where=Class.archived_at.is_null()))
+# Archived rows waiting to be purged, oldest first
+Student.add_index(Student.index(Student.archived_at, name='student_archived_at',
+                                where=Student.archived_at.is_null(False)))
+Class.add_index(Class.index(Class.archived_at, name='class_archived_at',
+                            where=Class.archived_at.is_null(False)))
+# One session per series and start time, so expanding a series twice creates nothing new
+Class.add_index(Class.index(Class.schedule, Class.datetime, name='class_schedule_datetime', unique=True,
+                            where=Class.schedule.is_null(False)))
 
 # =============================
 # Attendance Model
@@ -99,9 +263,251 @@ class Attendance(BaseModel):
         student (Student): The student.
         attend (bool): True if attended.
         class_grade (str): Grade for this class (nullable).
+        version (int): Data generation of the last change (see services/generation.py).
+        updated_at (datetime): Time of the last change.
     """
     attendance_id = AutoField(unique=True)
     class_ref = ForeignKeyField(Class, backref='attendances')
     student = ForeignKeyField(Student, backref='attendances')
     attend = BooleanField(default=False)
     class_grade = CharField(null=True)
+    version = IntegerField(default=0, index=True)
+    updated_at = DateTimeField(null=True)
+
+    class Meta:
+        indexes = (
+            # One attendance row per student per class (required for bulk upserts)
+            (('class_ref', 'student'), True),
+            # Attended-only lookups per class (analytics, exports) and per student (profile)
+            (('class_ref', 'attend'), False),
+            (('student', 'attend'), False),
+        )
+
+# =============================
+# Enrollment Model
+# =============================
+class Enrollment(BaseModel):
+    """
+    Class roster entry: a student enrolled in a class session.
+    Attendance sheets, saves and teacher analytics only cover enrolled students.
+
+    Attributes:
+        enrollment_id (int): Primary key.
+        class_ref (Class): The class.
+        student (Student): The enrolled student.
+    """
+    enrollment_id = AutoField()
+    class_ref = ForeignKeyField(Class, backref='enrollments')
+    student = ForeignKeyField(Student, backref='enrollments')
+
+    class Meta:
+        indexes = (
+            # One roster entry per student per class; also serves roster lookups by class
+            (('class_ref', 'student'), True),
+            # Classes of a student (unenrolling, deleting students)
+            (('student', 'class_ref'), False),
+        )
+
+# =============================
+# Attendance Counter Models
+# =============================
+# Denormalized attendance counts, kept in step with Attendance by services/counters.py
+# (updated in the same transaction as each attendance write; rebuild with
+# `python -m services.counters`).
+class ClassStats(BaseModel):
+    """
+    Attendance totals for one class.
+
+    Attributes:
+        class_ref (Class): The class (primary key).
+        total (int): Number of attendance rows (students marked present or absent).
+        attended (int): Number of students marked present.
+    """
+    class_ref = ForeignKeyField(Class, primary_key=True, backref='stats')
+    total = IntegerField(default=0)
+    attended = IntegerField(default=0)
+
+class StudentStats(BaseModel):
+    """
+    Number of classes a student attended, across all teachers.
+
+    Attributes:
+        student (Student): The student (primary key).
+        attended (int): Number of attendance rows marked present.
+    """
+    student = ForeignKeyField(Student, primary_key=True, backref='stats')
+    attended = IntegerField(default=0)
+
+class StudentTeacherStats(BaseModel):
+    """
+    Number of classes a student attended with one teacher.
+
+    Attributes:
+        student (Student): The student.
+        teacher (User): The teacher who owns the classes.
+        attended (int): Number of attendance rows marked present in this teacher's classes.
+    """
+    student = ForeignKeyField(Student, backref='teacher_stats')
+    teacher = ForeignKeyField(User, backref='student_stats')
+    attended = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey('student', 'teacher')
+
+# =============================
+# Attendance Rollup Models
+# =============================
+# Attendance totals per week and month, kept in step with Attendance by services/rollups.py
+# (updated in the same transaction as each attendance write; rebuild with
+# `python -m services.rollups`).
+class AttendanceRollup(BaseModel):
+    """
+    Attendance totals for one teacher's classes with one title in one week or month.
+
+    Attributes:
+        granularity (str): 'week' or 'month'.
+        period (date): First day of the period (Monday for weeks).
+        teacher (User): Teacher of the classes.
+        title (str): Class title (course series).
+        total (int): Number of attendance rows (students marked present or absent).
+        attended (int): Number of students marked present.
+    """
+    granularity = CharField()
+    period = DateField()
+    teacher = ForeignKeyField(User, backref='attendance_rollups')
+    title = CharField()
+    total = IntegerField(default=0)
+    attended = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey('granularity', 'period', 'teacher', 'title')
+        indexes = (
+            # Trends for one teacher or one course series over a date range
+            (('granularity', 'teacher', 'period'), False),
+            (('granularity', 'title', 'period'), False),
+        )
+
+class StudentRollup(BaseModel):
+    """
+    Attendance totals for one student in one teacher's classes in one week or month.
+
+    Attributes:
+        granularity (str): 'week' or 'month'.
+        period (date): First day of the period (Monday for weeks).
+        teacher (User): Teacher of the classes.
+        student (Student): The student.
+        total (int): Number of attendance rows.
+        attended (int): Number of classes attended.
+    """
+    granularity = CharField()
+    period = DateField()
+    teacher = ForeignKeyField(User, backref='student_rollups')
+    student = ForeignKeyField(Student, backref='rollups')
+    total = IntegerField(default=0)
+    attended = IntegerField(default=0)
+
+    class Meta:
+        primary_key = CompositeKey('granularity', 'period', 'teacher', 'student')
+        indexes = (
+            (('granularity', 'teacher', 'period'), False),
+            (('granularity', 'student', 'period'), False),
+        )
+
+# =============================
+# Data Generation Model
+# =============================
+class DataGeneration(BaseModel):
+    """
+    Monotonic change counter, bumped by every write that changes what reports show.
+    Cached exports and views compare generations to know when they are stale.
+
+    Attributes:
+        name (str): Counter name (primary key).
+        value (int): Current generation.
+    """
+    name = CharField(primary_key=True)
+    value = IntegerField(default=0)
+
+# =============================
+# Background Job Model
+# =============================
+class Job(BaseModel):
+    """
+    Background job (e.g. a large CSV export) run by services/jobs.py.
+
+    Attributes:
+        job_id (int): Primary key.
+        kind (str): Job type, e.g. 'attendance_csv'.
+        teacher (User): Teacher whose classes are exported, or None for all classes.
+        requested_by (int): user_id of the user who started the job.
+        status (str): queued, running, done or failed.
+        generation (int): Data generation the job was started at.
+        file_path (str): Result file on disk once done.
+        error (str): Error message if failed.
+        created_at (datetime): When the job was queued.
+        finished_at (datetime): When the job finished.
+    """
+    job_id = AutoField()
+    kind = CharField()
+    teacher = ForeignKeyField(User, null=True, backref='jobs')
+    requested_by = IntegerField()
+    status = CharField(default='queued')
+    generation = IntegerField()
+    file_path = CharField(null=True)
+    error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        indexes = (
+            # Deduplication looks up the latest job for the same export
+            (('kind', 'teacher', 'generation'), False),
+        )
+
+# =============================
+# Deletion Log Model
+# =============================
+class Deletion(BaseModel):
+    """
+    Tombstone for a deleted class, student or attendance row, read by the delta export.
+
+    Attributes:
+        deletion_id (int): Primary key.
+        entity (str): 'class', 'student' or 'attendance'.
+        row_id (int): Primary key of the deleted row.
+        version (int): Data generation of the deletion.
+        deleted_at (datetime): When the row was deleted.
+    """
+    deletion_id = AutoField()
+    entity = CharField()
+    row_id = IntegerField()
+    version = IntegerField(index=True)
+    deleted_at = DateTimeField(default=datetime.datetime.now)
+
+# =============================
+# Search Index Model
+# =============================
+class SearchEntry(FTS5Model):
+    """
+    Full-text index of student names and emails, usernames and class titles (SQLite FTS5).
+    Kept in step with those tables by triggers (see services/search.py).
+
+    The rowid encodes the indexed row: primary key * 4 + kind (1 student, 2 user, 3 class),
+    so a trigger updates or deletes an entry by rowid without scanning the index.
+
+    Attributes:
+        name (str): Student name, username or class title.
+        detail (str | None): Student email.
+    """
+    name = SearchField()
+    detail = SearchField()
+
+    class Meta:
+        database = db
+        table_name = 'search_index'
+        options = {
+            # Fold case and accents ("Malínek" matches "malinek")
+            'tokenize': 'unicode61 remove_diacritics 2',
+            # Prefix indexes: typeahead prefixes up to 8 characters are single index lookups
+            'prefix': [2, 3, 4, 5, 6, 7, 8],
+        }
@@ -1,15 +1,28 @@
 """
 Admin routes for the GroupProject Flask app.
-Handles admin dashboard, class, teacher, student management, and attendance export.
+Handles admin dashboard, class, teacher, student management, bulk import, and attendance export.
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
 from flask_login import login_required, current_user
 from models import db, User, Student, Class, Attendance
-from werkzeug.security import generate_password_hash
+from services.counters import move_class_teacher
+from services.deletion import archive, purge
+from services.enrollment import roster, series_class_ids, student_ids_by_email, enroll, unenroll, copy_series_roster
+from services.exports import attendance_csv_response, attendance_delta_response
+from services.generation import bump_generation, row_stamp
+from services.imports import IMPORTERS, import_upload
+from services.metrics import endpoint_metrics
+from services.pagination import keyset_page
+from services.passwords import hash_password_pooled
+from services.rate_limit import login_ip_limiter, login_user_limiter
+from services.rollups import withdraw_class, restore_class
+from services.schedules import REPEAT_INTERVALS, create_schedule, ensure_available, parse_dates
+from services.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search, search_kinds
+from services.stats import dashboard_counts
+from services.user_cache import user_cache
+from services.view_cache import cached_view, view_cache
 import datetime
-import io
-import csv
 
 # Blueprint for admin routes
 admin_bp = Blueprint('admin', __name__)
@@ -19,11 +32,15 @@ admin_bp = Blueprint('admin', __name__)
 # =============================
 @admin_bp.route('/admin_dashboard', methods=['GET', 'POST'])
 @login_required
+@cached_view
 def admin_dashboard():
     """
     Admin dashboard: manage classes, teachers, and students.
-    Handles adding new classes, teachers, and students via POST.
-    Shows lists of classes, teachers, and students.
+    Handles adding new classes (single sessions or weekly/biweekly series, see services.schedules),
+    teachers, and students via POST; a class that would double-book its teacher is refused.
+    Shows keyset-paginated lists of active (not archived) classes, teachers, and students
+    (page cursors are passed as past_after, upcoming_after, teachers_after and students_after).
+    GET responses are cached until data changes (see services.view_cache).
 
     Returns:
         Response: Rendered admin dashboard template.
@@ -32,39 +49,63 @@ def admin_dashboard():
     """
     if not current_user.is_admin:
         abort(403)
-    # Add class
+    # Add class, or a weekly/biweekly series of classes
     if request.method == 'POST' and 'title' in request.form:
         try:
             dt = datetime.datetime.strptime(request.form['datetime'], '%Y-%m-%dT%H:%M')
-            Class.create(title=request.form['title'], datetime=dt, user=request.form['teacher_id'])
-            flash('Class added!')
+            repeat = request.form.get('repeat', '')
+            if repeat in REPEAT_INTERVALS:
+                until = datetime.datetime.strptime(request.form.get('until', ''), '%Y-%m-%d').date()
+                schedule, created = create_schedule(request.form['teacher_id'], request.form['title'], dt, until,
+                                                    interval=REPEAT_INTERVALS[repeat],
+                                                    weekdays=request.form.getlist('weekdays'),
+                                                    exceptions=parse_dates(request.form.get('skip_dates', '')))
+                flash(f'Class series added ({created} session(s) created; later ones follow as their dates approach)!')
+            else:
+                with db.atomic('IMMEDIATE'):
+                    ensure_available(request.form['teacher_id'], [dt])
+                    class_obj = Class.create(title=request.form['title'], datetime=dt, user=request.form['teacher_id'],
+                                             **row_stamp(bump_generation()))
+                    copy_series_roster([class_obj.class_id])  # Start with the course series' roster
+                flash('Class added!')
         except Exception as e:
             flash('Error: ' + str(e))
     # Add teacher
     if request.method == 'POST' and 'username' in request.form and 'password' in request.form and 'is_teacher' in request.form:
         try:
-            hashed_pw = generate_password_hash(request.form['password'])
-            User.create(username=request.form['username'], password=hashed_pw, is_admin=False)
+            hashed_pw = hash_password_pooled(request.form['password'])
+            with db.atomic():
+                User.create(username=request.form['username'], password=hashed_pw, is_admin=False)
+                bump_generation()
             flash('Teacher added!')
         except Exception as e:
             flash('Error: ' + str(e))
     # Add student
     if request.method == 'POST' and 'name' in request.form and 'email' in request.form and 'is_student' in request.form:
         try:
-            Student.create(name=request.form['name'], email=request.form['email'])
+            with db.atomic():
+                Student.create(name=request.form['name'], email=request.form['email'], **row_stamp(bump_generation()))
             flash('Student added!')
         except Exception as e:
             flash('Error: ' + str(e))
     now = datetime.datetime.now()
-    classes_past = Class.select().where(Class.datetime < now).order_by(Class.datetime.desc())
-    classes_future = Class.select().where(Class.datetime >= now).order_by(Class.datetime.asc())
-    teachers = User.select().where(User.is_admin == False)
-    students = Student.select()
-    total_classes_upcoming = classes_future.count()
-    total_classes_past = classes_past.count()
-    total_teachers = teachers.count()
-    total_students = students.count()
-    return render_template('admin.html', classes_past=classes_past, classes_future=classes_future, teachers=teachers, students=students, total_classes_upcoming=total_classes_upcoming, total_classes_past=total_classes_past, total_teachers=total_teachers, total_students=total_students)
+    # Each list is keyset-paginated independently; the teacher is fetched by join
+    class_key = [Class.datetime, Class.class_id]
+    classes_with_teacher = Class.select(Class, User).join(User).where(Class.archived_at.is_null())
+    classes_past, past_next = keyset_page(classes_with_teacher.where(Class.datetime < now), class_key,
+                                          request.args.get('past_after'), descending=True)
+    classes_future, upcoming_next = keyset_page(classes_with_teacher.where(Class.datetime >= now), class_key,
+                                                request.args.get('upcoming_after'))
+    active_teachers = (User.is_admin == False) & User.archived_at.is_null()
+    teachers, teachers_next = keyset_page(User.select().where(active_teachers), [User.user_id],
+                                          request.args.get('teachers_after'))
+    students, students_next = keyset_page(Student.select().where(Student.archived_at.is_null()), [Student.student_id],
+                                          request.args.get('students_after'))
+    # Lightweight list for the "Add Class" teacher dropdown
+    teacher_options = User.select(User.user_id, User.username).where(active_teachers).order_by(User.username)
+    cursors = {'past_after': past_next, 'upcoming_after': upcoming_next,
+               'teachers_after': teachers_next, 'students_after': students_next}
+    return render_template('admin.html', classes_past=classes_past, classes_future=classes_future, teachers=teachers, students=students, teacher_options=teacher_options, cursors=cursors, **dashboard_counts(now))
 
 # =============================
 # Class Management
@@ -89,13 +130,49 @@ def admin_class_detail(class_id):
     if not class_obj:
         abort(404)
     attendances = (Attendance.select(Attendance, Student).join(Student).where(Attendance.class_ref == class_obj))
-    return render_template('admin_class_detail.html', class_obj=class_obj, attendances=attendances)
+    return render_template('admin_class_detail.html', class_obj=class_obj, attendances=attendances,
+                           roster=roster(class_obj.class_id))
+
+@admin_bp.route('/admin/class/<int:class_id>/roster', methods=['POST'])
+@login_required
+def admin_class_roster(class_id):
+    """
+    Enroll or unenroll students in a class or its whole course series (admin only).
+
+    Form fields:
+        action: 'enroll' (with emails, one per line) or 'unenroll' (with student_id).
+        series: If present, apply to every class with the same teacher and title.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        Response: Redirect to the class details page.
+    Raises:
+        403: If current user is not admin.
+        404: If class does not exist.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    class_obj = Class.get_or_none(Class.class_id == class_id)
+    if not class_obj:
+        abort(404)
+    class_ids = series_class_ids(class_obj) if 'series' in request.form else [class_obj.class_id]
+    if request.form.get('action') == 'unenroll':
+        unenroll(class_ids, [request.form.get('student_id', type=int)])
+        flash('Student removed from roster.')
+    else:
+        emails = {line.strip() for line in request.form.get('emails', '').splitlines() if line.strip()}
+        found = student_ids_by_email(emails)
+        enroll(class_ids, list(found.values()))
+        missing = emails - set(found)
+        flash(f'Enrolled {len(found)} student(s).' + (f" Unknown: {', '.join(sorted(missing))}" if missing else ''))
+    return redirect(url_for('admin.admin_class_detail', class_id=class_obj.class_id))
 
 @admin_bp.route('/admin/class/<int:class_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_class(class_id):
     """
-    Delete a class (admin only).
+    Delete a class with its attendance and roster (admin only; see services.deletion).
 
     Args:
         class_id (int): The class session ID.
@@ -106,17 +183,36 @@ def admin_delete_class(class_id):
     """
     if not current_user.is_admin:
         abort(403)
-    class_obj = Class.get_or_none(Class.class_id == class_id)
-    if class_obj:
-        class_obj.delete_instance()
-        flash('Class deleted!')
+    counts = purge('class', class_id)
+    if counts:
+        flash(f"Class deleted ({counts['attendance']} attendance record(s) removed)!")
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin_bp.route('/admin/class/<int:class_id>/archive', methods=['POST'])
+@login_required
+def admin_archive_class(class_id):
+    """
+    Archive a class (admin only): it leaves the dashboards, lists and analytics at once,
+    and `python -m services.deletion` can restore or purge it later.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        Response: Redirect to admin dashboard.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    if archive('class', class_id):
+        flash('Class archived!')
     return redirect(url_for('admin.admin_dashboard'))
 
 @admin_bp.route('/admin/class/<int:class_id>/edit', methods=['GET', 'POST'])
 @login_required
 def admin_edit_class(class_id):
     """
-    Edit a class (admin only).
+    Edit a class (admin only). A new teacher or time is refused if it would double-book the teacher.
 
     Args:
         class_id (int): The class session ID.
@@ -133,15 +229,24 @@ def admin_edit_class(class_id):
         abort(404)
     if request.method == 'POST':
         try:
+            old_teacher_id, old_datetime = class_obj.user_id, class_obj.datetime
             class_obj.title = request.form['title']
             class_obj.datetime = datetime.datetime.strptime(request.form['datetime'], '%Y-%m-%dT%H:%M')
             class_obj.user = request.form['teacher_id']
-            class_obj.save()
+            with db.atomic('IMMEDIATE'):
+                if (int(class_obj.user_id), class_obj.datetime) != (old_teacher_id, old_datetime):
+                    ensure_available(class_obj.user_id, [class_obj.datetime], ignore_class=class_obj.class_id)
+                stamp = row_stamp(bump_generation())
+                class_obj.version, class_obj.updated_at = stamp['version'], stamp['updated_at']
+                withdraw_class(class_obj.class_id)  # Totals move to the new teacher/title/date
+                class_obj.save()
+                restore_class(class_obj.class_id)
+                move_class_teacher(class_obj.class_id, old_teacher_id, class_obj.user_id)
             flash('Class updated!')
             return redirect(url_for('admin.admin_dashboard'))
         except Exception as e:
             flash('Error: ' + str(e))
-    teachers = User.select().where(User.is_admin == False)
+    teachers = User.select().where((User.is_admin == False) & User.archived_at.is_null())
     return render_template('edit_class.html', class_obj=class_obj, teachers=teachers)
 
 # =============================
@@ -151,7 +256,7 @@ def admin_edit_class(class_id):
 @login_required
 def admin_delete_student(student_id):
     """
-    Delete a student (admin only).
+    Delete a student with their attendance and enrollments (admin only; see services.deletion).
 
     Args:
         student_id (int): The student ID.
@@ -162,10 +267,28 @@ def admin_delete_student(student_id):
     """
     if not current_user.is_admin:
         abort(403)
-    student = Student.get_or_none(Student.student_id == student_id)
-    if student:
-        student.delete_instance()
-        flash('Student deleted!')
+    counts = purge('student', student_id)
+    if counts:
+        flash(f"Student deleted ({counts['attendance']} attendance record(s) removed)!")
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin_bp.route('/admin/student/<int:student_id>/archive', methods=['POST'])
+@login_required
+def admin_archive_student(student_id):
+    """
+    Archive a student (admin only), keeping their attendance history.
+
+    Args:
+        student_id (int): The student ID.
+    Returns:
+        Response: Redirect to admin dashboard.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    if archive('student', student_id):
+        flash('Student archived!')
     return redirect(url_for('admin.admin_dashboard'))
 
 @admin_bp.route('/admin/student/<int:student_id>/edit', methods=['GET', 'POST'])
@@ -191,7 +314,10 @@ def admin_edit_student(student_id):
         try:
             student.name = request.form['name']
             student.email = request.form['email']
-            student.save()
+            with db.atomic():
+                stamp = row_stamp(bump_generation())
+                student.version, student.updated_at = stamp['version'], stamp['updated_at']
+                student.save()
             flash('Student updated!')
             return redirect(url_for('admin.admin_dashboard'))
         except Exception as e:
@@ -205,7 +331,7 @@ def admin_edit_student(student_id):
 @login_required
 def admin_delete_teacher(user_id):
     """
-    Delete a teacher (admin only).
+    Delete a teacher with their classes, attendance and export jobs (admin only; see services.deletion).
 
     Args:
         user_id (int): The teacher's user ID.
@@ -216,10 +342,29 @@ def admin_delete_teacher(user_id):
     """
     if not current_user.is_admin:
         abort(403)
-    teacher = User.get_or_none(User.user_id == user_id, User.is_admin == False)
-    if teacher:
-        teacher.delete_instance()
-        flash('Teacher deleted!')
+    counts = purge('teacher', user_id)
+    if counts:
+        flash(f"Teacher deleted ({counts['classes']} class(es) and "
+              f"{counts['attendance']} attendance record(s) removed)!")
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin_bp.route('/admin/teacher/<int:user_id>/archive', methods=['POST'])
+@login_required
+def admin_archive_teacher(user_id):
+    """
+    Archive a teacher and their classes (admin only); archived teachers cannot log in.
+
+    Args:
+        user_id (int): The teacher's user ID.
+    Returns:
+        Response: Redirect to admin dashboard.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    if archive('teacher', user_id):
+        flash('Teacher archived!')
     return redirect(url_for('admin.admin_dashboard'))
 
 @admin_bp.route('/admin/teacher/<int:user_id>/edit', methods=['GET', 'POST'])
@@ -245,14 +390,105 @@ def admin_edit_teacher(user_id):
         try:
             teacher.username = request.form['username']
             if request.form['password']:
-                teacher.password = generate_password_hash(request.form['password'])
-            teacher.save()
+                teacher.password = hash_password_pooled(request.form['password'])
+            with db.atomic():
+                teacher.save()
+                # The teacher's name is part of their classes' export rows
+                Class.update(**row_stamp(bump_generation())).where(Class.user == teacher.user_id).execute()
+            user_cache.invalidate(teacher.user_id)
             flash('Teacher updated!')
             return redirect(url_for('admin.admin_dashboard'))
         except Exception as e:
             flash('Error: ' + str(e))
     return render_template('edit_teacher.html', teacher=teacher)
 
+# =============================
+# Bulk Import
+# =============================
+@admin_bp.route('/admin/import', methods=['GET', 'POST'])
+@login_required
+def admin_import():
+    """
+    Bulk import students, teachers, classes, or class series from an uploaded CSV file (admin only).
+    The file is parsed as a stream and inserted in batches (see services.imports).
+
+    Returns:
+        Response: Rendered import template, with a per-row error report after POST.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    report = None
+    error = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        kind = request.form.get('kind')
+        if not upload or not upload.filename:
+            error = 'Please choose a CSV file.'
+        elif kind not in IMPORTERS:
+            error = 'Unknown import type.'
+        else:
+            report = import_upload(kind, upload)
+    return render_template('admin_import.html', report=report, error=error)
+
+# =============================
+# Search
+# =============================
+@admin_bp.route('/admin/search')
+@login_required
+def admin_search():
+    """
+    Typeahead search over students, teachers and classes (admin only).
+    Query parameters: q (words matched as prefixes), kind (comma-separated: student, teacher,
+    class; default all) and limit (default 8, max 25). See services.search.
+
+    Returns:
+        Response: JSON with the ranked results, each with a link to its page.
+    Raises:
+        400: If an unknown kind is requested.
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    try:
+        kinds = search_kinds(request.args.get('kind'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    query = request.args.get('q', '')
+    results = search(query, kinds, limit)
+    for result in results:
+        if result['kind'] == 'student':
+            result['url'] = url_for('student.student_profile', student_id=result['id'])
+        elif result['kind'] == 'teacher':
+            result['url'] = url_for('admin.admin_edit_teacher', user_id=result['id'])
+        else:
+            result['url'] = url_for('admin.admin_class_detail', class_id=result['id'])
+    return jsonify({'query': query, 'results': results})
+
+# =============================
+# Metrics
+# =============================
+@admin_bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    """
+    Request metrics aggregated per endpoint, plus user and view cache counters and rejected
+    login attempts (admin only).
+
+    Returns:
+        Response: JSON with latency, database time, template time and query-count
+        histograms per endpoint.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify({'endpoints': endpoint_metrics.snapshot(), 'user_cache': user_cache.stats(),
+                    'view_cache': view_cache.stats(),
+                    'login_rejected': {'ip': login_ip_limiter.rejected, 'user': login_user_limiter.rejected}})
+
 # =============================
 # Attendance Export
 # =============================
@@ -263,27 +499,35 @@ def export_attendance_csv():
     Export all class attendance as CSV for all teachers.
     Columns: Class Title, Date, Teacher, Attendance Count, Attended Students (comma-separated).
 
+    The report is streamed as it is generated (see services.exports).
+
+    Returns:
+        Response: Streamed CSV file as attachment.
+    Raises:
+        403: If current user is not admin.
+    """
+    if not current_user.is_admin:
+        abort(403)
+    return attendance_csv_response()
+
+@admin_bp.route('/admin/export_attendance/delta.csv')
+@login_required
+def export_attendance_delta():
+    """
+    Export classes, students and attendance changed since a watermark, as CSV (admin only).
+    Query parameter since: the X-Watermark returned by the previous export (omit for everything).
+
     Returns:
-        Response: CSV file as attachment.
+        Response: Streamed CSV of changes and deletions, with the new watermark in X-Watermark.
     Raises:
         403: If current user is not admin.
+        400: If since is not an integer.
     """
     if not current_user.is_admin:
         abort(403)
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Class Title', 'Date', 'Teacher', 'Attendance Count', 'Attended Students'])
-    # Sort classes by date
-    classes_sorted = Class.select().order_by(Class.datetime)
-    for c in classes_sorted:
-        attended = Attendance.select().where((Attendance.class_ref == c) & (Attendance.attend == True))
-        names = ', '.join([a.student.name for a in attended])
-        writer.writerow([
-            c.title,
-            c.datetime.strftime('%Y-%m-%d %H:%M'),
-            c.user.username,
-            attended.count(),
-            names
-        ])
-    output.seek(0)
-    return send_file(io.BytesIO(output.getvalue().encode()), mimetype='text/csv', as_attachment=True, download_name='attendance_report.csv')
+    since = request.args.get('since', '-1')
+    try:
+        since = int(since)
+    except ValueError:
+        abort(400)
+    return attendance_delta_response(since)
@@ -1,73 +1,61 @@
 """
 Analytics routes for the GroupProject Flask app.
-Handles attendance analytics dashboard for admin and teachers.
+Handles attendance analytics dashboard and attendance trends for admin and teachers.
 """
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request
 from flask_login import login_required, current_user
-from models import User, Student, Class, Attendance
-import datetime
+from models import User
+from services.rollups import GRANULARITIES, TREND_GROUPS, trend_args, attendance_trends, trend_table
+from services.stats import analytics_engine
+from services.view_cache import cached_view
 
 analytics_bp = Blueprint('analytics', __name__)
 
 @analytics_bp.route('/analytics')
 @login_required
+@cached_view
 def analytics():
     """
     Attendance analytics dashboard for admin and teachers.
-    Shows class and student attendance statistics.
+    Shows class and student attendance statistics, their distribution and (admin) the
+    per-teacher breakdown, computed by the configured engine (see services.stats.analytics_engine).
+    The rendered page is cached until attendance data changes (see services.view_cache).
 
     Returns:
         Response: Rendered analytics template with statistics.
     """
-    now = datetime.datetime.now()
-    if current_user.is_admin:
-        # Admin: show stats for all classes and students
-        class_stats = []
-        for c in Class.select():
-            total = Attendance.select().where(Attendance.class_ref == c).count()
-            attended = Attendance.select().where((Attendance.class_ref == c) & (Attendance.attend == True)).count()
-            is_future = c.datetime >= now
-            class_stats.append({
-                'title': c.title,
-                'date': c.datetime.strftime('%Y-%m-%d'),
-                'teacher': c.user.username,
-                'total': total,
-                'attended': attended,
-                'is_future': is_future
-            })
-        student_stats = []
-        for s in Student.select():
-            attended = Attendance.select().where((Attendance.student == s) & (Attendance.attend == True)).count()
-            student_stats.append({
-                'name': s.name,
-                'email': s.email,
-                'attended': attended,
-                'student_id': s.student_id
-            })
-        return render_template('analytics.html', class_stats=class_stats, student_stats=student_stats)
-    else:
-        # Teacher: show stats for their own classes and students
-        class_stats = []
-        for c in Class.select().where(Class.user == current_user.user_id):
-            total = Attendance.select().where(Attendance.class_ref == c).count()
-            attended = Attendance.select().where((Attendance.class_ref == c) & (Attendance.attend == True)).count()
-            is_future = c.datetime >= now
-            class_stats.append({
-                'title': c.title,
-                'date': c.datetime.strftime('%Y-%m-%d'),
-                'total': total,
-                'attended': attended,
-                'is_future': is_future
-            })
-        student_stats = []
-        for s in Student.select():
-            # Only count attendance for this teacher's classes
-            attended = Attendance.select().join(Class).where((Attendance.student == s) & (Attendance.attend == True) & (Class.user == current_user.user_id)).count()
-            student_stats.append({
-                'name': s.name,
-                'email': s.email,
-                'attended': attended,
-                'student_id': s.student_id
-            })
-        return render_template('analytics.html', class_stats=class_stats, student_stats=student_stats)
+    # Admin sees all classes and students; teachers only their own classes
+    teacher_id = None if current_user.is_admin else current_user.user_id
+    stats = analytics_engine()
+    return render_template('analytics.html',
+                           class_stats=stats.class_stats(teacher_id),
+                           student_stats=stats.student_stats(teacher_id),
+                           teacher_stats=stats.teacher_stats() if teacher_id is None else [],
+                           distribution=stats.attendance_distribution(teacher_id))
+
+@analytics_bp.route('/analytics/trends')
+@login_required
+@cached_view
+def trends():
+    """
+    Weekly or monthly attendance rates per teacher, class title or student (or overall),
+    read from the attendance rollups. Teachers only see their own classes.
+    Query parameters are described in services.rollups.trend_args.
+
+    Returns:
+        Response: Rendered trends template (status 400 if a parameter is invalid).
+    """
+    teachers = [] if not current_user.is_admin else User.select().where((User.is_admin == False) & User.archived_at.is_null()).order_by(User.username)
+    options = {'teachers': teachers, 'granularities': GRANULARITIES, 'groups': TREND_GROUPS}
+    try:
+        params = trend_args(request.args)
+    except ValueError as e:
+        return render_template('trends.html', error=str(e), form=request.args, periods=[], series=[], **options), 400
+    if not current_user.is_admin:
+        params['teacher_id'] = current_user.user_id
+    periods, series = trend_table(attendance_trends(**params))
+    # Echo the effective parameters (with defaults filled in) back into the form
+    form = {key: '' if value is None else str(value) for key, value in params.items()}
+    form['from'], form['to'] = form.pop('start'), form.pop('end')
+    return render_template('trends.html', error=None, form=form, periods=periods, series=series, **options)
@@ -0,0 +1,394 @@
+"""
+JSON API routes for the GroupProject Flask app.
+Versioned read-only API (/api/v1) for classes, students, attendance, statistics and trends.
+
+List and statistics endpoints are keyset-paginated (?after=<cursor>&limit=N, see
+services.pagination) and accept ?fields=a,b to select only those columns. Responses are
+serialized with orjson when it is installed, gzip-compressed for clients that accept it, and
+carry a weak ETag derived from the data generation (and, for class statistics, the start of the
+next class), so a poll with If-None-Match is answered with 304 before any list is read.
+Statistics pages are read from the SQL counter tables whichever analytics engine is selected.
+Admins see everything; teachers see their own classes and the students enrolled in them.
+Archived classes and students are left out of the class and student lists.
+"""
+
+from flask import Blueprint, Response, request, abort
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+from models import User, Student, Class, Attendance, Enrollment
+from services.generation import current_generation
+from services.pagination import decode_cursor, keyset_page
+from services.rollups import trend_args, attendance_trends
+from services.stats import class_stats_query, class_stats_row, next_class_start, student_stats_query, student_stats_row
+import datetime
+import functools
+import gzip
+import hashlib
+import json
+import operator
+
+try:
+    import orjson
+except ImportError:  # Optional: faster serialization
+    orjson = None
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+# Resource -> selectable fields (name -> column); the first field is the cursor key
+CLASS_FIELDS = {
+    'class_id': Class.class_id,
+    'title': Class.title,
+    'datetime': Class.datetime,
+    'teacher_id': Class.user.alias('teacher_id'),
+    'teacher': User.username.alias('teacher'),
+}
+STUDENT_FIELDS = {
+    'student_id': Student.student_id,
+    'name': Student.name,
+    'email': Student.email,
+    'grade': Student.grade,
+}
+ATTENDANCE_FIELDS = {
+    'attendance_id': Attendance.attendance_id,
+    'class_id': Attendance.class_ref.alias('class_id'),
+    'student_id': Attendance.student.alias('student_id'),
+    'attend': Attendance.attend,
+    'class_grade': Attendance.class_grade,
+}
+
+# =============================
+# Serialization
+# =============================
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def _dumps(payload):
+    """
+    Serialize a payload to JSON bytes (orjson if available).
+
+    Args:
+        payload: JSON-serializable data (datetimes are written in ISO 8601).
+    Returns:
+        bytes: JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+def _etag(*parts):
+    """
+    ETag for the current request: changes whenever data changes or a different user asks.
+
+    Args:
+        *parts: Further values the response depends on (e.g. a time boundary).
+    Returns:
+        str: Opaque tag value.
+    """
+    key = f'{current_generation()}|{current_user.user_id}|{current_user.is_admin}|{request.full_path}|{parts}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _respond(payload, etag=None, status=200):
+    """
+    Build a JSON response, gzip-compressed if the client accepts it.
+
+    Args:
+        payload: JSON-serializable data.
+        etag (str | None): ETag to attach.
+        status (int): HTTP status.
+    Returns:
+        Response: The response.
+    """
+    body = _dumps(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    if etag:
+        # Weak: the gzip and identity bodies are different representations of the same data
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _not_modified(etag):
+    """
+    304 response if the client already has this version.
+
+    Args:
+        etag (str): Current ETag.
+    Returns:
+        Response | None: 304 response, or None if the client's copy is stale.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+# =============================
+# Request Parsing
+# =============================
+def _fields(available):
+    """
+    Fields requested with ?fields=a,b (all fields by default).
+
+    Args:
+        available (dict): Selectable field names.
+    Returns:
+        list[str]: Requested field names in request order.
+    Raises:
+        400: If an unknown field is requested.
+    """
+    requested = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    if not requested:
+        return list(available)
+    unknown = [f for f in requested if f not in available]
+    if unknown:
+        abort(400, description=f"unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+def _limit():
+    """
+    Page size from ?limit=N, clamped to 1..MAX_LIMIT.
+
+    Returns:
+        int: Page size.
+    """
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+def _cursor(key_fields):
+    """
+    Page cursor from ?after= (None for the first page).
+
+    Args:
+        key_fields (list[Field]): Sort-key fields the cursor encodes.
+    Returns:
+        str | None: The cursor.
+    Raises:
+        400: If the cursor is malformed (rather than silently restarting at the first page).
+    """
+    cursor = request.args.get('after')
+    if cursor and decode_cursor(cursor, key_fields) is None:
+        abort(400, description='invalid cursor')
+    return cursor
+
+def _page(model, fields, available, scope=None, join_teacher=False):
+    """
+    Fetch one page of a resource, selecting only the requested columns.
+
+    Args:
+        model (Model): Resource model.
+        fields (list[str]): Requested field names.
+        available (dict): Field name -> column; the first entry is the cursor key.
+        scope (Expression | None): Filter applied to the query.
+        join_teacher (bool): Join User on Class.user (needed for the teacher name).
+    Returns:
+        dict: {'data': [...], 'next_cursor': str | None}.
+    Raises:
+        400: If the ?after= cursor is malformed.
+    """
+    key_name, key = next(iter(available.items()))
+    cursor = _cursor([key])
+    columns = [available[f] for f in fields if f != key_name]
+    query = model.select(key, *columns)
+    if join_teacher:
+        query = query.join(User, on=(Class.user == User.user_id))
+    if scope is not None:
+        query = query.where(scope)
+    rows, next_cursor = keyset_page(query.dicts(), [key], cursor, _limit())
+    if key_name not in fields:
+        for row in rows:
+            del row[key_name]
+    return {'data': rows, 'next_cursor': next_cursor}
+
+def _teacher_classes():
+    """
+    Subquery of the current teacher's class IDs.
+
+    Returns:
+        Select: Class IDs.
+    """
+    return Class.select(Class.class_id).where(Class.user == current_user.user_id)
+
+# =============================
+# Authentication and Errors
+# =============================
+@api_bp.before_request
+def require_login():
+    """
+    Reject unauthenticated API requests with 401 instead of a login redirect.
+    """
+    if not current_user.is_authenticated:
+        abort(401, description='login required')
+
+@api_bp.errorhandler(HTTPException)
+def api_error(error):
+    """
+    Render HTTP errors raised by API views as JSON.
+
+    Args:
+        error (HTTPException): The error.
+    Returns:
+        Response: JSON with an error message.
+    """
+    return _respond({'error': error.description}, status=error.code)
+
+# =============================
+# Resources
+# =============================
+@api_bp.route('/classes')
+def api_classes():
+    """
+    Active classes ordered by class_id (teachers: their own classes).
+    Optional filter: ?teacher_id=N (admin only).
+
+    Returns:
+        Response: JSON page of classes.
+    """
+    etag = _etag()
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    fields = _fields(CLASS_FIELDS)
+    if current_user.is_admin:
+        teacher_id = request.args.get('teacher_id', type=int)
+    else:
+        teacher_id = current_user.user_id
+    scope = Class.archived_at.is_null()
+    if teacher_id is not None:
+        scope &= (Class.user == teacher_id)
+    return _respond(_page(Class, fields, CLASS_FIELDS, scope, join_teacher='teacher' in fields), etag)
+
+@api_bp.route('/students')
+def api_students():
+    """
+    Active students ordered by student_id (teachers: students enrolled in their classes).
+
+    Returns:
+        Response: JSON page of students.
+    """
+    etag = _etag()
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    fields = _fields(STUDENT_FIELDS)
+    scope = Student.archived_at.is_null()
+    if not current_user.is_admin:
+        scope &= Student.student_id.in_(Enrollment.select(Enrollment.student)
+                                        .where(Enrollment.class_ref.in_(_teacher_classes())))
+    return _respond(_page(Student, fields, STUDENT_FIELDS, scope), etag)
+
+@api_bp.route('/attendance')
+def api_attendance():
+    """
+    Attendance rows ordered by attendance_id (teachers: rows of their classes).
+    Optional filters: ?class_id=N, ?student_id=N.
+
+    Returns:
+        Response: JSON page of attendance rows.
+    """
+    etag = _etag()
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    fields = _fields(ATTENDANCE_FIELDS)
+    conditions = []
+    class_id = request.args.get('class_id', type=int)
+    student_id = request.args.get('student_id', type=int)
+    if class_id is not None:
+        conditions.append(Attendance.class_ref == class_id)
+    if student_id is not None:
+        conditions.append(Attendance.student == student_id)
+    if not current_user.is_admin:
+        conditions.append(Attendance.class_ref.in_(_teacher_classes()))
+    scope = functools.reduce(operator.and_, conditions) if conditions else None
+    return _respond(_page(Attendance, fields, ATTENDANCE_FIELDS, scope), etag)
+
+# =============================
+# Statistics
+# =============================
+def _project(rows):
+    """
+    Apply ?fields= to already computed statistics rows.
+
+    Args:
+        rows (list[dict]): Statistics rows.
+    Returns:
+        list[dict]: Rows with only the requested keys.
+    """
+    if not rows:
+        return rows
+    fields = _fields(dict.fromkeys(rows[0]))
+    return [{f: row[f] for f in fields} for row in rows]
+
+@api_bp.route('/stats/classes')
+def api_class_stats():
+    """
+    Per-class attendance totals (as on the analytics page), ordered by class_id.
+
+    Returns:
+        Response: JSON page of class statistics.
+    """
+    teacher_id = None if current_user.is_admin else current_user.user_id
+    now = datetime.datetime.now()
+    # is_future also changes when the next class starts, so its start time is part of the tag
+    etag = _etag(next_class_start(teacher_id, now))
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    rows, next_cursor = keyset_page(class_stats_query(teacher_id), [Class.class_id],
+                                    _cursor([Class.class_id]), _limit())
+    data = [dict(class_id=c['class_id'], **class_stats_row(c, now, teacher_id is None)) for c in rows]
+    return _respond({'data': _project(data), 'next_cursor': next_cursor}, etag)
+
+@api_bp.route('/stats/students')
+def api_student_stats():
+    """
+    Per-student attended class counts (as on the analytics page), ordered by student_id.
+
+    Returns:
+        Response: JSON page of student statistics.
+    """
+    etag = _etag()
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    teacher_id = None if current_user.is_admin else current_user.user_id
+    rows, next_cursor = keyset_page(student_stats_query(teacher_id), [Student.student_id],
+                                    _cursor([Student.student_id]), _limit())
+    return _respond({'data': _project([student_stats_row(s) for s in rows]), 'next_cursor': next_cursor}, etag)
+
+@api_bp.route('/trends')
+def api_trends():
+    """
+    Weekly or monthly attendance totals and rates from the rollup tables (teachers: their
+    own classes). Parameters as in services.rollups.trend_args: granularity, group, from, to,
+    teacher_id (admin only), title and student_id.
+
+    Returns:
+        Response: JSON with the effective range and one row per (period, series).
+    Raises:
+        400: If a parameter is invalid.
+    """
+    etag = _etag()
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    try:
+        params = trend_args(request.args)
+    except ValueError as e:
+        abort(400, description=str(e))
+    if not current_user.is_admin:
+        params['teacher_id'] = current_user.user_id
+    return _respond({'granularity': params['granularity'], 'group': params['group'],
+                     'from': params['start'].isoformat(), 'to': params['end'].isoformat(),
+                     'data': _project(attendance_trends(**params))}, etag)
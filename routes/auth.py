@@ -1,12 +1,23 @@
 """
 Authentication routes for the GroupProject Flask app.
 Handles login and logout for all users.
+
+Login attempts pass a per-IP and a per-(username, IP) token bucket (services.rate_limit) before
+the user is looked up, so floods are rejected without any hashing work. The (username, IP)
+bucket includes the client IP, so a single client guessing someone else's password only uses
+up its own attempts. Wrong passwords are also charged to a per-username bucket shared by all
+IPs, with a larger burst, so guessing spread over many addresses is still limited per account. Passwords are checked with at most
+PASSWORD_HASH_WORKERS hashes running at once (services.passwords); unknown usernames are checked
+against a dummy hash so they take as long as real ones, and hashes made with outdated parameters
+are replaced after a successful login.
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from models import User
-from werkzeug.security import check_password_hash
+from services.passwords import HashingBusy, verify_password, needs_rehash, hash_password_pooled
+from services.rate_limit import login_failure_limiter, login_ip_limiter, login_user_limiter
+from services.user_cache import user_cache
 
 # Blueprint for authentication routes
 auth_bp = Blueprint('auth', __name__)
@@ -27,12 +38,26 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        user = User.get_or_none(User.username == username)
-        if not user:
-            error = 'User does not exist.'
-        elif not check_password_hash(user.password, password):
-            error = 'Incorrect password.'
+        ip_key = f'ip:{request.remote_addr}'
+        name_key = f'user:{username.strip().lower()}'
+        user_key = f'{name_key}|{ip_key}'  # Per client, so one client cannot lock the user out
+        if not login_ip_limiter.allow(ip_key):
+            return _too_many(login_ip_limiter.retry_after(ip_key))
+        if not login_user_limiter.allow(user_key):
+            return _too_many(login_user_limiter.retry_after(user_key))
+        failure_wait = login_failure_limiter.retry_after(name_key)  # Only failures take a token
+        if failure_wait:
+            return _too_many(failure_wait)
+        user = User.get_or_none(User.username == username, User.archived_at.is_null())  # Archived users cannot log in
+        try:
+            valid = verify_password(user.password if user else None, password)
+        except HashingBusy as e:
+            return render_template('auth.html', error=str(e)), 503, {'Retry-After': '1'}
+        if not valid:
+            login_failure_limiter.allow(name_key)
+            error = 'Invalid username or password.'
         else:
+            _upgrade_hash(user, password)
             login_user(user)
             # Redirect based on user role
             if user.is_admin:
@@ -41,6 +66,42 @@ def login():
                 return redirect(url_for('teacher.teacher_dashboard'))
     return render_template('auth.html', error=error)
 
+def _too_many(retry_after):
+    """
+    Reject a rate-limited login attempt.
+
+    Args:
+        retry_after (int): Seconds until the next attempt is allowed.
+    Returns:
+        tuple: Login page with a 429 status and a Retry-After header.
+    """
+    error = 'Too many login attempts. Please wait a moment and try again.'
+    return render_template('auth.html', error=error), 429, {'Retry-After': str(max(1, retry_after))}
+
+def _upgrade_hash(user, password):
+    """
+    Re-hash a password with the current parameters if it was stored with older ones.
+
+    The update only applies if the stored hash is unchanged, so a concurrent password
+    change is never overwritten. A busy hashing pool just postpones the upgrade.
+
+    Args:
+        user (User): The user who just logged in.
+        password (str): The verified plain-text password.
+    """
+    if not needs_rehash(user.password):
+        return
+    try:
+        hashed = hash_password_pooled(password)
+    except HashingBusy:
+        return
+    (User
+     .update(password=hashed)
+     .where((User.user_id == user.user_id) & (User.password == user.password))
+     .execute())
+    user.password = hashed
+    user_cache.invalidate(user.user_id)
+
 # =============================
 # Logout Route
 # =============================
@@ -0,0 +1,103 @@
+"""
+Background job routes for the GroupProject Flask app.
+Starts attendance exports in the background, reports their status, and serves the result.
+"""
+
+from flask import Blueprint, render_template, request, redirect, url_for, abort, jsonify, send_file
+from flask_login import login_required, current_user
+from models import Job
+from services.jobs import submit_attendance_export, can_access, job_status
+import os
+
+# Blueprint for background job routes
+jobs_bp = Blueprint('jobs', __name__)
+
+def _wants_json():
+    """
+    Whether the client asked for JSON rather than an HTML page.
+
+    Returns:
+        bool: True if JSON is preferred.
+    """
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def _get_job(job_id):
+    """
+    Load a job the current user may access.
+
+    Args:
+        job_id (int): The job ID.
+    Returns:
+        Job: The job.
+    Raises:
+        404: If the job does not exist or belongs to another teacher.
+    """
+    job = Job.get_or_none(Job.job_id == job_id)
+    if job is None or not can_access(job, current_user):
+        abort(404)
+    return job
+
+# =============================
+# Start Export
+# =============================
+@jobs_bp.route('/jobs/attendance_csv', methods=['POST'])
+@login_required
+def start_attendance_export():
+    """
+    Start a background attendance CSV export.
+    Admins export all classes; teachers export their own classes.
+    An identical export that is running, or finished since the last data change, is reused.
+
+    Returns:
+        Response: 202 JSON with the job status for JSON clients, otherwise a redirect to the status page.
+    """
+    teacher_id = None if current_user.is_admin else current_user.user_id
+    job, _ = submit_attendance_export(current_user.user_id, teacher_id)
+    if _wants_json():
+        status = job_status(job)
+        status['status_url'] = url_for('jobs.job_detail', job_id=job.job_id)
+        return jsonify(status), 202
+    return redirect(url_for('jobs.job_detail', job_id=job.job_id))
+
+# =============================
+# Job Status and Download
+# =============================
+@jobs_bp.route('/jobs/<int:job_id>')
+@login_required
+def job_detail(job_id):
+    """
+    Show a job's status (the HTML page refreshes itself until the job finishes).
+
+    Args:
+        job_id (int): The job ID.
+    Returns:
+        Response: JSON status for JSON clients, otherwise the rendered status page.
+    Raises:
+        404: If the job does not exist or belongs to another teacher.
+    """
+    job = _get_job(job_id)
+    status = job_status(job)
+    if status['ready']:
+        status['download_url'] = url_for('jobs.job_download', job_id=job.job_id)
+    if _wants_json():
+        return jsonify(status)
+    return render_template('job.html', job=job, status=status)
+
+@jobs_bp.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    """
+    Download a finished job's result file.
+
+    Args:
+        job_id (int): The job ID.
+    Returns:
+        Response: The CSV file as attachment.
+    Raises:
+        404: If the job does not exist, belongs to another teacher, or has no result (yet).
+    """
+    job = _get_job(job_id)
+    if job.status != 'done' or not job.file_path or not os.path.exists(job.file_path):
+        abort(404)
+    return send_file(os.path.abspath(job.file_path), mimetype='text/csv', as_attachment=True,
+                     download_name='attendance_export.csv')
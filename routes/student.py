@@ -1,17 +1,21 @@
 """
 Student profile routes for the GroupProject Flask app.
-Handles viewing and updating student progress and per-class grades.
+Handles viewing a student's attendance history and updating their progress and per-class grades.
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
-from models import Student, Attendance, Class
+from models import Student
+from services.attendance import save_grades
+from services.history import student_summary, student_timeline
 
 student_bp = Blueprint('student', __name__)
 
 @student_bp.route('/student/<int:student_id>', methods=['GET', 'POST'])
 def student_profile(student_id):
     """
-    Student profile page for viewing and updating overall and per-class grades.
+    Student profile page: attendance summary, a keyset-paginated timeline of the student's
+    classes (newest first, page cursor passed as after) and grade editing for the classes
+    on the current page.
 
     Args:
         student_id (int): The student's unique ID.
@@ -23,20 +27,15 @@ def student_profile(student_id):
     student = Student.get_or_none(Student.student_id == student_id)
     if not student:
         abort(404)
-    # Get all attended classes for this student
-    attended_classes = (Attendance.select(Attendance, Class)
-        .join(Class)
-        .where((Attendance.student == student) & (Attendance.attend == True)))
+    cursor = request.args.get('after')
     if request.method == 'POST':
-        # Update overall grade
-        student.grade = request.form.get('grade')
-        student.save()
-        # Update grades for attended classes
-        for att in attended_classes:
-            class_grade = request.form.get(f'class_grade_{att.class_ref.class_id}')
-            if class_grade is not None:
-                att.class_grade = class_grade
-                att.save()
+        # The form holds the grades of one timeline page; only those that differ
+        # from the stored ones are written, in one transaction
+        class_grades = {int(key[len('class_grade_'):]): value for key, value in request.form.items()
+                        if key.startswith('class_grade_') and key[len('class_grade_'):].isdigit()}
+        save_grades(student, request.form.get('grade'), class_grades)
         flash('Student progress updated!')
-        return redirect(url_for('student.student_profile', student_id=student_id))
-    return render_template('student_profile.html', student=student, attended_classes=attended_classes)
+        return redirect(url_for('student.student_profile', student_id=student_id, after=cursor or None))
+    timeline, next_cursor = student_timeline(student_id, cursor)
+    return render_template('student_profile.html', student=student, summary=student_summary(student_id),
+                           timeline=timeline, next_cursor=next_cursor)
@@ -3,12 +3,14 @@ Teacher routes for the GroupProject Flask app.
 Handles teacher dashboard, attendance management, and CSV export.
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from models import User, Student, Class, Attendance
+from services.attendance import save_attendance
+from services.enrollment import roster
+from services.exports import attendance_csv_response
+from services.view_cache import cached_view
 import datetime
-import io
-import csv
 
 # Blueprint for teacher routes
 teacher_bp = Blueprint('teacher', __name__)
@@ -18,10 +20,12 @@ teacher_bp = Blueprint('teacher', __name__)
 # =============================
 @teacher_bp.route('/teacher_dashboard')
 @login_required
+@cached_view
 def teacher_dashboard():
     """
     Teacher dashboard: view and manage your classes.
     Shows upcoming and past classes for the logged-in teacher.
+    The rendered page is cached until classes change (see services.view_cache).
 
     Returns:
         Response: Rendered template for teacher dashboard.
@@ -31,9 +35,10 @@ def teacher_dashboard():
     if current_user.is_admin:
         abort(403)  # Only teachers can access this dashboard
     now = datetime.datetime.now()
-    # Query upcoming and past classes for this teacher
-    classes_upcoming = Class.select().where((Class.user == current_user.user_id) & (Class.datetime >= now)).order_by(Class.datetime.asc())
-    classes_past = Class.select().where((Class.user == current_user.user_id) & (Class.datetime < now)).order_by(Class.datetime.desc())
+    # Query upcoming and past classes for this teacher (archived classes are left out)
+    own_classes = Class.select().where((Class.user == current_user.user_id) & Class.archived_at.is_null())
+    classes_upcoming = own_classes.where(Class.datetime >= now).order_by(Class.datetime.asc())
+    classes_past = own_classes.where(Class.datetime < now).order_by(Class.datetime.desc())
     return render_template('teachers.html', classes_upcoming=classes_upcoming, classes_past=classes_past)
 
 # =============================
@@ -45,6 +50,7 @@ def mark_attendance(class_id):
     """
     Mark or view attendance for a class (teacher only).
     Allows marking students as present or absent for a specific class.
+    Only students enrolled in the class are listed and saved.
 
     Args:
         class_id (int): The class session ID.
@@ -57,21 +63,19 @@ def mark_attendance(class_id):
     if current_user.is_admin:
         abort(403)
     # Ensure the class exists and belongs to the current teacher
-    class_obj = Class.get_or_none(Class.class_id == class_id, Class.user == current_user.user_id)
+    class_obj = Class.get_or_none(Class.class_id == class_id, Class.user == current_user.user_id,
+                                  Class.archived_at.is_null())
     if not class_obj:
         abort(404)
-    students = Student.select()
+    students = roster(class_obj.class_id)
     if request.method == 'POST':
-        # Update attendance for each student
-        for student in students:
-            attend = f'present_{student.student_id}' in request.form
-            att, created = Attendance.get_or_create(class_ref=class_obj, student=student)
-            att.attend = attend
-            att.save()
+        # Update attendance for the whole roster in a single bulk upsert
+        marks = {student.student_id: f'present_{student.student_id}' in request.form for student in students}
+        save_attendance(class_obj.class_id, marks)
         flash('Attendance updated!')
         return redirect(url_for('teacher.teacher_dashboard'))
     # Prepare attendance dictionary for template
-    attendance = {att.student.student_id: att.attend for att in Attendance.select().where(Attendance.class_ref == class_id)}
+    attendance = dict(Attendance.select(Attendance.student, Attendance.attend).where(Attendance.class_ref == class_id).tuples())
     return render_template('teachers.html', class_obj=class_obj, students=students, attendance=attendance)
 
 # =============================
@@ -85,26 +89,13 @@ def teacher_export_attendance_csv():
     Columns: Class Title, Date, Attendance Count, Attended Students (comma-separated).
     Only includes classes for the logged-in teacher.
 
+    The report is streamed as it is generated (see services.exports).
+
     Returns:
-        Response: CSV file download of attendance report.
+        Response: Streamed CSV file download of attendance report.
     Raises:
         403: If current user is admin (not a teacher).
     """
     if current_user.is_admin:
         abort(403)
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Class Title', 'Date', 'Attendance Count', 'Attended Students'])
-    # Sort classes by date
-    classes_sorted = Class.select().where(Class.user == current_user.user_id).order_by(Class.datetime)
-    for c in classes_sorted:
-        attended = Attendance.select().where((Attendance.class_ref == c) & (Attendance.attend == True))
-        names = ', '.join([a.student.name for a in attended])
-        writer.writerow([
-            c.title,
-            c.datetime.strftime('%Y-%m-%d %H:%M'),
-            attended.count(),
-            names
-        ])
-    output.seek(0)
-    return send_file(io.BytesIO(output.getvalue().encode()), mimetype='text/csv', as_attachment=True, download_name='attendance_report.csv')
+    return attendance_csv_response(teacher_id=current_user.user_id)
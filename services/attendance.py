@@ -0,0 +1,116 @@
+"""
+Attendance write helpers for the GroupProject Flask app.
+Saves attendance for many students at once, and a student's per-class grades.
+
+Rows are written with INSERT ... ON CONFLICT(class_ref, student) DO UPDATE in a single
+transaction, chunked so each statement stays under SQLite's bound-variable limit.
+Grades are diffed against the stored values and only changed rows are updated, with one
+UPDATE ... SET class_grade = CASE attendance_id ... per chunk.
+"""
+
+from peewee import EXCLUDED, Case, chunked, fn
+from models import db, Attendance, Student, SQLITE_MAX_VARIABLES
+from services.counters import record_attendance_changes
+from services.generation import bump_generation, row_stamp
+from services.rollups import record_rollup_changes
+
+# =============================
+# Bulk Attendance Writer
+# =============================
+def save_attendance(class_id, marks):
+    """
+    Insert or update attendance for a whole roster in one transaction.
+
+    Existing rows keep their class_grade; only new rows and rows whose attend flag changes
+    are written (and get a new row version). The materialized attendance counters, the
+    weekly/monthly rollups and the data generation are updated in the same transaction.
+    Re-submitting an unchanged sheet writes nothing and leaves the generation (and with it
+    cached pages, API ETags and the delta-export watermark) alone.
+
+    Args:
+        class_id (int): The class session ID.
+        marks (dict[int, bool]): Maps student_id to True if the student attended.
+    Returns:
+        int: Number of attendance rows inserted or changed.
+    """
+    batch_size = SQLITE_MAX_VARIABLES // 5  # five bound values per row
+    with db.atomic():
+        previous = dict(Attendance
+                        .select(Attendance.student, Attendance.attend)
+                        .where(Attendance.class_ref == class_id)
+                        .tuples())
+        changed = {student_id: bool(attend) for student_id, attend in marks.items()
+                   if student_id not in previous or previous[student_id] != bool(attend)}
+        if not changed:
+            return 0
+        stamp = row_stamp(bump_generation())
+        rows = [{'class_ref': class_id, 'student': student_id, 'attend': attend, **stamp}
+                for student_id, attend in changed.items()]
+        for batch in chunked(rows, batch_size):
+            (Attendance
+             .insert_many(batch)
+             .on_conflict(conflict_target=[Attendance.class_ref, Attendance.student],
+                          update={Attendance.attend: EXCLUDED.attend,
+                                  Attendance.version: EXCLUDED.version,
+                                  Attendance.updated_at: EXCLUDED.updated_at},
+                          where=(Attendance.attend != EXCLUDED.attend))
+             .execute())
+        record_attendance_changes(class_id, previous, changed)
+        record_rollup_changes(class_id, previous, changed)
+    return len(rows)
+
+def save_grades(student, grade, class_grades):
+    """
+    Update a student's overall grade and changed per-class grades in one transaction.
+
+    Only attended classes can be graded. Submitted grades equal to the stored value
+    (a missing grade counts as empty) are skipped. Only the rows of the submitted classes
+    are read, so saving one page of a long history does not load the rest.
+
+    Args:
+        student (Student): The student.
+        grade (str | None): New overall grade.
+        class_grades (dict[int, str]): class_id -> submitted grade; classes not present are left unchanged.
+    Returns:
+        int: Number of attendance rows updated.
+    """
+    with db.atomic():
+        changes = []
+        for class_ids in chunked(list(class_grades), SQLITE_MAX_VARIABLES - 2):
+            current = (Attendance
+                       .select(Attendance.attendance_id, Attendance.class_ref, Attendance.class_grade)
+                       .where((Attendance.student == student.student_id) & (Attendance.attend == True)
+                              & Attendance.class_ref.in_(class_ids))
+                       .tuples())
+            changes.extend((attendance_id, class_grades[class_id]) for attendance_id, class_id, old in current
+                           if class_grades[class_id] != (old or ''))
+        grade_changed = student.grade != grade
+        if not grade_changed and not changes:
+            return 0
+        stamp = row_stamp(bump_generation())
+        if grade_changed:
+            (Student
+             .update(grade=grade, **stamp)
+             .where(Student.student_id == student.student_id)
+             .execute())
+            student.grade = grade
+        # Three bound values per row (the CASE pair and the IN list entry), plus the stamp
+        for batch in chunked(changes, (SQLITE_MAX_VARIABLES - 2) // 3):
+            (Attendance
+             .update(class_grade=Case(Attendance.attendance_id, batch), **stamp)
+             .where(Attendance.attendance_id.in_([attendance_id for attendance_id, _ in batch]))
+             .execute())
+    return len(changes)
+
+def remove_duplicate_attendance():
+    """
+    Delete duplicate (class_ref, student) attendance rows, keeping the oldest one.
+    Needed before the unique index can be created on databases written by older versions.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    keep = (Attendance
+            .select(fn.MIN(Attendance.attendance_id))
+            .group_by(Attendance.class_ref, Attendance.student))
+    return Attendance.delete().where(Attendance.attendance_id.not_in(keep)).execute()
@@ -0,0 +1,443 @@
+"""
+Columnar analytics engine for the GroupProject Flask app.
+Computes the analytics figures with NumPy over in-memory column arrays instead of SQL.
+
+The engine keeps Class, Student and Attendance as compact arrays sorted by primary key
+(about 25 bytes per attendance row). The snapshot is tagged with the data generation; when
+that moves on, only the rows whose version is newer, plus the deletion log, are read (see
+services/generation.py) and merged in. Statistics are then vectorized reductions
+(bincount, percentile) over the arrays, so multi-year histories do not hit Python loops.
+
+NumPy is optional: the engine is only used when ANALYTICS_ENGINE = 'numpy' and numpy is
+installed (see services.stats.analytics_engine). Results match the SQL engine exactly;
+`python -m services.columnar --verify` checks this on a database.
+
+Usage:
+    python -m services.columnar [--database PATH] --verify   Compare with the SQL engine
+"""
+
+from models import db, configure_database, User, Student, Class, Attendance, Enrollment, Deletion
+from services.generation import current_generation
+import argparse
+import datetime
+import sys
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # Optional: the SQL engine is used instead
+    np = None
+
+# Percentiles reported by attendance_distribution (linear interpolation)
+PERCENTILES = (10, 25, 50, 75, 90)
+# Reload everything instead of merging when more than this share of rows changed
+FULL_RELOAD_RATIO = 0.25
+
+def numpy_available():
+    """
+    Whether NumPy is installed.
+
+    Returns:
+        bool: True if the columnar engine can be used.
+    """
+    return np is not None
+
+def rate(attended, total):
+    """
+    Attendance rate rounded for display and comparison.
+
+    Args:
+        attended (int): Present marks.
+        total (int): All marks.
+    Returns:
+        float | None: attended / total rounded to 4 places, or None if total is 0.
+    """
+    return round(attended / total, 4) if total else None
+
+# =============================
+# Snapshot
+# =============================
+class _Table:
+    """
+    Column arrays of one table, sorted by primary key.
+
+    Attributes:
+        ids (np.ndarray): Primary keys (int64, ascending).
+        columns (dict[str, np.ndarray]): Column name -> array aligned with ids.
+    """
+
+    def __init__(self, ids, columns):
+        self.ids = ids
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, rows, names, dtypes):
+        """
+        Build a table from (id, col1, col2, ...) tuples.
+
+        Args:
+            rows (list[tuple]): Query rows.
+            names (list[str]): Column names after the ID.
+            dtypes (list): NumPy dtype per column (object for strings).
+        Returns:
+            _Table: The table, sorted by ID.
+        """
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        columns = {}
+        for i, (name, dtype) in enumerate(zip(names, dtypes), start=1):
+            columns[name] = np.array([row[i] for row in rows], dtype=dtype)
+        order = np.argsort(ids, kind='stable')
+        return cls(ids[order], {name: array[order] for name, array in columns.items()})
+
+    def merge(self, changed, removed_ids):
+        """
+        New table with changed rows replaced or added and removed IDs dropped.
+
+        Args:
+            changed (_Table): Inserted or updated rows.
+            removed_ids (np.ndarray): Deleted primary keys.
+        Returns:
+            _Table: The merged table.
+        """
+        keep = ~np.isin(self.ids, np.concatenate([changed.ids, removed_ids]))
+        ids = np.concatenate([self.ids[keep], changed.ids])
+        order = np.argsort(ids, kind='stable')
+        columns = {name: np.concatenate([array[keep], changed.columns[name]])[order]
+                   for name, array in self.columns.items()}
+        return _Table(ids[order], columns)
+
+    def positions(self, keys):
+        """
+        Row positions of the given keys.
+
+        Args:
+            keys (np.ndarray): Primary keys to look up.
+        Returns:
+            np.ndarray: Position per key, -1 where the key is missing.
+        """
+        if not len(self.ids):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self.ids, keys)
+        pos[pos >= len(self.ids)] = 0
+        return np.where(self.ids[pos] == keys, pos, -1)
+
+# Column layout: name -> (model field, dtype)
+_CLASS_COLUMNS = {'teacher': (Class.user, 'int64'), 'title': (Class.title, object),
+                  'datetime': (Class.datetime, 'datetime64[us]'), 'archived': (Class.archived_at.is_null(False), 'bool')}
+_STUDENT_COLUMNS = {'name': (Student.name, object), 'email': (Student.email, object),
+                    'archived': (Student.archived_at.is_null(False), 'bool')}
+_ATTENDANCE_COLUMNS = {'class_id': (Attendance.class_ref, 'int64'), 'student_id': (Attendance.student, 'int64'),
+                       'attend': (Attendance.attend, 'bool')}
+_TABLES = {'class': (Class, Class.class_id, _CLASS_COLUMNS),
+           'student': (Student, Student.student_id, _STUDENT_COLUMNS),
+           'attendance': (Attendance, Attendance.attendance_id, _ATTENDANCE_COLUMNS)}
+
+def _read(entity, condition=None):
+    """
+    Read a table (or its changed rows) into column arrays.
+
+    Args:
+        entity (str): 'class', 'student' or 'attendance'.
+        condition (Expression | None): Row filter.
+    Returns:
+        _Table: The rows read.
+    """
+    model, key, columns = _TABLES[entity]
+    query = model.select(key, *(field for field, _ in columns.values()))
+    if condition is not None:
+        query = query.where(condition)
+    return _Table.from_rows(list(query.tuples()), list(columns), [dtype for _, dtype in columns.values()])
+
+class _Snapshot:
+    """
+    Column arrays of the analytics tables at one data generation, with derived counts.
+
+    Attributes:
+        generation (int): Data generation the arrays reflect.
+        tables (dict[str, _Table]): 'class', 'student' and 'attendance' tables.
+        teachers (dict[int, str]): Teacher user ID -> username (active non-admin users).
+        usernames (dict[int, str]): User ID -> username (all users).
+    """
+
+    def __init__(self, generation, tables, users):
+        self.generation = generation
+        self.tables = tables
+        self.usernames = {user_id: username for user_id, username, _, _ in users}
+        self.teachers = {user_id: username for user_id, username, is_admin, archived in users
+                         if not is_admin and not archived}
+        classes, attendance = tables['class'], tables['attendance']
+        # Attendance row -> class position (-1 for rows of deleted classes)
+        self.att_class = classes.positions(attendance.columns['class_id'])
+        linked = self.att_class >= 0
+        attend = attendance.columns['attend']
+        self.class_total = np.bincount(self.att_class[linked], minlength=len(classes.ids))
+        self.class_attended = np.bincount(self.att_class[linked], weights=attend[linked].astype(np.float64),
+                                          minlength=len(classes.ids)).astype(np.int64)
+        self.att_teacher = np.full(len(attendance.ids), -1, dtype=np.int64)
+        self.att_teacher[linked] = classes.columns['teacher'][self.att_class[linked]]
+
+# =============================
+# Engine
+# =============================
+class ColumnarStats:
+    """
+    NumPy implementation of the analytics statistics (same interface as services.stats).
+
+    Attributes:
+        name (str): Engine name ('numpy').
+        refreshes (dict): Number of 'full' and 'incremental' refreshes so far.
+    """
+    name = 'numpy'
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.refreshes = {'full': 0, 'incremental': 0}
+
+    def clear(self):
+        """
+        Drop the snapshot (the next call reloads everything).
+        """
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self):
+        """
+        Current snapshot, refreshed if the data generation moved on.
+
+        Returns:
+            _Snapshot: Arrays at the current generation.
+        """
+        with self._lock:
+            # One read transaction, so the generation and the rows read agree
+            with db.atomic():
+                generation = current_generation()
+                old = self._snapshot
+                if old is not None and old.generation == generation:
+                    return old
+                users = list(User.select(User.user_id, User.username, User.is_admin,
+                                         User.archived_at.is_null(False)).tuples())
+                tables = self._incremental(old, generation) if old is not None else None
+                if tables is None:
+                    tables = {entity: _read(entity) for entity in _TABLES}
+                    self.refreshes['full'] += 1
+                else:
+                    self.refreshes['incremental'] += 1
+                self._snapshot = _Snapshot(generation, tables, users)
+                return self._snapshot
+
+    def _incremental(self, old, generation):
+        """
+        Merge rows changed since the old snapshot into its tables.
+
+        Args:
+            old (_Snapshot): Previous snapshot.
+            generation (int): Current data generation.
+        Returns:
+            dict[str, _Table] | None: Merged tables, or None if a full reload is cheaper.
+        """
+        since = old.generation
+        deleted = {}
+        for entity, row_id in (Deletion
+                               .select(Deletion.entity, Deletion.row_id)
+                               .where((Deletion.version > since) & (Deletion.version <= generation))
+                               .tuples()):
+            deleted.setdefault(entity, []).append(row_id)
+        tables = {}
+        for entity, (model, _, _) in _TABLES.items():
+            changed = _read(entity, (model.version > since) & (model.version <= generation))
+            removed = np.array(deleted.get(entity, []), dtype=np.int64)
+            current = old.tables[entity]
+            if len(changed.ids) + len(removed) > FULL_RELOAD_RATIO * max(len(current.ids), 1):
+                return None
+            tables[entity] = current.merge(changed, removed) if len(changed.ids) or len(removed) else current
+        return tables
+
+    # -----------------------------
+    # Statistics
+    # -----------------------------
+    def class_stats(self, teacher_id=None, now=None):
+        """
+        Per-class attendance totals (see services.stats.class_stats).
+
+        Args:
+            teacher_id (int | None): Only include classes taught by this user. None for all classes.
+            now (datetime.datetime | None): Reference time for the is_future flag (defaults to now).
+        Returns:
+            list[dict]: One dict per class with title, date, total, attended and is_future keys,
+            plus teacher (username) when teacher_id is None.
+        """
+        snap = self.snapshot()
+        now = now or datetime.datetime.now()
+        classes = snap.tables['class']
+        teacher = classes.columns['teacher']
+        # Classes of deleted users are left out, as by the SQL join, and so are archived classes
+        mask = np.isin(teacher, np.fromiter(snap.usernames, dtype=np.int64, count=len(snap.usernames)))
+        mask &= ~classes.columns['archived']
+        if teacher_id is not None:
+            mask &= teacher == int(teacher_id)
+        idx = np.flatnonzero(mask)
+        when = classes.columns['datetime'][idx]
+        dates = np.datetime_as_string(when, unit='D')
+        future = when >= np.datetime64(now, 'us')
+        titles = classes.columns['title'][idx]
+        totals = snap.class_total[idx].tolist()
+        attended = snap.class_attended[idx].tolist()
+        stats = []
+        for i in range(len(idx)):
+            row = {
+                'title': titles[i],
+                'date': str(dates[i]),
+                'total': totals[i],
+                'attended': attended[i],
+                'is_future': bool(future[i])
+            }
+            if teacher_id is None:
+                row['teacher'] = snap.usernames[int(teacher[idx[i]])]
+            stats.append(row)
+        return stats
+
+    def _student_counts(self, snap, teacher_id):
+        """
+        Attended-class count per student row.
+
+        Args:
+            snap (_Snapshot): The snapshot.
+            teacher_id (int | None): Only count classes taught by this user.
+        Returns:
+            np.ndarray: Count per position in the student table.
+        """
+        students, attendance = snap.tables['student'], snap.tables['attendance']
+        present = attendance.columns['attend'].copy()
+        if teacher_id is not None:
+            present &= snap.att_teacher == int(teacher_id)
+        pos = students.positions(attendance.columns['student_id'][present])
+        return np.bincount(pos[pos >= 0], minlength=len(students.ids))
+
+    def student_stats(self, teacher_id=None):
+        """
+        Per-student count of attended classes (see services.stats.student_stats).
+
+        Args:
+            teacher_id (int | None): Only count attendance in classes taught by this user. None for all classes.
+        Returns:
+            list[dict]: One dict per student with name, email, attended and student_id keys.
+        """
+        snap = self.snapshot()
+        students = snap.tables['student']
+        counts = self._student_counts(snap, teacher_id)
+        active = ~students.columns['archived']
+        if teacher_id is not None:
+            # Rosters are not part of the snapshot; one indexed query gives the enrolled IDs
+            enrolled = [student_id for (student_id,) in (Enrollment
+                                                         .select(Enrollment.student)
+                                                         .join(Class, on=(Enrollment.class_ref == Class.class_id))
+                                                         .where((Class.user == teacher_id) & Class.archived_at.is_null())
+                                                         .distinct()
+                                                         .tuples())]
+            active &= np.isin(students.ids, np.array(enrolled, dtype=np.int64))
+        idx = np.flatnonzero(active)
+        ids = students.ids[idx].tolist()
+        names = students.columns['name'][idx]
+        emails = students.columns['email'][idx]
+        attended = counts[idx].tolist()
+        return [{
+            'name': names[i],
+            'email': emails[i],
+            'attended': attended[i],
+            'student_id': ids[i]
+        } for i in range(len(idx))]
+
+    def teacher_stats(self):
+        """
+        Per-teacher class and attendance totals (see services.stats.teacher_stats).
+
+        Returns:
+            list[dict]: One dict per teacher with teacher_id, teacher, classes, total,
+            attended and rate keys, ordered by teacher_id.
+        """
+        snap = self.snapshot()
+        teacher_ids = np.array(sorted(snap.teachers), dtype=np.int64)
+        teacher = snap.tables['class'].columns['teacher']
+        pos = np.searchsorted(teacher_ids, teacher)
+        pos[pos >= len(teacher_ids)] = 0
+        known = (teacher_ids[pos] == teacher) if len(teacher_ids) else np.zeros(len(teacher), dtype=bool)
+        known &= ~snap.tables['class'].columns['archived']
+        n = len(teacher_ids)
+        classes = np.bincount(pos[known], minlength=n).tolist()
+        total = np.bincount(pos[known], weights=snap.class_total[known], minlength=n).astype(np.int64).tolist()
+        attended = np.bincount(pos[known], weights=snap.class_attended[known], minlength=n).astype(np.int64).tolist()
+        return [{
+            'teacher_id': int(t),
+            'teacher': snap.teachers[int(t)],
+            'classes': classes[i],
+            'total': total[i],
+            'attended': attended[i],
+            'rate': rate(attended[i], total[i])
+        } for i, t in enumerate(teacher_ids)]
+
+    def attendance_distribution(self, teacher_id=None, now=None):
+        """
+        Percentiles of past classes' attendance rates and of students' attended counts
+        (see services.stats.attendance_distribution).
+
+        Args:
+            teacher_id (int | None): Only include this teacher's classes and students.
+            now (datetime.datetime | None): Boundary between past and upcoming classes.
+        Returns:
+            dict: class_rate and student_attended, each mapping 'p10'... to a value (None if empty).
+        """
+        snap = self.snapshot()
+        now = now or datetime.datetime.now()
+        classes = snap.tables['class']
+        teacher = classes.columns['teacher']
+        mask = np.isin(teacher, np.fromiter(snap.usernames, dtype=np.int64, count=len(snap.usernames)))
+        mask &= ~classes.columns['archived']
+        if teacher_id is not None:
+            mask &= teacher == int(teacher_id)
+        mask &= (classes.columns['datetime'] < np.datetime64(now, 'us')) & (snap.class_total > 0)
+        rates = snap.class_attended[mask] / snap.class_total[mask]
+        counts = np.array([row['attended'] for row in self.student_stats(teacher_id)], dtype=np.float64)
+        return {'class_rate': _percentiles(rates), 'student_attended': _percentiles(counts)}
+
+def _percentiles(values):
+    """
+    Linear-interpolation percentiles of an array.
+
+    Args:
+        values (np.ndarray): Values.
+    Returns:
+        dict[str, float | None]: 'p10'... -> value rounded to 4 places (None if empty).
+    """
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    result = np.percentile(values, PERCENTILES, method='linear')
+    return {f'p{p}': round(float(v), 4) for p, v in zip(PERCENTILES, result)}
+
+# Shared engine instance
+columnar_stats = ColumnarStats()
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the columnar analytics engine against the SQL engine.')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    parser.add_argument('--verify', action='store_true', help='Exit non-zero if any statistic differs')
+    args = parser.parse_args()
+    if np is None:
+        sys.exit('numpy is not installed')
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    from services.stats import verify_engine
+    if args.verify:
+        problems = verify_engine()
+        for problem in problems:
+            print(problem)
+        print('OK' if not problems else f'{len(problems)} mismatches')
+        db.close()
+        sys.exit(1 if problems else 0)
+    snap = columnar_stats.snapshot()
+    print({entity: len(table.ids) for entity, table in snap.tables.items()})
+    db.close()
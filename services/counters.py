@@ -0,0 +1,237 @@
+"""
+Materialized attendance counters for the GroupProject Flask app.
+Maintains ClassStats, StudentStats and StudentTeacherStats alongside the Attendance table.
+
+Every function that changes counters must be called inside the same transaction as the
+attendance or class change it reflects. rebuild_counters() recomputes everything from
+Attendance and is used to backfill new databases and repair drift.
+
+Usage:
+    python -m services.counters [--database PATH]   Rebuild all counters
+"""
+
+from peewee import EXCLUDED, chunked, fn
+from models import db, configure_database, Student, Class, Attendance, ClassStats, StudentStats, StudentTeacherStats
+from models import SQLITE_MAX_VARIABLES
+import argparse
+
+# =============================
+# Incremental Updates
+# =============================
+def record_attendance_changes(class_id, previous, marks):
+    """
+    Apply the counter changes caused by saving attendance for one class.
+
+    Args:
+        class_id (int): The class session ID.
+        previous (dict[int, bool]): student_id -> attend for rows that existed before the save.
+        marks (dict[int, bool]): student_id -> attend for the rows just written.
+    """
+    teacher_id = Class.select(Class.user).where(Class.class_id == class_id).scalar()
+    new_rows = sum(1 for student_id in marks if student_id not in previous)
+    deltas = {}
+    for student_id, attend in marks.items():
+        delta = int(bool(attend)) - int(bool(previous.get(student_id, False)))
+        if delta:
+            deltas[student_id] = delta
+    if new_rows or deltas:
+        (ClassStats
+         .insert(class_ref=class_id, total=new_rows, attended=sum(deltas.values()))
+         .on_conflict(conflict_target=[ClassStats.class_ref],
+                      update={ClassStats.total: ClassStats.total + EXCLUDED.total,
+                              ClassStats.attended: ClassStats.attended + EXCLUDED.attended})
+         .execute())
+    _add_student_counts(deltas, teacher_id)
+
+def record_attendance_removals(class_id, removed):
+    """
+    Apply the counter changes caused by deleting attendance rows of one class.
+
+    Args:
+        class_id (int): The class session ID.
+        removed (dict[int, bool]): student_id -> attend for the rows being deleted.
+    """
+    if not removed:
+        return
+    teacher_id = Class.select(Class.user).where(Class.class_id == class_id).scalar()
+    attended = [student_id for student_id, attend in removed.items() if attend]
+    (ClassStats
+     .update(total=ClassStats.total - len(removed), attended=ClassStats.attended - len(attended))
+     .where(ClassStats.class_ref == class_id)
+     .execute())
+    _add_student_counts({student_id: -1 for student_id in attended}, teacher_id)
+
+def record_bulk_removals(condition):
+    """
+    Apply the counter changes caused by deleting the attendance rows matching a condition
+    (any number of classes and students), with one grouped upsert per counter table.
+
+    Args:
+        condition (Expression): The Attendance rows being deleted.
+    """
+    (ClassStats
+     .insert_from(Attendance
+                  .select(Attendance.class_ref, 0 - fn.COUNT(Attendance.attendance_id), 0 - fn.SUM(Attendance.attend))
+                  .join(Class)
+                  .where(condition)
+                  .group_by(Attendance.class_ref),
+                  [ClassStats.class_ref, ClassStats.total, ClassStats.attended])
+     .on_conflict(conflict_target=[ClassStats.class_ref],
+                  update={ClassStats.total: ClassStats.total + EXCLUDED.total,
+                          ClassStats.attended: ClassStats.attended + EXCLUDED.attended})
+     .execute())
+    present = condition & (Attendance.attend == True)
+    (StudentStats
+     .insert_from(Attendance
+                  .select(Attendance.student, 0 - fn.COUNT(Attendance.attendance_id))
+                  .join(Student)
+                  .where(present)
+                  .group_by(Attendance.student),
+                  [StudentStats.student, StudentStats.attended])
+     .on_conflict(conflict_target=[StudentStats.student],
+                  update={StudentStats.attended: StudentStats.attended + EXCLUDED.attended})
+     .execute())
+    (StudentTeacherStats
+     .insert_from(Attendance
+                  .select(Attendance.student, Class.user, 0 - fn.COUNT(Attendance.attendance_id))
+                  .join(Class)
+                  .switch(Attendance)
+                  .join(Student)
+                  .where(present)
+                  .group_by(Attendance.student, Class.user),
+                  [StudentTeacherStats.student, StudentTeacherStats.teacher, StudentTeacherStats.attended])
+     .on_conflict(conflict_target=[StudentTeacherStats.student, StudentTeacherStats.teacher],
+                  update={StudentTeacherStats.attended: StudentTeacherStats.attended + EXCLUDED.attended})
+     .execute())
+
+def _add_student_counts(deltas, teacher_id):
+    """
+    Add per-student attended deltas to StudentStats and StudentTeacherStats.
+
+    Args:
+        deltas (dict[int, int]): student_id -> change in attended count.
+        teacher_id (int | None): Teacher whose per-student breakdown is updated (None to skip it).
+    """
+    rows = [{'student': student_id, 'attended': delta} for student_id, delta in deltas.items()]
+    for batch in chunked(rows, SQLITE_MAX_VARIABLES // 2):
+        (StudentStats
+         .insert_many(batch)
+         .on_conflict(conflict_target=[StudentStats.student],
+                      update={StudentStats.attended: StudentStats.attended + EXCLUDED.attended})
+         .execute())
+    if teacher_id is not None:
+        _add_teacher_counts(deltas, teacher_id)
+
+def _add_teacher_counts(deltas, teacher_id):
+    """
+    Add per-student attended deltas to one teacher's StudentTeacherStats rows.
+
+    Args:
+        deltas (dict[int, int]): student_id -> change in attended count.
+        teacher_id (int): The teacher.
+    """
+    rows = [{'student': student_id, 'teacher': teacher_id, 'attended': delta}
+            for student_id, delta in deltas.items() if delta]
+    for batch in chunked(rows, SQLITE_MAX_VARIABLES // 3):
+        (StudentTeacherStats
+         .insert_many(batch)
+         .on_conflict(conflict_target=[StudentTeacherStats.student, StudentTeacherStats.teacher],
+                      update={StudentTeacherStats.attended: StudentTeacherStats.attended + EXCLUDED.attended})
+         .execute())
+
+def _attendees(class_id):
+    """
+    Students marked present in a class.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        list[int]: Student IDs.
+    """
+    return [student_id for (student_id,) in (Attendance
+                                             .select(Attendance.student)
+                                             .where((Attendance.class_ref == class_id) & (Attendance.attend == True))
+                                             .tuples())]
+
+def move_class_teacher(class_id, old_teacher_id, new_teacher_id):
+    """
+    Move a class's attendees from one teacher's breakdown to another's (class reassigned).
+
+    Args:
+        class_id (int): The class session ID.
+        old_teacher_id (int): Previous teacher.
+        new_teacher_id (int): New teacher.
+    """
+    if int(old_teacher_id) == int(new_teacher_id):
+        return
+    attendees = _attendees(class_id)
+    _add_teacher_counts({student_id: -1 for student_id in attendees}, old_teacher_id)
+    _add_teacher_counts({student_id: 1 for student_id in attendees}, new_teacher_id)
+
+def forget_student(student_id):
+    """
+    Drop a deleted student's counters.
+
+    Args:
+        student_id (int): The student ID.
+    """
+    StudentStats.delete().where(StudentStats.student == student_id).execute()
+    StudentTeacherStats.delete().where(StudentTeacherStats.student == student_id).execute()
+
+def forget_teacher(teacher_id):
+    """
+    Drop a deleted teacher's per-student breakdown.
+
+    Args:
+        teacher_id (int): The teacher's user ID.
+    """
+    StudentTeacherStats.delete().where(StudentTeacherStats.teacher == teacher_id).execute()
+
+# =============================
+# Full Rebuild
+# =============================
+def rebuild_counters():
+    """
+    Recompute every counter table from Attendance in one transaction.
+
+    Returns:
+        dict: Number of ClassStats, StudentStats and StudentTeacherStats rows written.
+    """
+    with db.atomic():
+        ClassStats.delete().execute()
+        StudentStats.delete().execute()
+        StudentTeacherStats.delete().execute()
+        ClassStats.insert_from(
+            (Attendance
+             .select(Attendance.class_ref, fn.COUNT(Attendance.attendance_id), fn.SUM(Attendance.attend))
+             .group_by(Attendance.class_ref)),
+            [ClassStats.class_ref, ClassStats.total, ClassStats.attended]).execute()
+        StudentStats.insert_from(
+            (Attendance
+             .select(Attendance.student, fn.COUNT(Attendance.attendance_id))
+             .where(Attendance.attend == True)
+             .group_by(Attendance.student)),
+            [StudentStats.student, StudentStats.attended]).execute()
+        StudentTeacherStats.insert_from(
+            (Attendance
+             .select(Attendance.student, Class.user, fn.COUNT(Attendance.attendance_id))
+             .join(Class)
+             .where(Attendance.attend == True)
+             .group_by(Attendance.student, Class.user)),
+            [StudentTeacherStats.student, StudentTeacherStats.teacher, StudentTeacherStats.attended]).execute()
+    return {'class_stats': ClassStats.select().count(),
+            'student_stats': StudentStats.select().count(),
+            'student_teacher_stats': StudentTeacherStats.select().count()}
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the materialized attendance counters.')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    print('Rebuilt counters:', rebuild_counters())
+    db.close()
@@ -0,0 +1,369 @@
+"""
+Cascading deletes and archiving for the GroupProject Flask app.
+Retires classes, students and teachers together with the rows that depend on them.
+
+Archiving is the quick way out: it stamps archived_at on the row (and on a teacher's classes,
+one batch per transaction) and bumps the data generation. The dashboards, lists, analytics,
+search and API only read active rows, through partial indexes (WHERE archived_at IS NULL), so
+an archived history costs them nothing. Attendance of archived rows still counts in the totals
+of the active classes and students it belongs to, and restore() brings an archived row back.
+
+Purging deletes for good. The row is archived first, so it is hidden while its dependents go;
+attendance and roster rows are then deleted BATCH_SIZE at a time, each batch in its own short
+transaction that also updates the counters and rollups and logs the deletions (see
+services/generation.py), and the row itself goes last. Other writers only ever wait for one
+batch. An interrupted purge leaves an archived row, which purge() or purge_archived() finishes.
+
+Usage:
+    python -m services.deletion archive {class,student,teacher} ID [--database PATH]
+    python -m services.deletion restore {class,student,teacher} ID
+    python -m services.deletion purge {class,student,teacher} ID
+    python -m services.deletion purge-archived [--older-than DAYS]
+"""
+
+from peewee import SQL
+from models import db, configure_database, User, Student, Class, Attendance, Enrollment, ClassStats
+from models import SQLITE_MAX_VARIABLES
+from services.counters import forget_student, forget_teacher, record_bulk_removals
+from services.generation import bump_generation, log_deleted_rows, log_deletions, row_stamp
+from services.jobs import forget_teacher_jobs
+from services.rollups import forget_student_rollups, forget_teacher_rollups, record_bulk_rollup_removals
+from services.schedules import forget_teacher_schedules
+from services.user_cache import user_cache
+import argparse
+import datetime
+import json
+
+ENTITIES = ('class', 'student', 'teacher')
+# Attendance, roster or class rows deleted (or archived) per transaction
+BATCH_SIZE = 500
+
+# entity -> (model, primary key)
+_ROWS = {'class': (Class, Class.class_id), 'student': (Student, Student.student_id),
+         'teacher': (User, User.user_id)}
+
+def _row(entity, row_id):
+    """
+    Condition selecting one row of an entity (teachers only: admins cannot be archived or purged).
+
+    Args:
+        entity (str): One of ENTITIES.
+        row_id (int): Primary key.
+    Returns:
+        tuple[Model, Expression]: The model and the condition.
+    Raises:
+        ValueError: If the entity is unknown.
+    """
+    if entity not in _ROWS:
+        raise ValueError(f"entity must be one of: {', '.join(ENTITIES)}")
+    model, key = _ROWS[entity]
+    condition = key == row_id
+    if entity == 'teacher':
+        condition &= (User.is_admin == False)
+    return model, condition
+
+def _batch(batch_size):
+    """
+    Clamp a batch size to what one IN (...) list can hold.
+
+    Args:
+        batch_size (int): Requested rows per transaction.
+    Returns:
+        int: Rows per transaction.
+    """
+    return max(1, min(int(batch_size), SQLITE_MAX_VARIABLES))
+
+# =============================
+# Archiving
+# =============================
+def _set_classes_archived(teacher_id, current, value, batch_size):
+    """
+    Change archived_at on a teacher's classes, one batch per transaction.
+
+    Args:
+        teacher_id (int): The teacher's user ID.
+        current (datetime.datetime | None): Only change classes with this archived_at (None: active ones).
+        value (datetime.datetime | None): New archived_at.
+        batch_size (int): Classes per transaction.
+    Returns:
+        int: Number of classes changed.
+    """
+    changed = 0
+    while True:
+        with db.atomic():
+            class_ids = [class_id for (class_id,) in (Class
+                                                      .select(Class.class_id)
+                                                      .where((Class.user == teacher_id) & (Class.archived_at == current))
+                                                      .limit(batch_size)
+                                                      .tuples())]
+            if not class_ids:
+                return changed
+            (Class
+             .update(archived_at=value, **row_stamp(bump_generation()))
+             .where(Class.class_id.in_(class_ids))
+             .execute())
+        changed += len(class_ids)
+
+def archive(entity, row_id, batch_size=BATCH_SIZE):
+    """
+    Archive a class, student or teacher (a teacher's classes are archived with them).
+
+    Args:
+        entity (str): One of ENTITIES.
+        row_id (int): Primary key.
+        batch_size (int): Classes archived per transaction (teachers).
+    Returns:
+        bool: True if the row was archived, False if it does not exist or was already archived.
+    Raises:
+        ValueError: If the entity is unknown.
+    """
+    model, condition = _row(entity, row_id)
+    when = datetime.datetime.now()
+    with db.atomic():
+        if not model.select().where(condition & model.archived_at.is_null()).exists():
+            return False
+        version = bump_generation()
+        values = {'archived_at': when} if entity == 'teacher' else dict(row_stamp(version), archived_at=when)
+        model.update(**values).where(condition).execute()
+    if entity == 'teacher':
+        _set_classes_archived(row_id, None, when, _batch(batch_size))
+        user_cache.invalidate(row_id)
+    return True
+
+def restore(entity, row_id, batch_size=BATCH_SIZE):
+    """
+    Bring an archived class, student or teacher back (with the classes archived along with a teacher).
+
+    Args:
+        entity (str): One of ENTITIES.
+        row_id (int): Primary key.
+        batch_size (int): Classes restored per transaction (teachers).
+    Returns:
+        bool: True if the row was restored, False if it does not exist or is not archived.
+    Raises:
+        ValueError: If the entity is unknown.
+    """
+    model, condition = _row(entity, row_id)
+    with db.atomic():
+        archived_at = model.select(model.archived_at).where(condition).scalar()
+        if archived_at is None:
+            return False
+        version = bump_generation()
+        values = {'archived_at': None} if entity == 'teacher' else dict(row_stamp(version), archived_at=None)
+        model.update(**values).where(condition).execute()
+    if entity == 'teacher':
+        _set_classes_archived(row_id, archived_at, None, _batch(batch_size))
+        user_cache.invalidate(row_id)
+    return True
+
+# =============================
+# Purging
+# =============================
+def _purge_attendance(condition, batch_size):
+    """
+    Delete attendance rows one batch per transaction, updating counters and rollups as they go.
+
+    The counter, rollup and deletion log updates of a batch are grouped INSERT ... SELECT
+    statements over the batch's attendance IDs, so SQLite does the aggregation.
+
+    Args:
+        condition (Expression): Attendance rows to delete.
+        batch_size (int): Rows per transaction.
+    Returns:
+        int: Number of rows deleted.
+    """
+    removed = 0
+    batch = Attendance.select(Attendance.attendance_id).where(condition).limit(batch_size)
+    while True:
+        with db.atomic():
+            attendance_ids = [attendance_id for (attendance_id,) in batch.tuples()]
+            if not attendance_ids:
+                return removed
+            # The IDs go in as one JSON parameter, so every statement of the batch reads the same
+            # rows without re-running the search or binding one variable per ID
+            in_batch = Attendance.attendance_id.in_(
+                SQL('(SELECT "value" FROM json_each(?))', [json.dumps(attendance_ids)]))
+            record_bulk_removals(in_batch)
+            record_bulk_rollup_removals(in_batch)
+            log_deleted_rows('attendance', Attendance.attendance_id, in_batch, bump_generation())
+            removed += Attendance.delete().where(in_batch).execute()
+
+def _purge_enrollments(condition, batch_size):
+    """
+    Delete roster entries one batch per transaction.
+
+    Args:
+        condition (Expression): Enrollment rows to delete.
+        batch_size (int): Rows per transaction.
+    Returns:
+        int: Number of rows deleted.
+    """
+    removed = 0
+    batch = Enrollment.select(Enrollment.enrollment_id).where(condition).limit(batch_size)
+    while True:
+        with db.atomic():
+            count = Enrollment.delete().where(Enrollment.enrollment_id.in_(batch)).execute()
+            if not count:
+                return removed
+            bump_generation()
+        removed += count
+
+def _purge_classes(class_ids, batch_size):
+    """
+    Delete classes with their attendance and rosters.
+
+    Args:
+        class_ids (list[int]): Class IDs (at most SQLITE_MAX_VARIABLES).
+        batch_size (int): Dependent rows per transaction.
+    Returns:
+        dict: Number of attendance, enrollments and classes rows deleted.
+    """
+    counts = {'attendance': _purge_attendance(Attendance.class_ref.in_(class_ids), batch_size),
+              'enrollments': _purge_enrollments(Enrollment.class_ref.in_(class_ids), batch_size)}
+    with db.atomic():
+        ClassStats.delete().where(ClassStats.class_ref.in_(class_ids)).execute()
+        counts['classes'] = Class.delete().where(Class.class_id.in_(class_ids)).execute()
+        log_deletions('class', class_ids, bump_generation())
+    return counts
+
+def _add_counts(total, counts):
+    """
+    Add per-kind row counts to a running total.
+
+    Args:
+        total (dict[str, int]): Running total (updated in place).
+        counts (dict[str, int]): Counts to add.
+    Returns:
+        dict[str, int]: The total.
+    """
+    for name, count in counts.items():
+        total[name] = total.get(name, 0) + count
+    return total
+
+def _archived_ids(entity, cutoff=None):
+    """
+    IDs of archived rows of an entity (the partial archived_at indexes serve classes and students).
+
+    Args:
+        entity (str): One of ENTITIES.
+        cutoff (datetime.datetime | None): Only rows archived at or before this time.
+    Returns:
+        list[int]: Primary keys in ascending order.
+    """
+    model, key = _ROWS[entity]
+    query = model.select(key).where(model.archived_at.is_null(False)).order_by(key)
+    if cutoff is not None:
+        query = query.where(model.archived_at <= cutoff)
+    if entity == 'teacher':
+        query = query.where(User.is_admin == False)
+    return [row_id for (row_id,) in query.tuples()]
+
+def purge(entity, row_id, batch_size=BATCH_SIZE):
+    """
+    Delete a class, student or teacher with everything that depends on it, in short transactions.
+
+    A class takes its attendance and roster with it; a student their attendance, enrollments
+    and counters; a teacher their classes (as for a class), class series, counters, rollups and
+    export jobs.
+
+    Args:
+        entity (str): One of ENTITIES.
+        row_id (int): Primary key.
+        batch_size (int): Dependent rows per transaction.
+    Returns:
+        dict | None: Number of rows deleted per kind (attendance, enrollments, classes,
+        students, teachers), or None if the row does not exist.
+    Raises:
+        ValueError: If the entity is unknown.
+    """
+    model, condition = _row(entity, row_id)
+    batch_size = _batch(batch_size)
+    if not model.select().where(condition).exists():
+        return None
+    archive(entity, row_id, batch_size)  # Hidden from every hot query while its dependents go
+    counts = {'attendance': 0, 'enrollments': 0, 'classes': 0, 'students': 0, 'teachers': 0}
+    if entity == 'class':
+        return _add_counts(counts, _purge_classes([row_id], batch_size))
+    if entity == 'student':
+        counts['attendance'] = _purge_attendance(Attendance.student == row_id, batch_size)
+        counts['enrollments'] = _purge_enrollments(Enrollment.student == row_id, batch_size)
+        with db.atomic():
+            forget_student(row_id)
+            forget_student_rollups(row_id)
+            counts['students'] = Student.delete().where(condition).execute()
+            log_deletions('student', [row_id], bump_generation())
+        return counts
+    while True:
+        class_ids = [class_id for (class_id,) in (Class
+                                                  .select(Class.class_id)
+                                                  .where(Class.user == row_id)
+                                                  .order_by(Class.class_id)
+                                                  .limit(batch_size)
+                                                  .tuples())]
+        if not class_ids:
+            break
+        _add_counts(counts, _purge_classes(class_ids, batch_size))
+    with db.atomic():
+        forget_teacher(row_id)
+        forget_teacher_rollups(row_id)
+        forget_teacher_jobs(row_id)
+        forget_teacher_schedules(row_id)
+        counts['teachers'] = User.delete().where(condition).execute()
+        bump_generation()
+    user_cache.invalidate(row_id)
+    return counts
+
+def purge_archived(older_than=None, batch_size=BATCH_SIZE):
+    """
+    Purge every archived teacher, class and student (e.g. from a nightly job).
+
+    Args:
+        older_than (datetime.timedelta | None): Only purge rows archived at least this long ago.
+        batch_size (int): Dependent rows per transaction.
+    Returns:
+        dict: Number of rows deleted per kind (see purge()).
+    """
+    batch_size = _batch(batch_size)
+    cutoff = datetime.datetime.now() - older_than if older_than is not None else None
+    counts = {'attendance': 0, 'enrollments': 0, 'classes': 0, 'students': 0, 'teachers': 0}
+    # Teachers first: their classes go with them
+    for user_id in _archived_ids('teacher', cutoff):
+        _add_counts(counts, purge('teacher', user_id, batch_size))
+    class_ids = _archived_ids('class', cutoff)
+    for start in range(0, len(class_ids), batch_size):
+        _add_counts(counts, _purge_classes(class_ids[start:start + batch_size], batch_size))
+    for student_id in _archived_ids('student', cutoff):
+        _add_counts(counts, purge('student', student_id, batch_size))
+    return counts
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive, restore or purge classes, students and teachers.')
+    parser.add_argument('action', choices=['archive', 'restore', 'purge', 'purge-archived'])
+    parser.add_argument('entity', nargs='?', choices=ENTITIES)
+    parser.add_argument('id', nargs='?', type=int)
+    parser.add_argument('--older-than', type=float, default=None, metavar='DAYS',
+                        help='purge-archived: only rows archived at least this many days ago')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per transaction')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    args = parser.parse_args()
+    if args.action != 'purge-archived' and (args.entity is None or args.id is None):
+        parser.error(f'{args.action} needs an entity and an ID')
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    if args.action == 'purge-archived':
+        older_than = datetime.timedelta(days=args.older_than) if args.older_than is not None else None
+        print('Purged:', purge_archived(older_than, args.batch_size))
+    elif args.action == 'purge':
+        counts = purge(args.entity, args.id, args.batch_size)
+        if counts is None:
+            print(f'No such {args.entity}: {args.id}')
+        else:
+            print('Purged:', counts)
+    else:
+        done = (archive if args.action == 'archive' else restore)(args.entity, args.id, args.batch_size)
+        print(f'{args.action.capitalize()}d {args.entity} {args.id}' if done else 'Nothing to do')
+    db.close()
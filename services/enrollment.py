@@ -0,0 +1,170 @@
+"""
+Class roster helpers for the GroupProject Flask app.
+Enrolls students in classes (single sessions or a whole course series) and reads rosters.
+
+A course series is every class with the same teacher and title. New classes start with the
+roster of their series, so recurring courses only need to be enrolled once. Every attendance
+row belongs to an enrolled student: unenrolling deletes the student's attendance for that
+class and updates the attendance counters in the same transaction.
+"""
+
+from peewee import JOIN, chunked
+from models import db, Student, Class, Attendance, Enrollment, SQLITE_MAX_VARIABLES
+from services.counters import record_attendance_removals
+from services.rollups import record_rollup_removals
+from services.generation import bump_generation, log_deletions
+
+# =============================
+# Roster Queries
+# =============================
+def roster(class_id):
+    """
+    Active (not archived) students enrolled in a class.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        ModelSelect: Student query ordered by student_id.
+    """
+    return (Student
+            .select()
+            .join(Enrollment, on=(Enrollment.student == Student.student_id))
+            .where((Enrollment.class_ref == class_id) & Student.archived_at.is_null())
+            .order_by(Student.student_id))
+
+def series_class_ids(class_obj):
+    """
+    IDs of every class in the same course series (same teacher and title).
+
+    Args:
+        class_obj (Class): Any class of the series.
+    Returns:
+        list[int]: Class IDs, including class_obj's.
+    """
+    return [class_id for (class_id,) in (Class
+                                         .select(Class.class_id)
+                                         .where((Class.user == class_obj.user_id) & (Class.title == class_obj.title))
+                                         .tuples())]
+
+def student_ids_by_email(emails):
+    """
+    Look up students by email.
+
+    Args:
+        emails (Iterable[str]): Email addresses.
+    Returns:
+        dict[str, int]: email -> student_id for the addresses that exist.
+    """
+    found = {}
+    for batch in chunked(sorted(set(emails)), SQLITE_MAX_VARIABLES):
+        found.update(Student.select(Student.email, Student.student_id).where(Student.email.in_(batch)).tuples())
+    return found
+
+# =============================
+# Enrolling
+# =============================
+def enroll(class_ids, student_ids):
+    """
+    Enroll students in classes; existing enrollments are left as they are.
+
+    Args:
+        class_ids (list[int]): Class session IDs.
+        student_ids (list[int]): Student IDs.
+    Returns:
+        int: Number of (class, student) pairs requested.
+    """
+    rows = [{'class_ref': class_id, 'student': student_id}
+            for class_id in class_ids for student_id in student_ids]
+    with db.atomic():
+        for batch in chunked(rows, SQLITE_MAX_VARIABLES // 2):
+            Enrollment.insert_many(batch).on_conflict_ignore().execute()
+        if rows:
+            bump_generation()
+    return len(rows)
+
+def copy_series_roster(class_ids):
+    """
+    Enroll each class's series roster (students of other classes with the same teacher and title).
+    Call after creating classes, inside the same transaction.
+
+    Args:
+        class_ids (list[int] | Query): IDs of the new classes (a subquery is accepted).
+    Returns:
+        int: Number of enrollments added.
+    """
+    Series = Class.alias()
+    query = (Class
+             .select(Class.class_id, Enrollment.student)
+             .join(Series, on=((Series.user == Class.user) & (Series.title == Class.title)
+                               & (Series.class_id != Class.class_id)))
+             .join(Enrollment, on=(Enrollment.class_ref == Series.class_id))
+             .where(Class.class_id.in_(class_ids))
+             .distinct())
+    return (Enrollment
+            .insert_from(query, [Enrollment.class_ref, Enrollment.student])
+            .on_conflict_ignore()
+            .execute())
+
+def unenroll(class_ids, student_ids):
+    """
+    Remove students from class rosters, with their attendance in those classes.
+
+    Args:
+        class_ids (list[int]): Class session IDs.
+        student_ids (list[int]): Student IDs.
+    Returns:
+        int: Number of enrollments removed.
+    """
+    removed = 0
+    deleted_attendance = []
+    with db.atomic():
+        for class_batch in chunked(class_ids, SQLITE_MAX_VARIABLES // 2):
+            for student_batch in chunked(student_ids, SQLITE_MAX_VARIABLES // 2):
+                in_batch = ((Attendance.class_ref.in_(class_batch)) & (Attendance.student.in_(student_batch)))
+                per_class = {}
+                for attendance_id, class_id, student_id, attend in (Attendance
+                                                                    .select(Attendance.attendance_id, Attendance.class_ref,
+                                                                            Attendance.student, Attendance.attend)
+                                                                    .where(in_batch)
+                                                                    .tuples()):
+                    per_class.setdefault(class_id, {})[student_id] = attend
+                    deleted_attendance.append(attendance_id)
+                for class_id, rows in per_class.items():
+                    record_attendance_removals(class_id, rows)
+                    record_rollup_removals(class_id, rows)
+                Attendance.delete().where(in_batch).execute()
+                removed += (Enrollment
+                            .delete()
+                            .where((Enrollment.class_ref.in_(class_batch)) & (Enrollment.student.in_(student_batch)))
+                            .execute())
+        if removed:
+            log_deletions('attendance', deleted_attendance, bump_generation())
+    return removed
+
+def backfill_enrollments():
+    """
+    Enroll every student who has an attendance row, then give classes without a roster
+    the roster of their series. Used when upgrading databases created before enrollment.
+
+    Before rosters existed every attendance sheet listed all students, so classes that still
+    have no roster (one-off classes without attendance, typically upcoming ones) enroll every
+    student rather than starting empty.
+
+    Returns:
+        int: Number of enrollments after the backfill.
+    """
+    (Enrollment
+     .insert_from(Attendance.select(Attendance.class_ref, Attendance.student).distinct(),
+                  [Enrollment.class_ref, Enrollment.student])
+     .on_conflict_ignore()
+     .execute())
+    copy_series_roster(Class.select(Class.class_id).where(
+        Class.class_id.not_in(Enrollment.select(Enrollment.class_ref))))
+    (Enrollment
+     .insert_from(Class.select(Class.class_id, Student.student_id)
+                  .join(Student, JOIN.CROSS)
+                  .where(Class.class_id.not_in(Enrollment.select(Enrollment.class_ref))),
+                  [Enrollment.class_ref, Enrollment.student])
+     .on_conflict_ignore()
+     .execute())
+    return Enrollment.select().count()
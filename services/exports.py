@@ -0,0 +1,289 @@
+"""
+Attendance export helpers for the GroupProject Flask app.
+Streams the attendance CSV report for admins and teachers, and the incremental delta export.
+
+The report is generated from a single ordered join of Class, User, Attendance and Student.
+Rows are grouped per class as they arrive from the cursor and written out in small chunks,
+so memory use stays flat and the first bytes are sent before the query has finished.
+
+The delta export lists classes, students and attendance rows whose row version is newer than
+a client-supplied watermark, plus rows deleted since then (see services/generation.py).
+Archiving a row changes its version and fills its Archived At column. Each query reads an
+indexed version range, so its cost follows the number of changes, not history.
+"""
+
+from flask import Response, stream_with_context
+from peewee import JOIN
+from models import User, Student, Class, Attendance, Deletion
+from services.generation import current_generation
+import io
+import csv
+import heapq
+
+# Flush the CSV buffer to the client once it grows past this many characters
+CHUNK_SIZE = 16 * 1024
+
+# =============================
+# Query
+# =============================
+def attended_rows(teacher_id=None):
+    """
+    Ordered class/attendee rows for the attendance report.
+
+    Classes without attendees still yield one row with a None student name. Archived classes
+    are left out.
+
+    Args:
+        teacher_id (int | None): Only include classes taught by this user. None for all classes.
+    Returns:
+        Iterator[tuple]: (class_id, title, datetime, teacher username, student name) tuples,
+        ordered by class date with each class's attendees contiguous.
+    """
+    query = (Class
+             .select(Class.class_id, Class.title, Class.datetime, User.username, Student.name)
+             .join(User, on=(Class.user == User.user_id))
+             .switch(Class)
+             .join(Attendance, JOIN.LEFT_OUTER,
+                   on=((Attendance.class_ref == Class.class_id) & (Attendance.attend == True)))
+             .join(Student, JOIN.LEFT_OUTER, on=(Attendance.student == Student.student_id))
+             .where(Class.archived_at.is_null())
+             .order_by(Class.datetime, Class.class_id, Attendance.attendance_id))
+    if teacher_id is not None:
+        query = query.where(Class.user == teacher_id)
+    # iterator() skips peewee's result cache so rows are not kept in memory
+    return query.tuples().iterator()
+
+# =============================
+# CSV Generation
+# =============================
+def attendance_csv_chunks(teacher_id=None):
+    """
+    Generate the attendance report as CSV text chunks.
+    Columns: Class Title, Date, [Teacher,] Attendance Count, Attended Students (comma-separated).
+    The Teacher column is only included for the all-classes (admin) report.
+
+    Args:
+        teacher_id (int | None): Only include classes taught by this user. None for all classes.
+    Yields:
+        str: CSV text, starting with the header row.
+    """
+    with_teacher = teacher_id is None
+    output = io.StringIO()
+    writer = csv.writer(output)
+    header = ['Class Title', 'Date', 'Attendance Count', 'Attended Students']
+    if with_teacher:
+        header.insert(2, 'Teacher')
+    writer.writerow(header)
+    # Send the header straight away so the download starts immediately
+    yield _drain(output)
+
+    current, names = None, []
+
+    def write_class():
+        class_id, title, dt, username = current
+        row = [title, dt.strftime('%Y-%m-%d %H:%M'), len(names), ', '.join(names)]
+        if with_teacher:
+            row.insert(2, username)
+        writer.writerow(row)
+
+    for class_id, title, dt, username, student_name in attended_rows(teacher_id):
+        if current is None or current[0] != class_id:
+            if current is not None:
+                write_class()
+                if output.tell() >= CHUNK_SIZE:
+                    yield _drain(output)
+            current, names = (class_id, title, dt, username), []
+        if student_name is not None:
+            names.append(student_name)
+    if current is not None:
+        write_class()
+    yield _drain(output)
+
+def _drain(output):
+    """
+    Return the buffered CSV text and reset the buffer.
+
+    Args:
+        output (io.StringIO): The CSV buffer.
+    Returns:
+        str: Buffered text.
+    """
+    chunk = output.getvalue()
+    output.seek(0)
+    output.truncate(0)
+    return chunk
+
+def attendance_csv_response(teacher_id=None, download_name='attendance_report.csv'):
+    """
+    Streaming CSV download of the attendance report.
+
+    Args:
+        teacher_id (int | None): Only include classes taught by this user. None for all classes.
+        download_name (str): File name offered to the browser.
+    Returns:
+        Response: Streamed text/csv attachment.
+    """
+    return Response(stream_with_context(attendance_csv_chunks(teacher_id)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={download_name}'})
+
+# =============================
+# Delta Export
+# =============================
+DELTA_HEADER = ['Entity', 'Change', 'ID', 'Version', 'Updated At', 'Class ID', 'Student ID',
+                'Attended', 'Class Grade', 'Title', 'Date', 'Teacher', 'Name', 'Email', 'Grade', 'Archived At']
+
+def _stamp(value):
+    """
+    Format a timestamp for the delta export.
+
+    Args:
+        value (datetime.datetime | None): Timestamp.
+    Returns:
+        str: ISO 8601 to the second, or '' if value is None.
+    """
+    return value.isoformat(timespec='seconds') if value else ''
+
+def delta_rows(since, until):
+    """
+    Rows changed or deleted after one watermark, up to and including another.
+
+    Changes are merged in version order, so replaying them in sequence reproduces the final
+    state even when a deleted row's ID is reused by a later insert.
+
+    Args:
+        since (int): Watermark the client already has (-1 for everything).
+        until (int): Current watermark (data generation).
+    Returns:
+        Iterator[list]: CSV rows in DELTA_HEADER order, oldest change first.
+    """
+    return heapq.merge(_changed_classes(since, until), _changed_students(since, until),
+                       _changed_attendance(since, until), _deletions(since, until),
+                       key=lambda row: row[3])
+
+def _changed(model, since, until):
+    """
+    Filter selecting a versioned model's rows changed between two watermarks.
+
+    Args:
+        model (Model): Model with a version column.
+        since (int): Exclusive lower watermark.
+        until (int): Inclusive upper watermark.
+    Returns:
+        Expression: since < version <= until.
+    """
+    return (model.version > since) & (model.version <= until)
+
+def _changed_classes(since, until):
+    """
+    Delta export rows of classes inserted or updated between two watermarks, in version order.
+
+    Args:
+        since (int): Exclusive lower watermark.
+        until (int): Inclusive upper watermark.
+    Returns:
+        Iterator[list]: CSV rows in DELTA_HEADER order.
+    """
+    query = (Class
+             .select(Class.class_id, Class.version, Class.updated_at, Class.title, Class.datetime, User.username,
+                     Class.archived_at)
+             .join(User, JOIN.LEFT_OUTER, on=(Class.user == User.user_id))
+             .where(_changed(Class, since, until))
+             .order_by(Class.version, Class.class_id))
+    for class_id, version, updated_at, title, dt, username, archived_at in query.tuples().iterator():
+        yield ['class', 'upsert', class_id, version, _stamp(updated_at), class_id, '', '', '',
+               title, dt.strftime('%Y-%m-%d %H:%M'), username or '', '', '', '', _stamp(archived_at)]
+
+def _changed_students(since, until):
+    """
+    Delta export rows of students inserted or updated between two watermarks, in version order.
+
+    Args:
+        since (int): Exclusive lower watermark.
+        until (int): Inclusive upper watermark.
+    Returns:
+        Iterator[list]: CSV rows in DELTA_HEADER order.
+    """
+    query = (Student
+             .select(Student.student_id, Student.version, Student.updated_at, Student.name, Student.email, Student.grade,
+                     Student.archived_at)
+             .where(_changed(Student, since, until))
+             .order_by(Student.version, Student.student_id))
+    for student_id, version, updated_at, name, email, grade, archived_at in query.tuples().iterator():
+        yield ['student', 'upsert', student_id, version, _stamp(updated_at), '', student_id, '', '',
+               '', '', '', name, email, grade or '', _stamp(archived_at)]
+
+def _changed_attendance(since, until):
+    """
+    Delta export rows of attendance inserted or updated between two watermarks, in version order.
+
+    Args:
+        since (int): Exclusive lower watermark.
+        until (int): Inclusive upper watermark.
+    Returns:
+        Iterator[list]: CSV rows in DELTA_HEADER order.
+    """
+    query = (Attendance
+             .select(Attendance.attendance_id, Attendance.version, Attendance.updated_at,
+                     Attendance.class_ref, Attendance.student, Attendance.attend, Attendance.class_grade)
+             .where(_changed(Attendance, since, until))
+             .order_by(Attendance.version, Attendance.attendance_id))
+    for attendance_id, version, updated_at, class_id, student_id, attend, class_grade in query.tuples().iterator():
+        yield ['attendance', 'upsert', attendance_id, version, _stamp(updated_at), class_id, student_id,
+               int(bool(attend)), class_grade or '', '', '', '', '', '', '', '']
+
+def _deletions(since, until):
+    """
+    Delta export rows for deletions logged between two watermarks, in version order.
+
+    Args:
+        since (int): Exclusive lower watermark.
+        until (int): Inclusive upper watermark.
+    Returns:
+        Iterator[list]: CSV rows in DELTA_HEADER order.
+    """
+    query = (Deletion
+             .select(Deletion.entity, Deletion.row_id, Deletion.version, Deletion.deleted_at)
+             .where(_changed(Deletion, since, until))
+             .order_by(Deletion.version, Deletion.deletion_id))
+    for entity, row_id, version, deleted_at in query.tuples().iterator():
+        yield [entity, 'delete', row_id, version, _stamp(deleted_at)] + [''] * 11
+
+def attendance_delta_chunks(since, until):
+    """
+    Generate the delta export as CSV text chunks (header first).
+
+    Args:
+        since (int): Watermark the client already has (-1 for everything).
+        until (int): Current watermark.
+    Yields:
+        str: CSV text.
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(DELTA_HEADER)
+    yield _drain(output)
+    for row in delta_rows(since, until):
+        writer.writerow(row)
+        if output.tell() >= CHUNK_SIZE:
+            yield _drain(output)
+    yield _drain(output)
+
+def attendance_delta_response(since):
+    """
+    Streaming CSV download of everything changed after a watermark.
+
+    The new watermark is returned in the X-Watermark header (and the file name); pass it as
+    since on the next call. Changes committed while the export streams have a newer version
+    and are included next time.
+
+    Args:
+        since (int): Watermark from the previous export (-1 for a full export).
+    Returns:
+        Response: Streamed text/csv attachment.
+    """
+    until = current_generation()
+    return Response(stream_with_context(attendance_delta_chunks(since, until)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename=attendance_delta_{until}.csv',
+                             'X-Watermark': str(until)})
@@ -0,0 +1,84 @@
+"""
+Data generation counter for the GroupProject Flask app.
+
+Every write that changes data shown in reports (attendance, classes, students, teachers)
+calls bump_generation() inside its transaction. Caches remember the generation their result
+was computed at and treat it as stale once the counter moves on.
+
+The new generation also serves as the row version of the Attendance, Class and Student rows
+written by that transaction (see row_stamp()), and deletions are logged with it, so the
+delta export can return everything changed after a given generation (the watermark).
+"""
+
+from peewee import Value, chunked
+from models import DataGeneration, Deletion, SQLITE_MAX_VARIABLES
+import datetime
+
+# Counter bumped by all report-relevant writes
+DATA = 'data'
+
+def current_generation(name=DATA):
+    """
+    Current value of a generation counter.
+
+    Args:
+        name (str): Counter name.
+    Returns:
+        int: The generation (0 if never bumped).
+    """
+    value = DataGeneration.select(DataGeneration.value).where(DataGeneration.name == name).scalar()
+    return value or 0
+
+def bump_generation(name=DATA):
+    """
+    Increment a generation counter (call inside the writing transaction).
+
+    Args:
+        name (str): Counter name.
+    Returns:
+        int: The new generation.
+    """
+    (DataGeneration
+     .insert(name=name, value=1)
+     .on_conflict(conflict_target=[DataGeneration.name],
+                  update={DataGeneration.value: DataGeneration.value + 1})
+     .execute())
+    return current_generation(name)
+
+def row_stamp(version):
+    """
+    Version columns for a row written at the given generation.
+
+    Args:
+        version (int): Generation returned by bump_generation() in the same transaction.
+    Returns:
+        dict: version and updated_at values (usable in insert rows and update() calls).
+    """
+    return {'version': version, 'updated_at': datetime.datetime.now()}
+
+def log_deletions(entity, row_ids, version):
+    """
+    Record deleted rows for the delta export (call inside the deleting transaction).
+
+    Args:
+        entity (str): 'class', 'student' or 'attendance'.
+        row_ids (Iterable[int]): Primary keys of the deleted rows.
+        version (int): Generation returned by bump_generation() in the same transaction.
+    """
+    rows = [{'entity': entity, 'row_id': row_id, 'version': version} for row_id in row_ids]
+    for batch in chunked(rows, SQLITE_MAX_VARIABLES // 3):
+        Deletion.insert_many(batch).execute()
+
+def log_deleted_rows(entity, key, condition, version):
+    """
+    Record the rows matching a condition as deleted, with one INSERT ... SELECT
+    (call inside the deleting transaction, before the rows are deleted).
+
+    Args:
+        entity (str): 'class', 'student' or 'attendance'.
+        key (Field): Primary key of the entity's model.
+        condition (Expression): The rows being deleted.
+        version (int): Generation returned by bump_generation() in the same transaction.
+    """
+    rows = key.model.select(Value(entity), key, Value(version), Value(datetime.datetime.now())).where(condition)
+    Deletion.insert_from(rows, [Deletion.entity, Deletion.row_id, Deletion.version, Deletion.deleted_at]).execute()
@@ -0,0 +1,88 @@
+"""
+Student attendance history for the GroupProject Flask app.
+Summary and keyset-paged timeline of one student's attendance, for the student profile page.
+
+The summary (classes marked, attended, attendance rate and grade distribution) comes from a
+single grouped query over the student's attendance rows. The timeline lists the student's
+classes newest first, one page at a time, continuing after the (Class.datetime, class_id) of
+the last row shown (see services.pagination); each page is one query with the class and
+teacher joined in.
+"""
+
+from peewee import fn
+from models import Attendance, Class, User
+from services.pagination import PAGE_SIZE, keyset_page
+
+# Sort key of the timeline: class time, then class_id (a student has one row per class)
+TIMELINE_KEY = [Class.datetime, Class.class_id]
+
+# =============================
+# Summary
+# =============================
+def _grade_order(grade):
+    """
+    Sort key for grades: numeric grades in numeric order, then other grades alphabetically.
+
+    Args:
+        grade (str): A grade.
+    Returns:
+        tuple: Sort key.
+    """
+    try:
+        return 0, float(grade), ''
+    except ValueError:
+        return 1, 0.0, grade
+
+def student_summary(student_id):
+    """
+    Attendance totals and grade distribution of a student (one grouped query).
+
+    Args:
+        student_id (int): The student.
+    Returns:
+        dict: total (classes marked), attended, rate (None if no classes), grades (list of
+        (grade, attended classes with that grade), in _grade_order) and ungraded
+        (attended classes without a grade).
+    """
+    rows = (Attendance
+            .select(Attendance.class_grade, fn.COUNT(Attendance.attendance_id), fn.SUM(Attendance.attend))
+            .where(Attendance.student == student_id)
+            .group_by(Attendance.class_grade)
+            .tuples())
+    total = attended = ungraded = 0
+    grades = []
+    for grade, count, present in rows:
+        present = present or 0
+        total += count
+        attended += present
+        if not grade:
+            ungraded += present
+        elif present:
+            grades.append((grade, present))
+    grades.sort(key=lambda item: _grade_order(item[0]))
+    return {'total': total, 'attended': attended, 'rate': attended / total if total else None,
+            'grades': grades, 'ungraded': ungraded}
+
+# =============================
+# Timeline
+# =============================
+def student_timeline(student_id, cursor=None, per_page=PAGE_SIZE):
+    """
+    One page of a student's attendance, newest class first.
+
+    Args:
+        student_id (int): The student.
+        cursor (str | None): Cursor of the previous page, or None for the newest classes.
+        per_page (int): Rows per page.
+    Returns:
+        tuple[list[dict], str | None]: Rows (class_id, title, datetime, teacher, attend,
+        class_grade) and the cursor of the next (older) page, or None on the last page.
+    """
+    query = (Attendance
+             .select(Class.class_id, Class.title, Class.datetime, User.username.alias('teacher'),
+                     Attendance.attend, Attendance.class_grade)
+             .join(Class, on=(Attendance.class_ref == Class.class_id))
+             .join(User, on=(Class.user == User.user_id))
+             .where(Attendance.student == student_id)
+             .dicts())
+    return keyset_page(query, TIMELINE_KEY, cursor, per_page, descending=True)
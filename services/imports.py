@@ -0,0 +1,424 @@
+"""
+Bulk CSV import for the GroupProject Flask app.
+Loads students, teachers, class schedules and recurring class series from CSV files.
+
+The file is parsed as a stream and handled in batches: each batch is validated with one
+lookup query per unique column and inserted with insert_many inside one IMMEDIATE transaction,
+so no other writer can take a username or book a teacher between the check and the insert.
+Invalid rows are skipped and reported with their line number. Teacher passwords are hashed
+on the shared password pool (services.passwords, so imports and logins together stay within
+PASSWORD_HASH_WORKERS) before the transaction starts.
+
+Expected columns (header row required):
+    students: name, email
+    teachers: username, password
+    classes:  title, datetime (YYYY-MM-DD HH:MM), teacher (username)
+    series:   title, teacher (username), first (YYYY-MM-DD HH:MM), until (YYYY-MM-DD),
+              optional repeat (weekly or biweekly, default weekly), days (e.g. "MO WE")
+              and skip (dates without a session, e.g. "2025-12-22 2025-12-29")
+
+A class, or a series with a session, that would double-book the teacher is rejected (see
+services/schedules.py); a series' sessions are created up to the horizon as it is inserted.
+
+Usage:
+    python -m services.imports {students,teachers,classes,series} FILE [--database PATH]
+"""
+
+from peewee import IntegrityError, chunked, fn
+from models import db, configure_database, User, Student, Class, Schedule, SQLITE_MAX_VARIABLES
+from services.enrollment import copy_series_roster
+from services.generation import bump_generation, row_stamp
+from services.passwords import hash_passwords_pooled
+from services.schedules import REPEAT_INTERVALS, ensure_available, expand_new_schedules, parse_dates, schedule_fields, series_sessions
+import argparse
+import csv
+import datetime
+import io
+
+# Rows validated and inserted per transaction
+BATCH_SIZE = 500
+# Only the first errors are kept in the report; the rest are counted
+MAX_REPORTED_ERRORS = 200
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S')
+
+# =============================
+# Import Report
+# =============================
+class ImportReport:
+    """
+    Outcome of a CSV import.
+
+    Attributes:
+        kind (str): What was imported (students, teachers or classes).
+        inserted (int): Number of rows inserted.
+        failed (int): Number of rows rejected.
+        errors (list[tuple[int, str]]): (line number, message) for the first rejected rows.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        """
+        Record a rejected row.
+
+        Args:
+            line (int): Line number in the CSV file (the header is line 1).
+            message (str): Why the row was rejected.
+        """
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+# =============================
+# Row Validation
+# =============================
+def _required(row, columns):
+    """
+    Return the stripped values of required columns, or raise if any is empty.
+
+    Args:
+        row (dict): CSV row.
+        columns (tuple[str]): Required column names.
+    Returns:
+        list[str]: Column values in order.
+    Raises:
+        ValueError: If a column is missing or blank.
+    """
+    values = [(row.get(c) or '').strip() for c in columns]
+    missing = [c for c, v in zip(columns, values) if not v]
+    if missing:
+        raise ValueError('missing ' + ', '.join(missing))
+    return values
+
+def _parse_datetime(value):
+    """
+    Parse a class date/time in one of DATETIME_FORMATS.
+
+    Args:
+        value (str): Date/time text.
+    Returns:
+        datetime.datetime: Parsed value.
+    Raises:
+        ValueError: If the value matches none of the formats.
+    """
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f'invalid datetime {value!r} (expected YYYY-MM-DD HH:MM)')
+
+def _validate_students(batch, report):
+    """
+    Validate a batch of student rows.
+
+    Args:
+        batch (list[tuple[int, dict]]): (line, row) pairs.
+        report (ImportReport): Collects rejected rows.
+    Returns:
+        list[tuple[int, dict]]: (line, insert data) for valid rows.
+    """
+    parsed = []
+    for line, row in batch:
+        try:
+            name, email = _required(row, ('name', 'email'))
+            parsed.append((line, {'name': name, 'email': email}))
+        except ValueError as e:
+            report.reject(line, str(e))
+    taken = {e for (e,) in Student.select(Student.email)
+             .where(Student.email.in_([data['email'] for _, data in parsed])).tuples()}
+    return _unique(parsed, 'email', taken, report)
+
+def _hash_passwords(batch):
+    """
+    Replace the passwords of a batch of teacher rows with their hashes, before the batch's
+    write transaction starts (hashing dominates the cost of a teacher import).
+
+    Args:
+        batch (list[tuple[int, dict]]): (line, row) pairs, updated in place.
+    """
+    rows = [row for _, row in batch if (row.get('password') or '').strip()]
+    hashes = hash_passwords_pooled([row['password'].strip() for row in rows])
+    for row, hashed in zip(rows, hashes):
+        row['password'] = hashed
+
+def _validate_teachers(batch, report):
+    """
+    Validate a batch of teacher rows (passwords already hashed by _hash_passwords).
+
+    Args:
+        batch (list[tuple[int, dict]]): (line, row) pairs.
+        report (ImportReport): Collects rejected rows.
+    Returns:
+        list[tuple[int, dict]]: (line, insert data) for valid rows.
+    """
+    parsed = []
+    for line, row in batch:
+        try:
+            username, password = _required(row, ('username', 'password'))
+            parsed.append((line, {'username': username, 'password': password, 'is_admin': False}))
+        except ValueError as e:
+            report.reject(line, str(e))
+    taken = {u for (u,) in User.select(User.username)
+             .where(User.username.in_([data['username'] for _, data in parsed])).tuples()}
+    return _unique(parsed, 'username', taken, report)
+
+def _validate_classes(batch, report):
+    """
+    Validate a batch of class schedule rows, resolve teacher usernames (active teachers only) and
+    check them for double-booking, against the database and the rows accepted earlier in the batch.
+
+    Args:
+        batch (list[tuple[int, dict]]): (line, row) pairs.
+        report (ImportReport): Collects rejected rows.
+    Returns:
+        list[tuple[int, dict]]: (line, insert data) for valid rows.
+    """
+    parsed = []
+    for line, row in batch:
+        try:
+            title, when, teacher = _required(row, ('title', 'datetime', 'teacher'))
+            parsed.append((line, {'title': title, 'datetime': _parse_datetime(when), 'user': teacher}))
+        except ValueError as e:
+            report.reject(line, str(e))
+    teacher_ids = dict(User.select(User.username, User.user_id)
+                       .where((User.username.in_([data['user'] for _, data in parsed])) & (User.is_admin == False)
+                              & User.archived_at.is_null())
+                       .tuples())
+    valid = []
+    booked = {}  # teacher_id -> (start, title) of the classes accepted so far in this batch
+    for line, data in parsed:
+        if data['user'] not in teacher_ids:
+            report.reject(line, f"unknown teacher {data['user']!r}")
+            continue
+        data['user'] = teacher_ids[data['user']]
+        try:
+            ensure_available(data['user'], [data['datetime']], booked=booked.get(data['user'], ()))
+        except ValueError as e:
+            report.reject(line, str(e))
+            continue
+        booked.setdefault(data['user'], []).append((data['datetime'], data['title']))
+        valid.append((line, data))
+    return valid
+
+def _validate_series(batch, report):
+    """
+    Validate a batch of recurring class series and check them for double-booking.
+
+    Sessions are checked against the database and against the series accepted earlier in the
+    batch (they are not inserted yet).
+
+    Args:
+        batch (list[tuple[int, dict]]): (line, row) pairs.
+        report (ImportReport): Collects rejected rows.
+    Returns:
+        list[tuple[int, dict]]: (line, insert data) for valid rows.
+    """
+    parsed = []
+    for line, row in batch:
+        try:
+            title, teacher, first, until = _required(row, ('title', 'teacher', 'first', 'until'))
+            repeat = (row.get('repeat') or '').strip().lower() or 'weekly'
+            if repeat not in REPEAT_INTERVALS:
+                raise ValueError(f'invalid repeat {repeat!r} (expected weekly or biweekly)')
+            try:
+                until = datetime.date.fromisoformat(until)
+            except ValueError:
+                raise ValueError(f'invalid until {until!r} (expected YYYY-MM-DD)') from None
+            data = schedule_fields(teacher, title, _parse_datetime(first), until, REPEAT_INTERVALS[repeat],
+                                   row.get('days') or '', parse_dates(row.get('skip') or ''))
+            parsed.append((line, data))
+        except ValueError as e:
+            report.reject(line, str(e))
+    teacher_ids = dict(User.select(User.username, User.user_id)
+                       .where((User.username.in_([data['user'] for _, data in parsed])) & (User.is_admin == False)
+                              & User.archived_at.is_null())
+                       .tuples())
+    valid = []
+    booked = {}  # teacher_id -> (start, title) of the sessions accepted so far in this batch
+    for line, data in parsed:
+        if data['user'] not in teacher_ids:
+            report.reject(line, f"unknown teacher {data['user']!r}")
+            continue
+        data['user'] = teacher_ids[data['user']]
+        sessions = series_sessions(Schedule(**data))
+        try:
+            if not sessions:
+                raise ValueError('every session of the series falls on an exception date')
+            ensure_available(data['user'], sessions, booked=booked.get(data['user'], ()))
+        except ValueError as e:
+            report.reject(line, str(e))
+            continue
+        booked.setdefault(data['user'], []).extend((start, data['title']) for start in sessions)
+        valid.append((line, data))
+    return valid
+
+def _unique(parsed, column, taken, report):
+    """
+    Drop rows whose unique column already exists in the database or earlier in the batch.
+
+    Args:
+        parsed (list[tuple[int, dict]]): (line, insert data) pairs.
+        column (str): Name of the unique column.
+        taken (set): Values already present in the database.
+        report (ImportReport): Collects rejected rows.
+    Returns:
+        list[tuple[int, dict]]: Rows with a new, unique value.
+    """
+    valid = []
+    for line, data in parsed:
+        if data[column] in taken:
+            report.reject(line, f'{column} {data[column]!r} already exists')
+            continue
+        taken.add(data[column])
+        valid.append((line, data))
+    return valid
+
+def _enroll_new_classes(first_id):
+    """
+    Give newly imported classes the roster of their course series.
+
+    Args:
+        first_id (int): Smallest class_id inserted by the current transaction.
+    """
+    copy_series_roster(Class.select(Class.class_id).where(Class.class_id >= first_id))
+
+# Import kind -> (model, batch preparation run before the transaction, batch validator,
+# after-insert hook called with the first new primary key)
+IMPORTERS = {
+    'students': (Student, None, _validate_students, None),
+    'teachers': (User, _hash_passwords, _validate_teachers, None),
+    'classes': (Class, None, _validate_classes, _enroll_new_classes),
+    'series': (Schedule, None, _validate_series, expand_new_schedules),
+}
+
+# =============================
+# Import Runner
+# =============================
+def _insert(model, valid, report, after_insert=None):
+    """
+    Insert validated rows, falling back to row-by-row on conflicts. Must be called inside the
+    batch's transaction (see _import_batch); each attempt runs in a savepoint.
+
+    Args:
+        model (Model): Target model.
+        valid (list[tuple[int, dict]]): (line, insert data) pairs.
+        report (ImportReport): Collects inserted and rejected rows.
+        after_insert (Callable[[int], None] | None): Called with the first new primary key.
+    """
+    if not valid:
+        return
+    pk = model._meta.primary_key
+    # Versioned models (see services/generation.py) get the transaction's row stamp
+    versioned = 'version' in model._meta.fields
+    try:
+        with db.atomic():
+            stamp = row_stamp(bump_generation())
+            rows = [dict(data, **stamp) if versioned else data for _, data in valid]
+            first_id = (model.select(fn.MAX(pk)).scalar() or 0) + 1
+            for batch in chunked(rows, max(1, SQLITE_MAX_VARIABLES // len(rows[0]))):
+                model.insert_many(batch).execute()
+            if after_insert:
+                after_insert(first_id)
+        report.inserted += len(valid)
+    except IntegrityError:
+        # A constraint the validator does not check; find the offending rows one by one
+        for line, data in valid:
+            try:
+                with db.atomic():
+                    stamp = row_stamp(bump_generation())
+                    new_id = model.insert(dict(data, **stamp) if versioned else data).execute()
+                    if after_insert:
+                        after_insert(new_id)
+                report.inserted += 1
+            except IntegrityError as e:
+                report.reject(line, str(e))
+
+def _import_batch(kind, batch, report):
+    """
+    Validate and insert one batch in a single IMMEDIATE transaction.
+
+    The write lock is taken before validation, so the uniqueness, active-teacher and
+    double-booking checks still hold when the rows are inserted (as in
+    services.schedules.create_schedule), and the MAX(pk) read cannot go stale.
+
+    Args:
+        kind (str): One of IMPORTERS.
+        batch (list[tuple[int, dict]]): (line, row) pairs.
+        report (ImportReport): Collects inserted and rejected rows.
+    """
+    model, prepare, validate, after_insert = IMPORTERS[kind]
+    if prepare:
+        prepare(batch)
+    with db.atomic('IMMEDIATE'):
+        _insert(model, validate(batch, report), report, after_insert)
+
+def import_csv(kind, stream, batch_size=BATCH_SIZE):
+    """
+    Import a CSV file of students, teachers, classes or class series.
+
+    Args:
+        kind (str): One of IMPORTERS (students, teachers, classes, series).
+        stream (Iterable[str]): Text lines of the CSV file, header first.
+        batch_size (int): Rows validated and inserted per transaction.
+    Returns:
+        ImportReport: Counts of inserted/rejected rows and the first error messages.
+    Raises:
+        ValueError: If kind is unknown.
+    """
+    if kind not in IMPORTERS:
+        raise ValueError(f'unknown import kind {kind!r}')
+    report = ImportReport(kind)
+    reader = csv.DictReader(stream)
+    batch = []
+    for row in reader:
+        # reader.line_num is the last physical line read, so multi-line fields report their end
+        batch.append((reader.line_num, row))
+        if len(batch) >= batch_size:
+            _import_batch(kind, batch, report)
+            batch = []
+    if batch:
+        _import_batch(kind, batch, report)
+    report.errors.sort()
+    return report
+
+def import_upload(kind, file_storage, batch_size=BATCH_SIZE):
+    """
+    Import an uploaded CSV file without reading it fully into memory.
+
+    Args:
+        kind (str): One of IMPORTERS (students, teachers, classes, series).
+        file_storage (FileStorage): The uploaded file from request.files.
+        batch_size (int): Rows validated and inserted per transaction.
+    Returns:
+        ImportReport: Import outcome.
+    """
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    try:
+        return import_csv(kind, stream, batch_size)
+    finally:
+        stream.detach()
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import students, teachers or classes from CSV.')
+    parser.add_argument('kind', choices=sorted(IMPORTERS))
+    parser.add_argument('file', help='CSV file with a header row')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    with open(args.file, encoding='utf-8-sig', newline='') as f:
+        result = import_csv(args.kind, f, args.batch_size)
+    db.close()
+    print(f'Imported {result.inserted} {result.kind}, rejected {result.failed}')
+    for line, message in result.errors:
+        print(f'  line {line}: {message}')
@@ -0,0 +1,194 @@
+"""
+Background jobs for the GroupProject Flask app.
+Runs large attendance CSV exports off the request thread.
+
+Jobs are recorded in the Job table and executed on a small thread pool; the finished
+file is written to JOBS_DIR and served for download. Starting an export that is already
+queued or running returns the existing job, and a finished export is reused until the data
+generation (see services/generation.py) moves on.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from models import db, Job
+from services.exports import attendance_csv_chunks
+from services.generation import current_generation
+import datetime
+import logging
+import os
+import threading
+
+logger = logging.getLogger('classesapp.jobs')
+
+ATTENDANCE_CSV = 'attendance_csv'
+DEFAULT_JOBS_DIR = 'exports'
+DEFAULT_JOB_WORKERS = 2
+# Queued/running jobs older than this are assumed lost (e.g. the worker restarted)
+DEFAULT_JOB_STALE_SECONDS = 30 * 60
+
+_settings = {'dir': DEFAULT_JOBS_DIR, 'workers': DEFAULT_JOB_WORKERS,
+             'stale_seconds': DEFAULT_JOB_STALE_SECONDS}
+_executor = None
+_executor_lock = threading.Lock()
+
+# =============================
+# Setup
+# =============================
+def init_app(app):
+    """
+    Read job settings from app.config (JOBS_DIR, JOB_WORKERS, JOB_STALE_SECONDS).
+
+    Args:
+        app (Flask): The application.
+    """
+    _settings['dir'] = app.config.get('JOBS_DIR', DEFAULT_JOBS_DIR)
+    _settings['workers'] = app.config.get('JOB_WORKERS', DEFAULT_JOB_WORKERS)
+    _settings['stale_seconds'] = app.config.get('JOB_STALE_SECONDS', DEFAULT_JOB_STALE_SECONDS)
+
+def _pool():
+    """
+    Shared job thread pool.
+
+    Returns:
+        ThreadPoolExecutor: The pool (created on first use).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_settings['workers'], thread_name_prefix='job')
+        return _executor
+
+def _forget_pool_after_fork():
+    """
+    Drop the pool inherited from the parent process; its threads do not exist in a forked child.
+    """
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+# =============================
+# Submitting Jobs
+# =============================
+def submit_attendance_export(user_id, teacher_id=None):
+    """
+    Start an attendance CSV export, or return an equivalent existing job.
+
+    An export for the same scope is reused if it is queued or running (and not stale),
+    or if it finished successfully at the current data generation.
+
+    Args:
+        user_id (int): User requesting the export.
+        teacher_id (int | None): Only export this teacher's classes. None for all classes.
+    Returns:
+        tuple[Job, bool]: The job and True if it was newly created.
+    """
+    stale_before = datetime.datetime.now() - datetime.timedelta(seconds=_settings['stale_seconds'])
+    # IMMEDIATE takes the write lock up front, so concurrent requests cannot both create a job
+    with db.atomic('IMMEDIATE'):
+        generation = current_generation()
+        scope = Job.teacher.is_null() if teacher_id is None else (Job.teacher == teacher_id)
+        candidates = (Job.select()
+                      .where((Job.kind == ATTENDANCE_CSV) & scope & (Job.generation == generation))
+                      .order_by(Job.job_id.desc()))
+        for job in candidates:
+            if job.status == 'done' and job.file_path and os.path.exists(job.file_path):
+                return job, False
+            if job.status in ('queued', 'running') and job.created_at >= stale_before:
+                return job, False
+        job = Job.create(kind=ATTENDANCE_CSV, teacher=teacher_id, requested_by=user_id,
+                         generation=generation)
+    _pool().submit(_run_attendance_export, job.job_id)
+    return job, True
+
+# =============================
+# Running Jobs
+# =============================
+def _run_attendance_export(job_id):
+    """
+    Worker: write the attendance CSV for a job to disk and record the outcome.
+
+    Args:
+        job_id (int): The job to run.
+    """
+    with db.connection_context():
+        job = Job.get_by_id(job_id)
+        Job.update(status='running').where(Job.job_id == job_id).execute()
+        os.makedirs(_settings['dir'], exist_ok=True)
+        path = os.path.join(_settings['dir'], f'attendance_{job_id}.csv')
+        try:
+            with open(path + '.part', 'w', encoding='utf-8', newline='') as f:
+                for chunk in attendance_csv_chunks(job.teacher_id):
+                    f.write(chunk)
+            os.replace(path + '.part', path)
+        except Exception as e:
+            logger.exception('Job %s failed', job_id)
+            if os.path.exists(path + '.part'):
+                os.remove(path + '.part')
+            (Job.update(status='failed', error=str(e), finished_at=datetime.datetime.now())
+             .where(Job.job_id == job_id).execute())
+            return
+        (Job.update(status='done', file_path=path, finished_at=datetime.datetime.now())
+         .where(Job.job_id == job_id).execute())
+        _remove_superseded(job)
+
+def _remove_superseded(job):
+    """
+    Delete result files of older finished exports with the same scope.
+
+    Args:
+        job (Job): The job that just finished.
+    """
+    scope = Job.teacher.is_null() if job.teacher_id is None else (Job.teacher == job.teacher_id)
+    older = Job.select().where((Job.kind == job.kind) & scope & (Job.job_id < job.job_id)
+                               & Job.file_path.is_null(False))
+    for old in older:
+        if os.path.exists(old.file_path):
+            os.remove(old.file_path)
+    Job.update(file_path=None).where(Job.job_id.in_([old.job_id for old in older])).execute()
+
+def forget_teacher_jobs(teacher_id):
+    """
+    Delete a teacher's export jobs and their result files (call before the teacher is deleted).
+
+    Args:
+        teacher_id (int): The teacher's user ID.
+    """
+    for (path,) in Job.select(Job.file_path).where((Job.teacher == teacher_id) & Job.file_path.is_null(False)).tuples():
+        if os.path.exists(path):
+            os.remove(path)
+    Job.delete().where(Job.teacher == teacher_id).execute()
+
+# =============================
+# Job Access
+# =============================
+def can_access(job, user):
+    """
+    Whether a user may see a job's status and result.
+
+    Args:
+        job (Job): The job.
+        user: The current user (admin or teacher).
+    Returns:
+        bool: True for admins, and for teachers on exports of their own classes.
+    """
+    return user.is_admin or (job.teacher_id is not None and job.teacher_id == user.user_id)
+
+def job_status(job):
+    """
+    JSON-serializable job status.
+
+    Args:
+        job (Job): The job.
+    Returns:
+        dict: job_id, kind, status, created_at, finished_at, error and ready flag.
+    """
+    return {
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(timespec='seconds'),
+        'finished_at': job.finished_at.isoformat(timespec='seconds') if job.finished_at else None,
+        'error': job.error,
+        'ready': job.status == 'done' and bool(job.file_path) and os.path.exists(job.file_path),
+    }
@@ -0,0 +1,283 @@
+"""
+Per-request instrumentation for the GroupProject Flask app.
+Records SQL statement counts, database time, template render time and end-to-end latency.
+
+app.py calls start_request(), add_server_timing() and finish_request() from its request
+hooks; init_app() subscribes to executed statements and template rendering. Each request:
+    - gets a Server-Timing header (db, tmpl, app durations and the statement count),
+    - is logged as one JSON line on the 'classesapp.metrics' logger,
+    - warns about N+1 patterns (the same SQL shape executed more than the threshold),
+    - is added to per-endpoint histograms served by /admin/metrics.
+"""
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from models import db
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger('classesapp.metrics')
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+# Histogram bucket upper bounds in milliseconds (the last bucket is unbounded)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# Collapses variable-length placeholder lists, e.g. IN (?, ?, ?), into one shape
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+# =============================
+# Histograms
+# =============================
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum and max.
+
+    Attributes:
+        bounds (tuple[float]): Upper bound of each bucket; values above the last go in an overflow bucket.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        Add one value.
+
+        Args:
+            value (float): The measurement.
+        """
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        """
+        JSON-serializable view of the histogram.
+
+        Returns:
+            dict: count, mean, max and cumulative bucket counts keyed by upper bound ('+Inf' last).
+        """
+        cumulative, running = {}, 0
+        for bound, n in zip(list(self.bounds) + ['+Inf'], self.buckets):
+            running += n
+            cumulative[str(bound)] = running
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'max': self.max,
+                'buckets': cumulative}
+
+class EndpointMetrics:
+    """
+    Aggregated request metrics per endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, latency_ms, db_ms, template_ms, queries, n_plus_one):
+        """
+        Add one finished request to the endpoint's histograms.
+
+        Args:
+            endpoint (str): Flask endpoint name (blueprint.view).
+            latency_ms (float): End-to-end latency.
+            db_ms (float): Time spent executing SQL statements.
+            template_ms (float): Time spent rendering templates.
+            queries (int): Number of SQL statements.
+            n_plus_one (bool): True if an N+1 pattern was detected.
+        """
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'latency_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'db_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'template_ms': Histogram(LATENCY_BUCKETS_MS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    'n_plus_one': 0,
+                }
+            stats['latency_ms'].observe(latency_ms)
+            stats['db_ms'].observe(db_ms)
+            stats['template_ms'].observe(template_ms)
+            stats['queries'].observe(queries)
+            if n_plus_one:
+                stats['n_plus_one'] += 1
+
+    def snapshot(self):
+        """
+        JSON-serializable view of every endpoint's histograms.
+
+        Returns:
+            dict: endpoint -> histogram snapshots and N+1 request count.
+        """
+        with self._lock:
+            return {endpoint: {key: value.snapshot() if isinstance(value, Histogram) else value
+                               for key, value in stats.items()}
+                    for endpoint, stats in sorted(self._endpoints.items())}
+
+    def reset(self):
+        """
+        Drop all recorded metrics.
+        """
+        with self._lock:
+            self._endpoints.clear()
+
+# Shared per-endpoint metrics served by /admin/metrics
+endpoint_metrics = EndpointMetrics()
+
+# =============================
+# Request State
+# =============================
+class RequestMetrics:
+    """
+    Measurements for the request being handled (stored on flask.g).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_start = None
+        self.shapes = {}
+        self.streaming = False
+
+    def elapsed_ms(self):
+        """
+        Milliseconds since the request started.
+
+        Returns:
+            float: Elapsed time.
+        """
+        return (time.perf_counter() - self.start) * 1000
+
+def _current():
+    """
+    Metrics of the current request, if instrumentation started for it.
+
+    Returns:
+        RequestMetrics | None: The request's metrics.
+    """
+    if not has_request_context():
+        return None
+    return g.get('request_metrics')
+
+def _on_query(sql, seconds):
+    """
+    Database listener: count a statement against the current request.
+
+    Args:
+        sql (str): Executed SQL (with placeholders).
+        seconds (float): Execution time.
+    """
+    metrics = _current()
+    if metrics is None:
+        return
+    metrics.queries += 1
+    metrics.db_seconds += seconds
+    shape = _PLACEHOLDER_LIST.sub('?+', sql)
+    metrics.shapes[shape] = metrics.shapes.get(shape, 0) + 1
+
+def _on_before_render(sender, template, context, **extra):
+    metrics = _current()
+    if metrics is not None:
+        metrics.template_start = time.perf_counter()
+
+def _on_rendered(sender, template, context, **extra):
+    metrics = _current()
+    if metrics is not None and metrics.template_start is not None:
+        metrics.template_seconds += time.perf_counter() - metrics.template_start
+        metrics.template_start = None
+
+# =============================
+# Flask Integration
+# =============================
+def init_app(app):
+    """
+    Subscribe to executed SQL statements and template rendering.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    if _on_query not in db.query_listeners:
+        db.query_listeners.append(_on_query)
+    before_render_template.connect(_on_before_render, app)
+    template_rendered.connect(_on_rendered, app)
+
+def start_request():
+    """
+    Begin measuring the current request (call from before_request).
+    """
+    g.request_metrics = RequestMetrics()
+
+def add_server_timing(response):
+    """
+    Add a Server-Timing header with the measurements so far (call from after_request).
+
+    Streamed responses only include the work done before the body started; their
+    log line and histograms are completed once the stream ends.
+
+    Args:
+        response (Response): The outgoing response.
+    Returns:
+        Response: The same response.
+    """
+    metrics = _current()
+    if metrics is not None:
+        metrics.streaming = response.is_streamed
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.queries} queries"',
+            f'tmpl;dur={metrics.template_seconds * 1000:.2f}',
+            f'app;dur={metrics.elapsed_ms():.2f}',
+        ])
+    return response
+
+def finish_request(app, exception=None):
+    """
+    Log and aggregate the current request's metrics (call from teardown_request).
+
+    For streamed responses (stream_with_context) Flask tears the request down once when
+    the view returns and again when the stream is exhausted; only the second call counts.
+
+    Args:
+        app (Flask): The application.
+        exception (Exception | None): Exception raised during the request, if any.
+    """
+    metrics = _current()
+    if metrics is None:
+        return
+    if metrics.streaming:
+        metrics.streaming = False
+        return
+    g.pop('request_metrics', None)
+    latency_ms = metrics.elapsed_ms()
+    threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+    repeated = {shape: n for shape, n in metrics.shapes.items() if n > threshold}
+    endpoint = request.endpoint or '<unmatched>'
+    endpoint_metrics.record(endpoint, latency_ms, metrics.db_seconds * 1000,
+                            metrics.template_seconds * 1000, metrics.queries, bool(repeated))
+    logger.info(json.dumps({
+        'event': 'request',
+        'method': request.method,
+        'path': request.path,
+        'endpoint': endpoint,
+        'latency_ms': round(latency_ms, 2),
+        'db_ms': round(metrics.db_seconds * 1000, 2),
+        'template_ms': round(metrics.template_seconds * 1000, 2),
+        'queries': metrics.queries,
+        'error': type(exception).__name__ if exception else None,
+    }))
+    for shape, n in repeated.items():
+        logger.warning(json.dumps({'event': 'n_plus_one', 'endpoint': endpoint,
+                                   'count': n, 'sql': shape}))
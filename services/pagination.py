@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) pagination helpers for the GroupProject Flask app.
+
+Instead of OFFSET, each page continues after the sort key of the last row shown, so fetching
+page N costs the same as fetching page 1 when the sort key is indexed.
+Cursors are opaque URL-safe strings encoding that sort key.
+"""
+
+from peewee import DateTimeField
+import base64
+import datetime
+import json
+
+# Default number of rows per page
+PAGE_SIZE = 25
+
+# =============================
+# Cursor Encoding
+# =============================
+def encode_cursor(values):
+    """
+    Encode sort-key values as an opaque URL-safe cursor.
+
+    Args:
+        values (list): Sort-key values of the last row on a page.
+    Returns:
+        str: Cursor string.
+    """
+    values = [v.isoformat() if isinstance(v, datetime.datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, key_fields):
+    """
+    Decode a cursor created by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string from the request.
+        key_fields (list[Field]): Sort-key fields, used to convert each value to the column's type.
+    Returns:
+        list | None: Sort-key values, or None if the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(key_fields):
+            return None
+        # Only scalars are ever encoded; anything else is a crafted cursor
+        if any(isinstance(v, bool) or not isinstance(v, (str, int, float)) for v in values):
+            return None
+        return [f.db_value(datetime.datetime.fromisoformat(v) if isinstance(f, DateTimeField) else v)
+                for f, v in zip(key_fields, values)]
+    except (ValueError, TypeError):
+        return None
+
+# =============================
+# Keyset Pagination
+# =============================
+def _after(key_fields, values, descending):
+    """
+    Build the WHERE expression selecting rows that sort after the given key.
+
+    Args:
+        key_fields (list[Field]): Sort-key fields, most significant first (the last one must be unique).
+        values (list): Sort-key values of the last row already shown.
+        descending (bool): True if the list is sorted in descending order.
+    Returns:
+        Expression: (k1 > v1) OR (k1 = v1 AND k2 > v2) ... (or < for descending order).
+    """
+    field, value = key_fields[0], values[0]
+    beyond = field < value if descending else field > value
+    if len(key_fields) == 1:
+        return beyond
+    return beyond | ((field == value) & _after(key_fields[1:], values[1:], descending))
+
+def keyset_page(query, key_fields, cursor=None, per_page=PAGE_SIZE, descending=False):
+    """
+    Fetch one page of a query ordered by key_fields.
+
+    Args:
+        query (Select): Base query (filters and joins, no ORDER BY); model or .dicts() rows.
+        key_fields (list[Field]): Sort-key fields, most significant first (the last one must be unique).
+        cursor (str | None): Cursor returned for the previous page, or None for the first page.
+        per_page (int): Maximum number of rows on the page.
+        descending (bool): Sort newest/largest first.
+    Returns:
+        tuple[list, str | None]: Rows on the page and the cursor for the next page (None on the last page).
+    """
+    values = decode_cursor(cursor, key_fields)
+    if values is not None:
+        query = query.where(_after(key_fields, values, descending))
+    order = [f.desc() if descending else f.asc() for f in key_fields]
+    rows = list(query.order_by(*order).limit(per_page + 1))
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor([last[f.name] for f in key_fields])
+    return rows, encode_cursor([getattr(last, f.name) for f in key_fields])
@@ -0,0 +1,208 @@
+"""
+Password hashing for the GroupProject Flask app.
+Hashes and verifies passwords with configurable parameters on a bounded worker pool.
+
+Hashing is deliberately slow and CPU-bound. The pool is a concurrency cap only: at most
+PASSWORD_HASH_WORKERS hashes run at once (hashlib releases the GIL while hashing), so a burst
+of logins cannot take every core. The calling request thread still waits for its hash, so the
+pool does not free request threads. At most PASSWORD_HASH_QUEUE more callers wait for a worker;
+any caller that cannot get a slot within PASSWORD_HASH_WAIT seconds gets HashingBusy, so
+waiting requests stay bounded. Bulk imports hash on the same pool (hash_passwords_pooled).
+Hashes made with other parameters than the configured PASSWORD_HASH_METHOD and
+PASSWORD_SALT_LENGTH are detected with needs_rehash() and upgraded on the next login.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+import os
+import threading
+
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt'
+DEFAULT_PASSWORD_SALT_LENGTH = 16
+DEFAULT_PASSWORD_HASH_WORKERS = os.cpu_count() or 2
+# Requests allowed to wait for a hashing worker, on top of the ones being hashed
+DEFAULT_PASSWORD_HASH_QUEUE = 32
+DEFAULT_PASSWORD_HASH_WAIT = 2.0  # seconds
+
+_settings = {'method': DEFAULT_PASSWORD_HASH_METHOD, 'salt_length': DEFAULT_PASSWORD_SALT_LENGTH,
+             'workers': DEFAULT_PASSWORD_HASH_WORKERS, 'queue': DEFAULT_PASSWORD_HASH_QUEUE,
+             'wait': DEFAULT_PASSWORD_HASH_WAIT}
+_state = {'prefix': None, 'dummy': None, 'pool': None,
+          'slots': threading.BoundedSemaphore(DEFAULT_PASSWORD_HASH_WORKERS + DEFAULT_PASSWORD_HASH_QUEUE)}
+_lock = threading.Lock()
+
+class HashingBusy(Exception):
+    """
+    Raised when no hashing worker became free in time (the caller should answer 503).
+    """
+
+    def __init__(self, message='Password hashing is busy, please try again in a moment.'):
+        super().__init__(message)
+
+# =============================
+# Setup
+# =============================
+def init_app(app):
+    """
+    Read hashing settings from app.config (PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_WAIT).
+
+    Args:
+        app (Flask): The application.
+    """
+    with _lock:
+        _settings['method'] = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+        _settings['salt_length'] = app.config.get('PASSWORD_SALT_LENGTH', DEFAULT_PASSWORD_SALT_LENGTH)
+        _settings['workers'] = app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_PASSWORD_HASH_WORKERS)
+        _settings['queue'] = app.config.get('PASSWORD_HASH_QUEUE', DEFAULT_PASSWORD_HASH_QUEUE)
+        _settings['wait'] = app.config.get('PASSWORD_HASH_WAIT', DEFAULT_PASSWORD_HASH_WAIT)
+        if _state['pool'] is not None:
+            _state['pool'].shutdown(wait=False)
+        _state.update(prefix=None, dummy=None, pool=None,
+                      slots=threading.BoundedSemaphore(_settings['workers'] + _settings['queue']))
+
+def _pool():
+    """
+    Shared hashing thread pool.
+
+    Returns:
+        ThreadPoolExecutor: The pool (created on first use).
+    """
+    with _lock:
+        if _state['pool'] is None:
+            _state['pool'] = ThreadPoolExecutor(max_workers=_settings['workers'], thread_name_prefix='password-hash')
+        return _state['pool']
+
+def _forget_pool_after_fork():
+    """
+    Drop the pool inherited from the parent process; its threads do not exist in a forked child.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _state.update(pool=None, slots=threading.BoundedSemaphore(_settings['workers'] + _settings['queue']))
+
+os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+def _reference():
+    """
+    Method prefix of hashes made with the current settings, and a throwaway hash used to
+    spend the same time on unknown usernames as on real ones.
+
+    Returns:
+        tuple[str, str]: (method prefix such as 'scrypt:32768:8:1', dummy hash).
+    """
+    with _lock:
+        if _state['dummy'] is None:
+            _state['dummy'] = generate_password_hash(os.urandom(16).hex(), _settings['method'],
+                                                     _settings['salt_length'])
+            _state['prefix'] = _state['dummy'].split('$', 1)[0]
+        return _state['prefix'], _state['dummy']
+
+def _run(func, *args):
+    """
+    Run a hashing function on the pool, waiting at most PASSWORD_HASH_WAIT for a slot.
+    The calling thread blocks until the hash is done; the pool only caps how many run at once.
+
+    Args:
+        func (Callable): Hashing function.
+        *args: Its arguments.
+    Returns:
+        The function's result.
+    Raises:
+        HashingBusy: If every worker and queue slot stayed taken.
+    """
+    slots = _state['slots']
+    if not slots.acquire(timeout=_settings['wait']):
+        raise HashingBusy()
+    try:
+        return _pool().submit(func, *args).result()
+    finally:
+        slots.release()
+
+# =============================
+# Hashing and Verification
+# =============================
+def hash_password(password):
+    """
+    Hash a password with the configured parameters (on the calling thread).
+
+    Args:
+        password (str): Plain-text password.
+    Returns:
+        str: Werkzeug password hash.
+    """
+    return generate_password_hash(password, _settings['method'], _settings['salt_length'])
+
+def hash_password_pooled(password):
+    """
+    Hash a password on the bounded worker pool.
+
+    Args:
+        password (str): Plain-text password.
+    Returns:
+        str: Werkzeug password hash.
+    Raises:
+        HashingBusy: If no worker became free in time.
+    """
+    return _run(hash_password, password)
+
+def hash_passwords_pooled(passwords):
+    """
+    Hash many passwords (a bulk import) on the bounded worker pool.
+
+    Every hash takes a slot like a login does, but at most PASSWORD_HASH_WORKERS of them are
+    queued at a time, so logins still find free slots. The caller waits for slots instead of
+    getting HashingBusy.
+
+    Args:
+        passwords (Iterable[str]): Plain-text passwords.
+    Returns:
+        list[str]: Werkzeug password hashes, in the same order.
+    """
+    slots = _state['slots']
+    in_flight = threading.BoundedSemaphore(_settings['workers'])
+
+    def release(_future):
+        slots.release()
+        in_flight.release()
+
+    futures = []
+    for password in passwords:
+        in_flight.acquire()
+        slots.acquire()
+        future = _pool().submit(hash_password, password)
+        future.add_done_callback(release)
+        futures.append(future)
+    return [future.result() for future in futures]
+
+def verify_password(hashed, password):
+    """
+    Check a password on the bounded worker pool.
+
+    Pass hashed=None for an unknown user: a dummy hash is checked instead, so the response
+    takes as long as for a real account.
+
+    Args:
+        hashed (str | None): Stored hash, or None if the user does not exist.
+        password (str): Submitted password.
+    Returns:
+        bool: True if the password matches (always False when hashed is None).
+    Raises:
+        HashingBusy: If no worker became free in time.
+    """
+    if hashed is None:
+        _run(check_password_hash, _reference()[1], password)
+        return False
+    return _run(check_password_hash, hashed, password)
+
+def needs_rehash(hashed):
+    """
+    Whether a stored hash was made with other parameters than the configured ones.
+
+    Args:
+        hashed (str): Stored hash ('method$salt$hash').
+    Returns:
+        bool: True if the hash should be replaced after the next successful login.
+    """
+    parts = hashed.split('$')
+    return len(parts) != 3 or parts[0] != _reference()[0] or len(parts[1]) != _settings['salt_length']
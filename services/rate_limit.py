@@ -0,0 +1,115 @@
+"""
+Token-bucket rate limiting for the GroupProject Flask app.
+Stops login floods before any database lookup or password hashing.
+
+Each key (e.g. 'ip:1.2.3.4', 'user:alice|ip:1.2.3.4' or 'user:alice') has a bucket holding up
+to `burst` tokens that refills at `rate` tokens per second; an attempt takes one token and is
+rejected when the bucket is empty. The per-username failure bucket is only charged for wrong
+passwords, so logins spread over many IPs are still limited per account. Buckets are kept in a bounded LRU map, so memory stays fixed under
+floods of random usernames.
+"""
+
+from collections import OrderedDict
+import math
+import threading
+import time
+
+DEFAULT_LOGIN_IP_BURST = 50
+DEFAULT_LOGIN_IP_RATE = 5.0       # tokens per second (a school behind one NAT logs in together)
+DEFAULT_LOGIN_USER_BURST = 5
+DEFAULT_LOGIN_USER_RATE = 0.2     # one attempt every 5 seconds once the burst is used
+# Failed logins per username from all IPs together
+DEFAULT_LOGIN_FAILURE_BURST = 20
+DEFAULT_LOGIN_FAILURE_RATE = 1 / 60  # one failure a minute once the burst is used
+DEFAULT_RATE_LIMIT_KEYS = 10000
+
+# =============================
+# Token Buckets
+# =============================
+class TokenBucketLimiter:
+    """
+    Thread-safe per-key token buckets.
+
+    Attributes:
+        burst (float): Bucket capacity (attempts allowed at once).
+        rate (float): Tokens added per second.
+        max_keys (int): Buckets kept before the least recently used are dropped.
+        rejected (int): Attempts rejected so far.
+    """
+
+    def __init__(self, burst, rate, max_keys=DEFAULT_RATE_LIMIT_KEYS):
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def configure(self, burst, rate, max_keys=DEFAULT_RATE_LIMIT_KEYS):
+        """
+        Change the limits and drop all buckets.
+
+        Args:
+            burst (float): Bucket capacity.
+            rate (float): Tokens added per second.
+            max_keys (int): Buckets kept in memory.
+        """
+        with self._lock:
+            self.burst = burst
+            self.rate = rate
+            self.max_keys = max_keys
+            self._buckets.clear()
+
+    def _refill(self, key, now):
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def retry_after(self, key):
+        """
+        Seconds until the key's bucket holds a token again.
+
+        Args:
+            key (str): Bucket key.
+        Returns:
+            int: Whole seconds to wait (0 if an attempt would be allowed now).
+        """
+        with self._lock:
+            tokens = self._refill(key, time.monotonic())
+        if tokens >= 1 or self.rate <= 0:
+            return 0
+        return math.ceil((1 - tokens) / self.rate)
+
+    def allow(self, key):
+        """
+        Take one token from a key's bucket.
+
+        Args:
+            key (str): Bucket key.
+        Returns:
+            bool: True if the attempt may proceed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refill(key, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def clear(self):
+        """
+        Drop every bucket.
+        """
+        with self._lock:
+            self._buckets.clear()
+
+# Shared limiters used by the login route
+login_ip_limiter = TokenBucketLimiter(DEFAULT_LOGIN_IP_BURST, DEFAULT_LOGIN_IP_RATE)
+login_user_limiter = TokenBucketLimiter(DEFAULT_LOGIN_USER_BURST, DEFAULT_LOGIN_USER_RATE)
+login_failure_limiter = TokenBucketLimiter(DEFAULT_LOGIN_FAILURE_BURST, DEFAULT_LOGIN_FAILURE_RATE)
@@ -0,0 +1,432 @@
+"""
+Attendance trend rollups for the GroupProject Flask app.
+Maintains weekly and monthly attendance totals (AttendanceRollup, StudentRollup) and answers
+trend queries from them.
+
+Each attendance write adds its delta to the week and month of its class, in the same
+transaction, so the rollups never need a scan of Attendance. Editing or deleting a class,
+student or teacher moves or drops the affected totals. A trend over a term then reads a few
+rows per period from an indexed range instead of joining Attendance to Class.datetime.
+rebuild_rollups() recomputes everything and is used to backfill new databases and repair drift.
+
+Usage:
+    python -m services.rollups [--database PATH]   Rebuild all rollups
+"""
+
+from peewee import EXCLUDED, Value, chunked, fn
+from models import db, configure_database, User, Student, Class, Attendance, AttendanceRollup, StudentRollup
+from models import SQLITE_MAX_VARIABLES
+import argparse
+import datetime
+
+GRANULARITIES = ('week', 'month')
+# Series a trend can be broken down by
+TREND_GROUPS = ('total', 'teacher', 'title', 'student')
+# Default trend range: the last half year (about one term)
+DEFAULT_TREND_DAYS = 182
+
+# =============================
+# Periods
+# =============================
+def period_start(granularity, value):
+    """
+    First day of the week (Monday) or month containing a date.
+
+    Args:
+        granularity (str): 'week' or 'month'.
+        value (datetime.date | datetime.datetime): A date.
+    Returns:
+        datetime.date: Start of the period.
+    """
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if granularity == 'week':
+        return value - datetime.timedelta(days=value.weekday())
+    return value.replace(day=1)
+
+def _period_sql(granularity, column):
+    """
+    SQL expression for the first day of the period containing a datetime column
+    (same result as period_start).
+
+    Args:
+        granularity (str): 'week' or 'month'.
+        column (Field): Datetime column.
+    Returns:
+        Expression: 'YYYY-MM-DD' date (returned as text, not converted like the column).
+    """
+    if granularity == 'week':
+        # Next Sunday (or the same day), then back to its Monday
+        return fn.date(column, 'weekday 0', '-6 days').coerce(False)
+    return fn.date(column, 'start of month').coerce(False)
+
+# =============================
+# Incremental Updates
+# =============================
+def _add(teacher_id, title, when, deltas):
+    """
+    Add per-student (total, attended) deltas of one class to its week and month.
+
+    Args:
+        teacher_id (int): Teacher of the class.
+        title (str): Class title.
+        when (datetime.datetime): Class date.
+        deltas (dict[int, tuple[int, int]]): student_id -> (total delta, attended delta).
+    """
+    deltas = {student_id: d for student_id, d in deltas.items() if d != (0, 0)}
+    if not deltas:
+        return
+    total = sum(d[0] for d in deltas.values())
+    attended = sum(d[1] for d in deltas.values())
+    for granularity in GRANULARITIES:
+        period = period_start(granularity, when)
+        (AttendanceRollup
+         .insert(granularity=granularity, period=period, teacher=teacher_id, title=title,
+                 total=total, attended=attended)
+         .on_conflict(conflict_target=[AttendanceRollup.granularity, AttendanceRollup.period,
+                                       AttendanceRollup.teacher, AttendanceRollup.title],
+                      update={AttendanceRollup.total: AttendanceRollup.total + EXCLUDED.total,
+                              AttendanceRollup.attended: AttendanceRollup.attended + EXCLUDED.attended})
+         .execute())
+        rows = [{'granularity': granularity, 'period': period, 'teacher': teacher_id, 'student': student_id,
+                 'total': d[0], 'attended': d[1]} for student_id, d in deltas.items()]
+        for batch in chunked(rows, SQLITE_MAX_VARIABLES // 6):
+            (StudentRollup
+             .insert_many(batch)
+             .on_conflict(conflict_target=[StudentRollup.granularity, StudentRollup.period,
+                                           StudentRollup.teacher, StudentRollup.student],
+                          update={StudentRollup.total: StudentRollup.total + EXCLUDED.total,
+                                  StudentRollup.attended: StudentRollup.attended + EXCLUDED.attended})
+             .execute())
+
+def _class_key(class_id):
+    """
+    Teacher, title and date of a class.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        tuple | None: (teacher_id, title, datetime), or None if the class or its teacher
+        does not exist (such classes are not part of any rollup).
+    """
+    return (Class
+            .select(Class.user, Class.title, Class.datetime)
+            .join(User, on=(Class.user == User.user_id))
+            .where(Class.class_id == class_id)
+            .tuples()
+            .first())
+
+def record_rollup_changes(class_id, previous, marks):
+    """
+    Apply the rollup changes caused by saving attendance for one class.
+
+    Args:
+        class_id (int): The class session ID.
+        previous (dict[int, bool]): student_id -> attend for rows that existed before the save.
+        marks (dict[int, bool]): student_id -> attend for the rows just written.
+    """
+    key = _class_key(class_id)
+    if key is None:
+        return
+    _add(*key, {student_id: (int(student_id not in previous),
+                             int(bool(attend)) - int(bool(previous.get(student_id, False))))
+                for student_id, attend in marks.items()})
+
+def record_rollup_removals(class_id, removed):
+    """
+    Apply the rollup changes caused by deleting attendance rows of one class.
+
+    Args:
+        class_id (int): The class session ID.
+        removed (dict[int, bool]): student_id -> attend for the rows being deleted.
+    """
+    key = _class_key(class_id)
+    if key is None:
+        return
+    _add(*key, {student_id: (-1, -int(bool(attend))) for student_id, attend in removed.items()})
+
+def record_bulk_rollup_removals(condition):
+    """
+    Apply the rollup changes caused by deleting the attendance rows matching a condition
+    (any number of classes and students), with one grouped upsert per table and granularity.
+
+    Args:
+        condition (Expression): The Attendance rows being deleted.
+    """
+    for granularity in GRANULARITIES:
+        period = _period_sql(granularity, Class.datetime)
+        total = 0 - fn.COUNT(Attendance.attendance_id)
+        attended = 0 - fn.SUM(Attendance.attend)
+        (AttendanceRollup
+         .insert_from(_live_attendance(Value(granularity), period, Class.user, Class.title, total, attended)
+                      .where(condition)
+                      .group_by(period, Class.user, Class.title),
+                      [AttendanceRollup.granularity, AttendanceRollup.period, AttendanceRollup.teacher,
+                       AttendanceRollup.title, AttendanceRollup.total, AttendanceRollup.attended])
+         .on_conflict(conflict_target=[AttendanceRollup.granularity, AttendanceRollup.period,
+                                       AttendanceRollup.teacher, AttendanceRollup.title],
+                      update={AttendanceRollup.total: AttendanceRollup.total + EXCLUDED.total,
+                              AttendanceRollup.attended: AttendanceRollup.attended + EXCLUDED.attended})
+         .execute())
+        (StudentRollup
+         .insert_from(_live_attendance(Value(granularity), period, Class.user, Attendance.student, total, attended)
+                      .where(condition)
+                      .group_by(period, Class.user, Attendance.student),
+                      [StudentRollup.granularity, StudentRollup.period, StudentRollup.teacher,
+                       StudentRollup.student, StudentRollup.total, StudentRollup.attended])
+         .on_conflict(conflict_target=[StudentRollup.granularity, StudentRollup.period,
+                                       StudentRollup.teacher, StudentRollup.student],
+                      update={StudentRollup.total: StudentRollup.total + EXCLUDED.total,
+                              StudentRollup.attended: StudentRollup.attended + EXCLUDED.attended})
+         .execute())
+
+def _class_attendance(class_id):
+    """
+    Attendance marks of a class's existing students.
+
+    Args:
+        class_id (int): The class session ID.
+    Returns:
+        dict[int, bool]: student_id -> attend.
+    """
+    return dict(Attendance
+                .select(Attendance.student, Attendance.attend)
+                .join(Student, on=(Attendance.student == Student.student_id))
+                .where(Attendance.class_ref == class_id)
+                .tuples())
+
+def withdraw_class(class_id):
+    """
+    Remove a class's attendance from the rollups. Call before the class is deleted, or
+    before its teacher, title or date changes (followed by restore_class).
+
+    Args:
+        class_id (int): The class session ID.
+    """
+    record_rollup_removals(class_id, _class_attendance(class_id))
+
+def restore_class(class_id):
+    """
+    Add a class's attendance to the rollups of its current teacher, title and date.
+
+    Args:
+        class_id (int): The class session ID.
+    """
+    record_rollup_changes(class_id, {}, _class_attendance(class_id))
+
+def forget_student_rollups(student_id):
+    """
+    Remove a student's attendance from the rollups (call before the student is deleted).
+
+    Args:
+        student_id (int): The student ID.
+    """
+    for granularity in GRANULARITIES:
+        period = _period_sql(granularity, Class.datetime)
+        removed = (_live_attendance(Class.user, Class.title, period.alias('period'),
+                                    fn.COUNT(Attendance.attendance_id).alias('total'),
+                                    fn.SUM(Attendance.attend).alias('attended'))
+                   .where(Attendance.student == student_id)
+                   .group_by(Class.user, Class.title, period)
+                   .tuples())
+        rows = [{'granularity': granularity, 'period': start, 'teacher': teacher_id, 'title': title,
+                 'total': -total, 'attended': -attended}
+                for teacher_id, title, start, total, attended in removed]
+        for batch in chunked(rows, SQLITE_MAX_VARIABLES // 6):
+            (AttendanceRollup
+             .insert_many(batch)
+             .on_conflict(conflict_target=[AttendanceRollup.granularity, AttendanceRollup.period,
+                                           AttendanceRollup.teacher, AttendanceRollup.title],
+                          update={AttendanceRollup.total: AttendanceRollup.total + EXCLUDED.total,
+                                  AttendanceRollup.attended: AttendanceRollup.attended + EXCLUDED.attended})
+             .execute())
+    StudentRollup.delete().where(StudentRollup.student == student_id).execute()
+
+def forget_teacher_rollups(teacher_id):
+    """
+    Drop a deleted teacher's rollups.
+
+    Args:
+        teacher_id (int): The teacher's user ID.
+    """
+    AttendanceRollup.delete().where(AttendanceRollup.teacher == teacher_id).execute()
+    StudentRollup.delete().where(StudentRollup.teacher == teacher_id).execute()
+
+# =============================
+# Full Rebuild
+# =============================
+def _live_attendance(*columns):
+    """
+    Select from Attendance joined to its class, teacher and student, skipping rows left
+    behind by deleted classes, students or teachers.
+
+    Args:
+        *columns: Columns to select.
+    Returns:
+        Select: The query.
+    """
+    return (Attendance
+            .select(*columns)
+            .join(Class, on=(Attendance.class_ref == Class.class_id))
+            .join(User, on=(Class.user == User.user_id))
+            .switch(Attendance)
+            .join(Student, on=(Attendance.student == Student.student_id)))
+
+def rebuild_rollups():
+    """
+    Recompute every rollup from Attendance in one transaction.
+
+    Returns:
+        dict: Number of AttendanceRollup and StudentRollup rows written.
+    """
+    with db.atomic():
+        AttendanceRollup.delete().execute()
+        StudentRollup.delete().execute()
+        for granularity in GRANULARITIES:
+            period = _period_sql(granularity, Class.datetime)
+            AttendanceRollup.insert_from(
+                (_live_attendance(Value(granularity), period, Class.user, Class.title,
+                                  fn.COUNT(Attendance.attendance_id), fn.SUM(Attendance.attend))
+                 .group_by(period, Class.user, Class.title)),
+                [AttendanceRollup.granularity, AttendanceRollup.period, AttendanceRollup.teacher,
+                 AttendanceRollup.title, AttendanceRollup.total, AttendanceRollup.attended]).execute()
+            StudentRollup.insert_from(
+                (_live_attendance(Value(granularity), period, Class.user, Attendance.student,
+                                  fn.COUNT(Attendance.attendance_id), fn.SUM(Attendance.attend))
+                 .group_by(period, Class.user, Attendance.student)),
+                [StudentRollup.granularity, StudentRollup.period, StudentRollup.teacher,
+                 StudentRollup.student, StudentRollup.total, StudentRollup.attended]).execute()
+    return {'attendance_rollups': AttendanceRollup.select().count(),
+            'student_rollups': StudentRollup.select().count()}
+
+# =============================
+# Trend Queries
+# =============================
+def trend_args(args, today=None):
+    """
+    Parse trend parameters from request arguments.
+
+    Accepted keys: granularity (week|month, default week), group (total|teacher|title|student,
+    default teacher), from and to (YYYY-MM-DD, default the last DEFAULT_TREND_DAYS days),
+    title, student_id and teacher_id.
+
+    Args:
+        args (Mapping): Request arguments (e.g. request.args).
+        today (datetime.date | None): End of the default range (defaults to today).
+    Returns:
+        dict: Keyword arguments for attendance_trends (teacher_id is not checked against the user).
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    today = today or datetime.date.today()
+    granularity = args.get('granularity') or 'week'
+    group = args.get('group') or 'teacher'
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if group not in TREND_GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(TREND_GROUPS)}")
+    try:
+        end = datetime.date.fromisoformat(args['to']) if args.get('to') else today
+        start = (datetime.date.fromisoformat(args['from']) if args.get('from')
+                 else end - datetime.timedelta(days=DEFAULT_TREND_DAYS))
+        student_id = int(args['student_id']) if args.get('student_id') else None
+        teacher_id = int(args['teacher_id']) if args.get('teacher_id') else None
+    except ValueError:
+        raise ValueError('from/to must be YYYY-MM-DD dates and IDs must be integers') from None
+    if start > end:
+        raise ValueError('from must not be after to')
+    return {'granularity': granularity, 'group': group, 'start': start, 'end': end,
+            'teacher_id': teacher_id, 'title': args.get('title') or None, 'student_id': student_id}
+
+def attendance_trends(granularity='week', group='teacher', start=None, end=None, teacher_id=None,
+                      title=None, student_id=None):
+    """
+    Attendance totals and rates per period, read from the rollup tables.
+
+    Args:
+        granularity (str): 'week' or 'month'.
+        group (str): Series to break the totals down by: 'total', 'teacher', 'title' or 'student'.
+        start (datetime.date | None): First day of the range (the whole period containing it is included).
+        end (datetime.date | None): Last day of the range.
+        teacher_id (int | None): Only count this teacher's classes.
+        title (str | None): Only count classes with this title (not with group='student').
+        student_id (int | None): Only count this student (group='student' only).
+    Returns:
+        list[dict]: One dict per (period, series) ordered by period, with period ('YYYY-MM-DD'),
+        key (teacher username, title, student name or 'All'), id (user/student ID where
+        applicable), total, attended and rate (attended / total, None if total is 0).
+    """
+    model = StudentRollup if group == 'student' else AttendanceRollup
+    conditions = [model.granularity == granularity]
+    if start is not None:
+        conditions.append(model.period >= period_start(granularity, start))
+    if end is not None:
+        conditions.append(model.period <= end)
+    if teacher_id is not None:
+        conditions.append(model.teacher == teacher_id)
+    if title is not None and model is AttendanceRollup:
+        conditions.append(AttendanceRollup.title == title)
+    if student_id is not None and model is StudentRollup:
+        conditions.append(StudentRollup.student == student_id)
+    total = fn.SUM(model.total).alias('total')
+    attended = fn.SUM(model.attended).alias('attended')
+    if group == 'teacher':
+        series, ident = User.username, model.teacher
+        query = model.select(model.period, series.alias('key'), ident.alias('id'), total, attended).join(User)
+        grouping = [model.period, model.teacher]
+    elif group == 'student':
+        series, ident = Student.name, model.student
+        query = model.select(model.period, series.alias('key'), ident.alias('id'), total, attended).join(Student)
+        grouping = [model.period, model.student]
+    elif group == 'title':
+        query = model.select(model.period, model.title.alias('key'), total, attended)
+        grouping = [model.period, model.title]
+    else:
+        query = model.select(model.period, total, attended)
+        grouping = [model.period]
+    query = (query
+             .where(*conditions)
+             .group_by(*grouping)
+             .having(fn.SUM(model.total) > 0)
+             .order_by(*grouping))
+    trends = []
+    for row in query.dicts():
+        trends.append({
+            'period': str(row['period']),
+            'key': row.get('key', 'All'),
+            'id': row.get('id'),
+            'total': row['total'],
+            'attended': row['attended'],
+            'rate': round(row['attended'] / row['total'], 4) if row['total'] else None,
+        })
+    return trends
+
+def trend_table(trends):
+    """
+    Pivot trend rows into a series-by-period table for display.
+
+    Args:
+        trends (list[dict]): Rows returned by attendance_trends.
+    Returns:
+        tuple[list[str], list[dict]]: Periods in order, and one dict per series with key, id and
+        cells (period -> trend row).
+    """
+    periods = sorted({row['period'] for row in trends})
+    series = {}
+    for row in trends:
+        entry = series.setdefault((row['key'], row['id']), {'key': row['key'], 'id': row['id'], 'cells': {}})
+        entry['cells'][row['period']] = row
+    return periods, sorted(series.values(), key=lambda s: str(s['key']).lower())
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the weekly and monthly attendance rollups.')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    print('Rebuilt rollups:', rebuild_rollups())
+    db.close()
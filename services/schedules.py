@@ -0,0 +1,449 @@
+"""
+Recurring class schedules for the GroupProject Flask app.
+Expands weekly and biweekly class series into Class rows and checks teachers for double-booking.
+
+A Schedule is a weekly recurrence rule (like an RRULE with FREQ=WEEKLY, INTERVAL, BYDAY, UNTIL
+and EXDATE): a session at the first session's time of day on each of its weekdays, every
+`interval` weeks, up to its last date, skipping the exception dates. Creating a series writes the
+Schedule and its sessions up to the horizon (SCHEDULE_HORIZON_DAYS ahead, rounded up to the next
+Monday) in one transaction, inserting the sessions in batches and giving them the course series'
+roster. Later sessions are created lazily, a week at a time, as the horizon reaches them:
+init_app() installs a request hook that runs extend_schedules() at most once every
+SCHEDULE_EXTEND_INTERVAL seconds per worker process, before the view (so never inside a cached
+page render), and `python -m services.schedules extend` does the same from cron. When no series
+is due this is one indexed lookup (schedule_pending_expanded_until).
+
+A teacher is double-booked when two of their active classes start less than CLASS_MINUTES
+apart. The check reads the teacher's classes in the time range around the new sessions through
+the (user_id, datetime) index over active classes, plus the sessions of the teacher's series
+that are not created yet, and compares them with the new sessions in one sorted pass.
+
+Usage:
+    python -m services.schedules extend [--days N] [--database PATH]   Create sessions that are due
+"""
+
+from bisect import bisect_left
+from peewee import chunked, fn
+from models import db, configure_database, User, Class, Schedule, SQLITE_MAX_VARIABLES
+from services.enrollment import copy_series_roster
+from services.generation import bump_generation, row_stamp
+import argparse
+import datetime
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('classesapp.schedules')
+
+# RRULE day codes, Monday first (datetime.weekday() order)
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Repeat choices -> weeks between sessions
+REPEAT_INTERVALS = {'weekly': 1, 'biweekly': 2}
+DEFAULT_SCHEDULE_HORIZON_DAYS = 56
+DEFAULT_CLASS_MINUTES = 60
+# Seconds between due-series checks per worker process (0 disables the request hook; use cron)
+DEFAULT_SCHEDULE_EXTEND_INTERVAL = 15 * 60
+# Longest series accepted (bounds the double-booking check)
+MAX_SCHEDULE_DAYS = 2 * 366
+# Series extended per transaction by extend_schedules()
+BATCH_SIZE = 100
+# Conflicting sessions named in a double-booking error
+MAX_REPORTED_CONFLICTS = 3
+
+_settings = {'horizon_days': DEFAULT_SCHEDULE_HORIZON_DAYS, 'class_minutes': DEFAULT_CLASS_MINUTES,
+             'extend_interval': DEFAULT_SCHEDULE_EXTEND_INTERVAL}
+_next_extend = {'at': 0.0}  # time.monotonic() of this process' next due-series check
+_extend_lock = threading.Lock()
+
+# =============================
+# Setup
+# =============================
+def init_app(app):
+    """
+    Read schedule settings from app.config (SCHEDULE_HORIZON_DAYS, CLASS_MINUTES,
+    SCHEDULE_EXTEND_INTERVAL) and install the request hook that extends due series.
+
+    Args:
+        app (Flask): The application.
+    """
+    _settings['horizon_days'] = app.config.get('SCHEDULE_HORIZON_DAYS', DEFAULT_SCHEDULE_HORIZON_DAYS)
+    _settings['class_minutes'] = app.config.get('CLASS_MINUTES', DEFAULT_CLASS_MINUTES)
+    _settings['extend_interval'] = app.config.get('SCHEDULE_EXTEND_INTERVAL', DEFAULT_SCHEDULE_EXTEND_INTERVAL)
+    if _settings['extend_interval']:
+        app.before_request(_extend_if_due)
+
+def _extend_if_due():
+    """
+    Request hook: run extend_schedules() at most once every SCHEDULE_EXTEND_INTERVAL seconds per
+    worker process. Other threads never wait for it, and a failure is logged, not raised.
+    """
+    if time.monotonic() < _next_extend['at'] or not _extend_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() < _next_extend['at']:
+            return
+        _next_extend['at'] = time.monotonic() + _settings['extend_interval']
+        with db.connection_context():
+            extend_schedules()
+    except Exception:
+        logger.exception('Extending class series failed')
+    finally:
+        _extend_lock.release()
+
+def _forget_lock_after_fork():
+    """
+    Replace the hook's lock in a forked child; it may have been held by a parent thread.
+    """
+    global _extend_lock
+    _extend_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_lock_after_fork)
+
+def class_length():
+    """
+    Time a class occupies its teacher.
+
+    Returns:
+        timedelta: CLASS_MINUTES as a timedelta.
+    """
+    return datetime.timedelta(minutes=_settings['class_minutes'])
+
+def horizon(now=None):
+    """
+    How far ahead sessions exist: SCHEDULE_HORIZON_DAYS from now, rounded up to the next Monday
+    so each series is extended at most once a week.
+
+    Args:
+        now (datetime | None): Current time (default: now).
+    Returns:
+        datetime: Midnight of the Monday on or after now + SCHEDULE_HORIZON_DAYS.
+    """
+    day = (now or datetime.datetime.now()).date() + datetime.timedelta(days=_settings['horizon_days'])
+    day += datetime.timedelta(days=-day.weekday() % 7)
+    return datetime.datetime.combine(day, datetime.time.min)
+
+# =============================
+# Recurrence Rules
+# =============================
+def parse_weekdays(values):
+    """
+    Normalize weekday codes.
+
+    Args:
+        values (Iterable[str] | str): Day codes (MO..SU, any case), as a list or a string
+            separated by commas or spaces.
+    Returns:
+        str: Comma-separated codes in week order (empty if no days were given).
+    Raises:
+        ValueError: If a code is unknown.
+    """
+    if isinstance(values, str):
+        values = values.replace(',', ' ').split()
+    codes = {value.strip().upper() for value in values if value.strip()}
+    unknown = codes - set(WEEKDAYS)
+    if unknown:
+        raise ValueError(f"unknown weekday(s) {', '.join(sorted(unknown))} (expected {', '.join(WEEKDAYS)})")
+    return ','.join(code for code in WEEKDAYS if code in codes)
+
+def parse_dates(text):
+    """
+    Parse a list of dates.
+
+    Args:
+        text (str): YYYY-MM-DD dates separated by commas, semicolons or spaces.
+    Returns:
+        list[date]: The dates, sorted and without duplicates.
+    Raises:
+        ValueError: If a date is malformed.
+    """
+    dates = set()
+    for value in (text or '').replace(',', ' ').replace(';', ' ').split():
+        try:
+            dates.add(datetime.date.fromisoformat(value))
+        except ValueError:
+            raise ValueError(f'invalid date {value!r} (expected YYYY-MM-DD)') from None
+    return sorted(dates)
+
+def schedule_fields(teacher_id, title, starts_at, until, interval=1, weekdays=None, exceptions=()):
+    """
+    Validate a series and build its Schedule row.
+
+    Args:
+        teacher_id (int): The teacher.
+        title (str): Class title of every session.
+        starts_at (datetime): First session.
+        until (date): Last day a session may fall on.
+        interval (int): Weeks between repeats (1 weekly, 2 biweekly).
+        weekdays (Iterable[str] | str | None): Day codes; None or empty for the first session's weekday.
+        exceptions (Iterable[date]): Dates without a session.
+    Returns:
+        dict: Schedule fields, ready for Schedule.create() or insert_many().
+    Raises:
+        ValueError: If the title is empty, the interval is not 1 or 2, the dates are out of order
+            or the series is longer than MAX_SCHEDULE_DAYS, or the first session does not fall
+            on one of the weekdays.
+    """
+    if not (title or '').strip():
+        raise ValueError('title is required')
+    interval = int(interval)
+    if interval not in REPEAT_INTERVALS.values():
+        raise ValueError('interval must be 1 (weekly) or 2 (biweekly) weeks')
+    if until < starts_at.date():
+        raise ValueError('the last date is before the first session')
+    if (until - starts_at.date()).days > MAX_SCHEDULE_DAYS:
+        raise ValueError(f'a series may span at most {MAX_SCHEDULE_DAYS} days')
+    codes = parse_weekdays(weekdays or []) or WEEKDAYS[starts_at.weekday()]
+    if WEEKDAYS[starts_at.weekday()] not in codes.split(','):
+        raise ValueError(f'the first session is not on one of the weekdays ({codes})')
+    return {'user': teacher_id, 'title': title.strip(), 'starts_at': starts_at, 'until': until,
+            'interval': interval, 'weekdays': codes,
+            'exceptions': ','.join(day.isoformat() for day in sorted(set(exceptions))),
+            'expanded_until': starts_at}
+
+def occurrences(schedule, start, end):
+    """
+    Session start times of a series in a time range, in order.
+
+    Args:
+        schedule (Schedule): The series (saved or not).
+        start (datetime): Range start (inclusive).
+        end (datetime): Range end (exclusive).
+    Yields:
+        datetime: Session start times.
+    """
+    first = schedule.starts_at
+    days = [WEEKDAYS.index(code) for code in schedule.weekdays.split(',')]
+    skipped = set(parse_dates(schedule.exceptions))
+    week = first.date() - datetime.timedelta(days=first.weekday())
+    if start > first:
+        # Jump to the last repeat week starting on or before the range
+        weeks = (start.date() - week).days // 7
+        week += datetime.timedelta(weeks=weeks - weeks % schedule.interval)
+    while week <= schedule.until:
+        for offset in days:
+            day = week + datetime.timedelta(days=offset)
+            when = datetime.datetime.combine(day, first.time())
+            if when >= end or day > schedule.until:
+                return
+            if when >= first and when >= start and day not in skipped:
+                yield when
+        week += datetime.timedelta(weeks=schedule.interval)
+
+def series_sessions(schedule):
+    """
+    Every session start time of a series.
+
+    Args:
+        schedule (Schedule): The series (saved or not).
+    Returns:
+        list[datetime]: Session start times, in order.
+    """
+    return list(occurrences(schedule, schedule.starts_at, _end_of(schedule)))
+
+def _end_of(schedule):
+    """
+    Time after the last possible session of a series.
+
+    Args:
+        schedule (Schedule): The series.
+    Returns:
+        datetime: Midnight after the series' last date.
+    """
+    return datetime.datetime.combine(schedule.until + datetime.timedelta(days=1), datetime.time.min)
+
+# =============================
+# Double-Booking Check
+# =============================
+def find_conflicts(teacher_id, starts, ignore_class=None, booked=()):
+    """
+    Sessions that would double-book a teacher.
+
+    Args:
+        teacher_id (int): The teacher.
+        starts (Iterable[datetime]): Start times of the new sessions.
+        ignore_class (int | None): Class left out of the check (the class being edited).
+        booked (Iterable[tuple[datetime, str]]): Further (start, title) bookings not in the
+            database yet (e.g. earlier rows of the same import).
+    Returns:
+        list[tuple[datetime, datetime, str]]: (new start, clashing start, clashing title),
+        in order of the new start.
+    """
+    starts = sorted(starts)
+    if not starts:
+        return []
+    length = class_length()
+    low, high = starts[0] - length, starts[-1] + length
+    # Existing classes in range, read through the (user_id, datetime) index over active classes
+    query = Class.select(Class.datetime, Class.title).where(
+        (Class.user == teacher_id) & Class.archived_at.is_null() & (Class.datetime > low) & (Class.datetime < high))
+    if ignore_class is not None:
+        query = query.where(Class.class_id != ignore_class)
+    taken = list(query.tuples())
+    # Sessions of the teacher's series that are not Class rows yet
+    pending = Schedule.select().where((Schedule.user == teacher_id) & Schedule.expanded_until.is_null(False)
+                                      & (Schedule.starts_at < high) & (Schedule.until >= low.date()))
+    for schedule in pending:
+        taken.extend((when, schedule.title)
+                     for when in occurrences(schedule, max(schedule.expanded_until, low), high))
+    taken.extend(booked)
+    taken.sort()
+    times = [when for when, _ in taken]
+    conflicts = []
+    for start in starts:
+        index = bisect_left(times, start - length + datetime.timedelta(microseconds=1))
+        while index < len(times) and times[index] < start + length:
+            conflicts.append((start, times[index], taken[index][1]))
+            index += 1
+    return conflicts
+
+def ensure_available(teacher_id, starts, ignore_class=None, booked=()):
+    """
+    Raise if new sessions would double-book a teacher (see find_conflicts).
+
+    Args:
+        teacher_id (int): The teacher.
+        starts (Iterable[datetime]): Start times of the new sessions.
+        ignore_class (int | None): Class left out of the check (the class being edited).
+        booked (Iterable[tuple[datetime, str]]): Further (start, title) bookings not in the database yet.
+    Raises:
+        ValueError: Naming the first conflicts.
+    """
+    conflicts = find_conflicts(teacher_id, starts, ignore_class, booked)
+    if conflicts:
+        shown = '; '.join(f"{start:%Y-%m-%d %H:%M} clashes with {title!r} at {other:%Y-%m-%d %H:%M}"
+                          for start, other, title in conflicts[:MAX_REPORTED_CONFLICTS])
+        more = len(conflicts) - MAX_REPORTED_CONFLICTS
+        raise ValueError('teacher is already booked: ' + shown + (f' (and {more} more)' if more > 0 else ''))
+
+# =============================
+# Expansion
+# =============================
+def _expand(schedule, through, stamp):
+    """
+    Create a series' sessions from where it was last expanded up to a time.
+    Call inside a transaction.
+
+    Args:
+        schedule (Schedule): The series.
+        through (datetime): Create sessions starting before this time.
+        stamp (dict): Row stamp of the transaction (see services.generation.row_stamp).
+    Returns:
+        int: Number of sessions created.
+    """
+    end = _end_of(schedule)
+    rows = [dict(user=schedule.user_id, title=schedule.title, datetime=when, schedule=schedule.schedule_id, **stamp)
+            for when in occurrences(schedule, schedule.expanded_until, min(through, end))]
+    if rows:
+        first_id = (Class.select(fn.MAX(Class.class_id)).scalar() or 0) + 1
+        for batch in chunked(rows, SQLITE_MAX_VARIABLES // len(rows[0])):
+            # Sessions that already exist (a concurrent expansion) are skipped
+            Class.insert_many(batch).on_conflict_ignore().execute()
+        copy_series_roster(Class.select(Class.class_id).where(Class.class_id >= first_id))
+    schedule.expanded_until = None if through >= end else through
+    Schedule.update(expanded_until=schedule.expanded_until).where(Schedule.schedule_id == schedule.schedule_id).execute()
+    return len(rows)
+
+def create_schedule(teacher_id, title, starts_at, until, interval=1, weekdays=None, exceptions=()):
+    """
+    Create a class series and its sessions up to the horizon in one transaction.
+
+    Args:
+        teacher_id (int): The teacher (an active, non-admin user).
+        title (str): Class title of every session.
+        starts_at (datetime): First session.
+        until (date): Last day a session may fall on.
+        interval (int): Weeks between repeats (1 weekly, 2 biweekly).
+        weekdays (Iterable[str] | str | None): Day codes; None for the first session's weekday.
+        exceptions (Iterable[date]): Dates without a session.
+    Returns:
+        tuple[Schedule, int]: The series and the number of sessions created now.
+    Raises:
+        ValueError: If the series is invalid or has no sessions, the teacher is unknown, or a
+            session would double-book the teacher.
+    """
+    fields = schedule_fields(teacher_id, title, starts_at, until, interval, weekdays, exceptions)
+    # IMMEDIATE takes the write lock before the check, so two series cannot book the same slot
+    with db.atomic('IMMEDIATE'):
+        if not User.select().where((User.user_id == teacher_id) & (User.is_admin == False)
+                                   & User.archived_at.is_null()).exists():
+            raise ValueError(f'unknown teacher {teacher_id!r}')
+        schedule = Schedule(**fields)
+        sessions = series_sessions(schedule)
+        if not sessions:
+            raise ValueError('every session of the series falls on an exception date')
+        ensure_available(teacher_id, sessions)
+        schedule.save()
+        created = _expand(schedule, horizon(), row_stamp(bump_generation()))
+    return schedule, created
+
+def expand_new_schedules(first_id):
+    """
+    Create the sessions of newly inserted series up to the horizon (import hook).
+    Call inside the transaction that inserted them.
+
+    Args:
+        first_id (int): Smallest schedule_id inserted by the current transaction.
+    Returns:
+        int: Number of sessions created.
+    """
+    through = horizon()
+    stamp = row_stamp(bump_generation())
+    return sum(_expand(schedule, through, stamp)
+               for schedule in Schedule.select().where(Schedule.schedule_id >= first_id))
+
+def extend_schedules(through=None, batch_size=BATCH_SIZE):
+    """
+    Create the sessions that have come within the horizon, batch_size series per transaction.
+    Series of archived teachers wait until the teacher is restored.
+
+    Args:
+        through (datetime | None): Create sessions starting before this time (default: horizon()).
+        batch_size (int): Series extended per transaction.
+    Returns:
+        int: Number of sessions created.
+    """
+    through = through or horizon()
+    due = (Schedule
+           .select(Schedule)
+           .join(User, on=(Schedule.user == User.user_id))
+           .where(Schedule.expanded_until.is_null(False) & (Schedule.expanded_until < through)
+                  & User.archived_at.is_null())
+           .order_by(Schedule.schedule_id)
+           .limit(batch_size))
+    if not due.exists():
+        return 0
+    created = 0
+    while True:
+        with db.atomic('IMMEDIATE'):
+            schedules = list(due.clone())  # A fresh query: peewee caches the rows of an executed one
+            if not schedules:
+                return created
+            stamp = row_stamp(bump_generation())
+            created += sum(_expand(schedule, through, stamp) for schedule in schedules)
+
+def forget_teacher_schedules(teacher_id):
+    """
+    Delete a teacher's series (call before the teacher is deleted, after their classes).
+
+    Args:
+        teacher_id (int): The teacher's user ID.
+    """
+    Schedule.delete().where(Schedule.user == teacher_id).execute()
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create the class series sessions that are due.')
+    parser.add_argument('action', choices=['extend'])
+    parser.add_argument('--days', type=int, default=DEFAULT_SCHEDULE_HORIZON_DAYS,
+                        help='Create sessions up to this many days ahead (rounded up to a Monday)')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    _settings['horizon_days'] = args.days
+    db.connect()
+    print('Sessions created:', extend_schedules())
+    db.close()
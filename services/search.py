@@ -0,0 +1,281 @@
+"""
+Full-text search for the GroupProject Flask app.
+Prefix search over student names and emails, teacher usernames and class titles, backed by an
+SQLite FTS5 index (SearchEntry) that triggers keep in step with the Student, User and Class tables.
+
+A typeahead lookup matches every typed word as a prefix ("dav mal" finds "David Malínek"),
+reads at most CANDIDATE_LIMIT matches from the index and ranks those: labels starting with
+the query first, then labels containing every word, then rows matched only by email, shorter
+labels first within each group. Prefixes of 2 to 8 characters are answered from FTS5 prefix
+indexes, so a lookup never scans a table and a very common prefix costs no more than a rare
+one. (FTS5's bm25() is not used: it counts every match of each word, which for a common
+prefix costs more than the rest of the lookup.) When more than CANDIDATE_LIMIT rows match,
+the ranking only considers the oldest CANDIDATE_LIMIT of them; typing more narrows it.
+Archived rows stay in the index and are dropped when the best entries are resolved.
+
+Usage:
+    python -m services.search [--database PATH]            Rebuild the search index
+    python -m services.search [--database PATH] QUERY      Print the results for a query
+"""
+
+from peewee import OP, Expression
+from models import db, configure_database, User, Student, Class, SearchEntry
+import argparse
+import re
+import unicodedata
+
+# Kind of row an index entry points at; entry rowid = primary key * KIND_SLOTS + kind code
+KINDS = {'student': 1, 'user': 2, 'class': 3}
+KIND_SLOTS = 4
+# Result kinds a lookup can be limited to (users are returned as teachers; admins are skipped)
+SEARCH_KINDS = ('student', 'teacher', 'class')
+
+DEFAULT_SEARCH_LIMIT = 8
+MAX_SEARCH_LIMIT = 25
+# Matches read from the index and ranked per lookup
+CANDIDATE_LIMIT = 200
+# Shorter words are ignored (no prefix index; a one-letter prefix matches most of the index)
+MIN_TERM_LENGTH = 2
+MAX_TERMS = 6
+
+# Triggers mirroring inserts, updates and deletes into the index (rowid lookups only);
+# the rowids follow KINDS and KIND_SLOTS
+TRIGGERS = {
+    'search_student_insert': '''
+        AFTER INSERT ON "student" BEGIN
+            INSERT INTO "search_index" ("rowid", "name", "detail")
+            VALUES (new."student_id" * 4 + 1, new."name", new."email");
+        END''',
+    'search_student_update': '''
+        AFTER UPDATE OF "name", "email" ON "student" BEGIN
+            UPDATE "search_index" SET "name" = new."name", "detail" = new."email"
+            WHERE "rowid" = old."student_id" * 4 + 1;
+        END''',
+    'search_student_delete': '''
+        AFTER DELETE ON "student" BEGIN
+            DELETE FROM "search_index" WHERE "rowid" = old."student_id" * 4 + 1;
+        END''',
+    'search_user_insert': '''
+        AFTER INSERT ON "user" BEGIN
+            INSERT INTO "search_index" ("rowid", "name") VALUES (new."user_id" * 4 + 2, new."username");
+        END''',
+    'search_user_update': '''
+        AFTER UPDATE OF "username" ON "user" BEGIN
+            UPDATE "search_index" SET "name" = new."username" WHERE "rowid" = old."user_id" * 4 + 2;
+        END''',
+    'search_user_delete': '''
+        AFTER DELETE ON "user" BEGIN
+            DELETE FROM "search_index" WHERE "rowid" = old."user_id" * 4 + 2;
+        END''',
+    'search_class_insert': '''
+        AFTER INSERT ON "class" BEGIN
+            INSERT INTO "search_index" ("rowid", "name") VALUES (new."class_id" * 4 + 3, new."title");
+        END''',
+    'search_class_update': '''
+        AFTER UPDATE OF "title" ON "class" BEGIN
+            UPDATE "search_index" SET "name" = new."title" WHERE "rowid" = old."class_id" * 4 + 3;
+        END''',
+    'search_class_delete': '''
+        AFTER DELETE ON "class" BEGIN
+            DELETE FROM "search_index" WHERE "rowid" = old."class_id" * 4 + 3;
+        END''',
+}
+
+# =============================
+# Index Maintenance
+# =============================
+def create_search_triggers():
+    """
+    Create the triggers that keep the search index in step with its source tables.
+    """
+    for name, body in TRIGGERS.items():
+        db.execute_sql(f'CREATE TRIGGER IF NOT EXISTS "{name}" {body}')
+
+def rebuild_search_index():
+    """
+    Recompute the whole search index from Student, User and Class, then merge its segments.
+
+    Returns:
+        int: Number of index entries.
+    """
+    with db.atomic():
+        db.execute_sql('DELETE FROM "search_index"')
+        db.execute_sql('INSERT INTO "search_index" ("rowid", "name", "detail") '
+                       'SELECT "student_id" * 4 + 1, "name", "email" FROM "student"')
+        db.execute_sql('INSERT INTO "search_index" ("rowid", "name") '
+                       'SELECT "user_id" * 4 + 2, "username" FROM "user"')
+        db.execute_sql('INSERT INTO "search_index" ("rowid", "name") '
+                       'SELECT "class_id" * 4 + 3, "title" FROM "class"')
+        db.execute_sql('INSERT INTO "search_index" ("search_index") VALUES (\'optimize\')')
+    return SearchEntry.select().count()
+
+# =============================
+# Lookups
+# =============================
+def _fold(text):
+    """
+    Lower-case text without accents, as the index tokenizer sees it.
+
+    Args:
+        text (str): Text.
+    Returns:
+        str: Folded text.
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def _terms(text):
+    """
+    Words of the text that are searched for.
+
+    Args:
+        text (str): What the user typed.
+    Returns:
+        list[str]: Folded words of at least MIN_TERM_LENGTH characters (at most MAX_TERMS).
+    """
+    return [t for t in re.findall(r'\w+', _fold(text)) if len(t) >= MIN_TERM_LENGTH][:MAX_TERMS]
+
+def match_expression(text):
+    """
+    FTS5 query matching every word of the text as a prefix.
+
+    Args:
+        text (str): What the user typed.
+    Returns:
+        str | None: The MATCH expression, or None if no word is long enough to search for.
+    """
+    terms = _terms(text)
+    if not terms:
+        return None
+    # Quoted, so words like AND/NOT/NEAR are searched for instead of parsed as operators
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def _rank(label, typed, terms):
+    """
+    Sort key of a result: labels starting with the query, then labels containing every
+    word as a prefix, then the rest (matched by email); shorter labels first.
+
+    Args:
+        label (str): Result label.
+        typed (str): Folded query, with runs of whitespace collapsed.
+        terms (list[str]): Folded query words.
+    Returns:
+        tuple: Sort key (lower is better).
+    """
+    folded = _fold(label)
+    words = re.findall(r'\w+', folded)
+    if folded.startswith(typed):
+        group = 0
+    elif all(any(word.startswith(term) for word in words) for term in terms):
+        group = 1
+    else:
+        group = 2
+    return group, len(label), folded
+
+def search_kinds(value):
+    """
+    Parse a comma-separated list of result kinds.
+
+    Args:
+        value (str | None): E.g. 'student,class'; empty or None for all kinds.
+    Returns:
+        tuple[str, ...]: Kinds from SEARCH_KINDS.
+    Raises:
+        ValueError: If an unknown kind is given.
+    """
+    kinds = tuple(dict.fromkeys(k.strip() for k in (value or '').split(',') if k.strip()))
+    unknown = [k for k in kinds if k not in SEARCH_KINDS]
+    if unknown:
+        raise ValueError(f"unknown kind(s): {', '.join(unknown)}")
+    return kinds or SEARCH_KINDS
+
+def _resolve(entries):
+    """
+    Turn index entries into results: skip admins and archived rows, add each class's time and teacher.
+
+    Args:
+        entries (list[tuple]): (rowid, name, detail) rows from the index.
+    Returns:
+        list[dict]: kind, id, label and detail per result, in the order of the entries.
+    """
+    ids = {code: [rowid // KIND_SLOTS for rowid, _, _ in entries if rowid % KIND_SLOTS == code]
+           for code in KINDS.values()}
+    # Primary key lookups for the rows among the entries
+    students = set()
+    if ids[KINDS['student']]:
+        students = {s for (s,) in Student.select(Student.student_id)
+                    .where(Student.student_id.in_(ids[KINDS['student']]) & Student.archived_at.is_null()).tuples()}
+    teachers = set()
+    if ids[KINDS['user']]:
+        teachers = {u for (u,) in User.select(User.user_id)
+                    .where(User.user_id.in_(ids[KINDS['user']]) & (User.is_admin == False)
+                           & User.archived_at.is_null()).tuples()}
+    sessions = {}
+    if ids[KINDS['class']]:
+        sessions = {class_id: f"{when:%Y-%m-%d %H:%M} · {username}" for class_id, when, username in
+                    Class.select(Class.class_id, Class.datetime, User.username)
+                    .join(User, on=(Class.user == User.user_id))
+                    .where(Class.class_id.in_(ids[KINDS['class']]) & Class.archived_at.is_null()).tuples()}
+    results = []
+    for rowid, name, detail in entries:
+        kind, row_id = rowid % KIND_SLOTS, rowid // KIND_SLOTS
+        if kind == KINDS['student'] and row_id in students:
+            results.append({'kind': 'student', 'id': row_id, 'label': name, 'detail': detail})
+        elif kind == KINDS['user'] and row_id in teachers:
+            results.append({'kind': 'teacher', 'id': row_id, 'label': name, 'detail': None})
+        elif kind == KINDS['class'] and row_id in sessions:
+            results.append({'kind': 'class', 'id': row_id, 'label': name, 'detail': sessions[row_id]})
+    return results
+
+def search(text, kinds=SEARCH_KINDS, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Ranked typeahead results for a query.
+
+    Args:
+        text (str): What the user typed.
+        kinds (Iterable[str]): Result kinds from SEARCH_KINDS.
+        limit (int): Maximum number of results.
+    Returns:
+        list[dict]: Best results first, with kind ('student', 'teacher' or 'class'), id
+        (primary key), label (name, username or title) and detail (email, or class time and teacher).
+    """
+    terms = _terms(text)
+    if not terms:
+        return []
+    codes = {KINDS['user'] if kind == 'teacher' else KINDS[kind] for kind in kinds}
+    query = (SearchEntry
+             .select(SearchEntry.rowid, SearchEntry.name, SearchEntry.detail)
+             .where(SearchEntry.match(match_expression(text))))
+    if len(codes) < len(KINDS):
+        # (Field % x is peewee's GLOB operator, hence the explicit modulo expression)
+        query = query.where(Expression(SearchEntry.rowid, OP.MOD, KIND_SLOTS).in_(sorted(codes)))
+    typed = ' '.join(_fold(text).split())
+    ranked = sorted(query.limit(CANDIDATE_LIMIT).tuples(), key=lambda entry: _rank(entry[1], typed, terms))
+    # Only the best entries are resolved; more are taken if admins or archived rows were skipped
+    results = []
+    for start in range(0, len(ranked), limit):
+        results.extend(_resolve(ranked[start:start + limit]))
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+# =============================
+# Command Line Entry Point
+# =============================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild or query the search index.')
+    parser.add_argument('query', nargs='?', help='Search for this text instead of rebuilding')
+    parser.add_argument('--database', default=None, help='Database file (default: classesApp.db)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_SEARCH_LIMIT)
+    args = parser.parse_args()
+    if args.database:
+        configure_database(args.database)
+    db.connect()
+    if args.query is None:
+        print('Rebuilt search index:', rebuild_search_index(), 'entries')
+    else:
+        for result in search(args.query, limit=args.limit):
+            print(f"{result['kind']:<8}{result['id']:>8}  {result['label']}  {result['detail'] or ''}")
+    db.close()
@@ -0,0 +1,319 @@
+"""
+Attendance statistics queries for the GroupProject Flask app.
+Builds the per-class and per-student attendance figures used by the analytics dashboard
+and the totals shown on the admin dashboard.
+
+Every function here runs a single query, so the number of SQLite round trips stays fixed
+no matter how many classes or students exist. Attendance counts are read from the
+materialized counter tables (see services/counters.py), so each query costs O(rows returned)
+rather than an aggregation over the whole Attendance table.
+
+These functions form the 'sql' analytics engine. ANALYTICS_ENGINE = 'numpy' selects the
+columnar engine in services/columnar.py instead; routes get the selected one from
+analytics_engine(), and verify_engine() checks that both give the same results.
+"""
+
+from peewee import JOIN, Case, fn
+from models import User, Student, Class, Enrollment, ClassStats, StudentStats, StudentTeacherStats
+from services.columnar import PERCENTILES, columnar_stats, numpy_available, rate
+import datetime
+import logging
+import math
+import types
+
+logger = logging.getLogger('classesapp.stats')
+
+DEFAULT_ANALYTICS_ENGINE = 'sql'
+ANALYTICS_ENGINES = ('sql', 'numpy')
+
+_settings = {'engine': DEFAULT_ANALYTICS_ENGINE}
+
+# =============================
+# Class Statistics
+# =============================
+def class_stats_query(teacher_id=None):
+    """
+    Query behind class_stats (unordered, so it can also be keyset-paginated by class_id).
+
+    Args:
+        teacher_id (int | None): Only include classes taught by this user. None for all classes.
+    Returns:
+        ModelSelect: Dict rows with class_id, title, datetime, teacher, total and attended keys.
+    """
+    query = (Class
+             .select(Class.class_id, Class.title, Class.datetime, User.username.alias('teacher'),
+                     fn.COALESCE(ClassStats.total, 0).alias('total'),
+                     fn.COALESCE(ClassStats.attended, 0).alias('attended'))
+             .join(User, on=(Class.user == User.user_id))
+             .switch(Class)
+             .join(ClassStats, JOIN.LEFT_OUTER, on=(ClassStats.class_ref == Class.class_id))
+             .where(Class.archived_at.is_null())
+             .dicts())
+    if teacher_id is not None:
+        query = query.where(Class.user == teacher_id)
+    return query
+
+def class_stats_row(c, now, with_teacher):
+    """
+    Format a class_stats_query row as a class_stats entry.
+
+    Args:
+        c (dict): Query row.
+        now (datetime.datetime): Reference time for the is_future flag.
+        with_teacher (bool): Include the teacher's username.
+    Returns:
+        dict: title, date, total, attended and is_future (and teacher) keys.
+    """
+    row = {
+        'title': c['title'],
+        'date': c['datetime'].strftime('%Y-%m-%d'),
+        'total': c['total'],
+        'attended': c['attended'],
+        'is_future': c['datetime'] >= now
+    }
+    if with_teacher:
+        row['teacher'] = c['teacher']
+    return row
+
+def class_stats(teacher_id=None, now=None):
+    """
+    Per-class attendance totals of active classes, optionally limited to one teacher's classes.
+
+    Args:
+        teacher_id (int | None): Only include classes taught by this user. None for all classes.
+        now (datetime.datetime | None): Reference time for the is_future flag (defaults to now).
+    Returns:
+        list[dict]: One dict per class with title, date, total, attended and is_future keys,
+        plus teacher (username) when teacher_id is None.
+    """
+    now = now or datetime.datetime.now()
+    query = class_stats_query(teacher_id).order_by(Class.class_id)
+    return [class_stats_row(c, now, teacher_id is None) for c in query]
+
+def next_class_start(teacher_id=None, now=None):
+    """
+    Start of the next active class, i.e. the next time an is_future flag in class_stats changes.
+
+    Args:
+        teacher_id (int | None): Only consider classes taught by this user. None for all classes.
+        now (datetime.datetime | None): Reference time (defaults to now).
+    Returns:
+        datetime.datetime | None: Start time, or None if no class is upcoming.
+    """
+    now = now or datetime.datetime.now()
+    query = Class.select(fn.MIN(Class.datetime)).where(Class.archived_at.is_null() & (Class.datetime >= now))
+    if teacher_id is not None:
+        query = query.where(Class.user == teacher_id)
+    return Class.datetime.python_value(query.scalar())
+
+# =============================
+# Student Statistics
+# =============================
+def student_stats_query(teacher_id=None):
+    """
+    Query behind student_stats (unordered, so it can also be keyset-paginated by student_id).
+
+    Args:
+        teacher_id (int | None): Only count attendance in classes taught by this user. None for all classes.
+    Returns:
+        ModelSelect: Dict rows with student_id, name, email and attended keys.
+    """
+    if teacher_id is None:
+        counts = StudentStats
+        on = (StudentStats.student == Student.student_id)
+    else:
+        # Join condition (not WHERE) keeps students with no classes by this teacher in the result
+        counts = StudentTeacherStats
+        on = ((StudentTeacherStats.student == Student.student_id) & (StudentTeacherStats.teacher == teacher_id))
+    query = (Student
+             .select(Student.student_id, Student.name, Student.email,
+                     fn.COALESCE(counts.attended, 0).alias('attended'))
+             .join(counts, JOIN.LEFT_OUTER, on=on)
+             .where(Student.archived_at.is_null())
+             .dicts())
+    if teacher_id is not None:
+        enrolled = (Enrollment
+                    .select(Enrollment.student)
+                    .join(Class, on=(Enrollment.class_ref == Class.class_id))
+                    .where((Class.user == teacher_id) & Class.archived_at.is_null()))
+        query = query.where(Student.student_id.in_(enrolled))
+    return query
+
+def student_stats_row(s):
+    """
+    Format a student_stats_query row as a student_stats entry.
+
+    Args:
+        s (dict): Query row.
+    Returns:
+        dict: name, email, attended and student_id keys.
+    """
+    return {
+        'name': s['name'],
+        'email': s['email'],
+        'attended': s['attended'],
+        'student_id': s['student_id']
+    }
+
+def student_stats(teacher_id=None):
+    """
+    Per-student count of attended classes, optionally limited to one teacher's classes.
+
+    Only active students are listed; for a teacher, only those enrolled in at least one of
+    their active classes.
+
+    Args:
+        teacher_id (int | None): Only count attendance in classes taught by this user. None for all classes.
+    Returns:
+        list[dict]: One dict per student with name, email, attended and student_id keys.
+    """
+    return [student_stats_row(s) for s in student_stats_query(teacher_id).order_by(Student.student_id)]
+
+# =============================
+# Teacher Statistics
+# =============================
+def teacher_stats():
+    """
+    Per-teacher class count and attendance totals (active teachers and classes).
+
+    Returns:
+        list[dict]: One dict per teacher with teacher_id, teacher, classes, total, attended
+        and rate keys, ordered by teacher_id.
+    """
+    query = (User
+             .select(User.user_id, User.username,
+                     fn.COUNT(Class.class_id).alias('classes'),
+                     fn.COALESCE(fn.SUM(ClassStats.total), 0).alias('total'),
+                     fn.COALESCE(fn.SUM(ClassStats.attended), 0).alias('attended'))
+             .join(Class, JOIN.LEFT_OUTER, on=((Class.user == User.user_id) & Class.archived_at.is_null()))
+             .join(ClassStats, JOIN.LEFT_OUTER, on=(ClassStats.class_ref == Class.class_id))
+             .where((User.is_admin == False) & User.archived_at.is_null())
+             .group_by(User.user_id)
+             .order_by(User.user_id))
+    return [{
+        'teacher_id': t['user_id'],
+        'teacher': t['username'],
+        'classes': t['classes'],
+        'total': t['total'],
+        'attended': t['attended'],
+        'rate': rate(t['attended'], t['total'])
+    } for t in query.dicts()]
+
+# =============================
+# Distributions
+# =============================
+def percentiles(values, points=PERCENTILES):
+    """
+    Linear-interpolation percentiles (the same method as numpy.percentile's default).
+
+    Args:
+        values (Iterable[float]): Values.
+        points (tuple[int]): Percentiles to compute.
+    Returns:
+        dict[str, float | None]: 'p10'... -> value rounded to 4 places (None if there are no values).
+    """
+    values = sorted(values)
+    if not values:
+        return {f'p{p}': None for p in points}
+    result = {}
+    for p in points:
+        k = (len(values) - 1) * p / 100
+        low = math.floor(k)
+        high = min(low + 1, len(values) - 1)
+        result[f'p{p}'] = round(values[low] + (values[high] - values[low]) * (k - low), 4)
+    return result
+
+def attendance_distribution(teacher_id=None, now=None):
+    """
+    Percentiles of past classes' attendance rates and of students' attended counts.
+
+    Args:
+        teacher_id (int | None): Only include this teacher's classes and students.
+        now (datetime.datetime | None): Boundary between past and upcoming classes (defaults to now).
+    Returns:
+        dict: class_rate and student_attended, each mapping 'p10'... to a value (None if empty).
+    """
+    classes = class_stats(teacher_id, now)
+    rates = [c['attended'] / c['total'] for c in classes if not c['is_future'] and c['total']]
+    counts = [s['attended'] for s in student_stats(teacher_id)]
+    return {'class_rate': percentiles(rates), 'student_attended': percentiles(counts)}
+
+# =============================
+# Dashboard Totals
+# =============================
+def dashboard_counts(now=None):
+    """
+    Totals of active classes, teachers and students shown on the admin dashboard, in a single query.
+
+    Args:
+        now (datetime.datetime | None): Boundary between past and upcoming classes (defaults to now).
+    Returns:
+        dict: total_classes_upcoming, total_classes_past, total_teachers and total_students.
+    """
+    now = now or datetime.datetime.now()
+    upcoming = fn.COALESCE(fn.SUM(Case(None, [(Class.datetime >= now, 1)], 0)), 0)
+    past = fn.COALESCE(fn.SUM(Case(None, [(Class.datetime < now, 1)], 0)), 0)
+    teachers = User.select(fn.COUNT(User.user_id)).where((User.is_admin == False) & User.archived_at.is_null())
+    students = Student.select(fn.COUNT(Student.student_id)).where(Student.archived_at.is_null())
+    return (Class
+            .select(upcoming.alias('total_classes_upcoming'),
+                    past.alias('total_classes_past'),
+                    teachers.alias('total_teachers'),
+                    students.alias('total_students'))
+            .where(Class.archived_at.is_null())
+            .dicts()
+            .get())
+
+# =============================
+# Engine Selection
+# =============================
+# The SQL engine: the functions above, under the same names as ColumnarStats methods
+sql_stats = types.SimpleNamespace(name='sql', class_stats=class_stats, student_stats=student_stats,
+                                  teacher_stats=teacher_stats, attendance_distribution=attendance_distribution)
+
+def init_app(app):
+    """
+    Select the analytics engine from app.config (ANALYTICS_ENGINE: 'sql' or 'numpy').
+    Falls back to 'sql' with a warning if numpy is not installed.
+
+    Args:
+        app (Flask): The application.
+    Raises:
+        ValueError: If ANALYTICS_ENGINE is not a known engine.
+    """
+    engine = app.config.get('ANALYTICS_ENGINE', DEFAULT_ANALYTICS_ENGINE)
+    if engine not in ANALYTICS_ENGINES:
+        raise ValueError(f"ANALYTICS_ENGINE must be one of: {', '.join(ANALYTICS_ENGINES)}")
+    if engine == 'numpy' and not numpy_available():
+        logger.warning('ANALYTICS_ENGINE is numpy but numpy is not installed; using the SQL engine')
+        engine = 'sql'
+    _settings['engine'] = engine
+
+def analytics_engine():
+    """
+    The selected analytics engine.
+
+    Returns:
+        object: Provides class_stats, student_stats, teacher_stats and attendance_distribution.
+    """
+    return columnar_stats if _settings['engine'] == 'numpy' else sql_stats
+
+def verify_engine(now=None):
+    """
+    Compare the columnar engine with the SQL engine for all classes and every teacher.
+
+    Args:
+        now (datetime.datetime | None): Reference time used by both engines (defaults to now).
+    Returns:
+        list[str]: One message per statistic that differs (empty if all match).
+    """
+    now = now or datetime.datetime.now()
+    columnar_stats.clear()
+    checks = [('teacher_stats', lambda e: e.teacher_stats())]
+    for teacher_id in [None] + [t['teacher_id'] for t in teacher_stats()]:
+        checks += [
+            (f'class_stats({teacher_id})', lambda e, t=teacher_id: e.class_stats(t, now)),
+            (f'student_stats({teacher_id})', lambda e, t=teacher_id: e.student_stats(t)),
+            (f'attendance_distribution({teacher_id})', lambda e, t=teacher_id: e.attendance_distribution(t, now)),
+        ]
+    return [f'{name} differs' for name, compute in checks if compute(sql_stats) != compute(columnar_stats)]
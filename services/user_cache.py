@@ -0,0 +1,170 @@
+"""
+In-process user cache for the GroupProject Flask app.
+Backs the Flask-Login user loader so authenticated requests do not query the User table.
+
+Entries are immutable snapshots of a User (no password hash), evicted least-recently-used
+once the cache is full and reloaded after a time-to-live. Routes that modify, archive or
+delete a user must call user_cache.invalidate(user_id).
+
+The cache is per process: invalidate() only reaches the worker that handled the change, so
+other gunicorn workers keep serving the old snapshot (e.g. an archived teacher stays logged
+in) for up to USER_CACHE_TTL seconds. Lower USER_CACHE_TTL if that window is too long.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from flask_login import UserMixin
+from models import User
+import threading
+import time
+
+DEFAULT_USER_CACHE_SIZE = 1024
+DEFAULT_USER_CACHE_TTL = 60  # seconds
+
+# =============================
+# User Snapshot
+# =============================
+@dataclass(frozen=True)
+class UserSnapshot(UserMixin):
+    """
+    Read-only copy of the User fields needed while handling a request.
+
+    Attributes:
+        user_id (int): Primary key.
+        username (str): Login username.
+        is_admin (bool): True for admin, False for teacher.
+    """
+    user_id: int
+    username: str
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user):
+        """
+        Snapshot a User row.
+
+        Args:
+            user (User): The user model instance.
+        Returns:
+            UserSnapshot: Immutable copy of the user.
+        """
+        return cls(user_id=user.user_id, username=user.username, is_admin=user.is_admin)
+
+    def get_id(self):
+        """
+        Returns the user ID as a string (required by Flask-Login).
+
+        Returns:
+            str: User ID.
+        """
+        return str(self.user_id)
+
+# =============================
+# LRU/TTL Cache
+# =============================
+class UserCache:
+    """
+    Thread-safe LRU cache of UserSnapshot objects keyed by user_id, with a TTL.
+
+    Attributes:
+        maxsize (int): Maximum number of cached users.
+        ttl (float): Seconds before an entry is reloaded from the database.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that queried the database.
+    """
+
+    def __init__(self, maxsize=DEFAULT_USER_CACHE_SIZE, ttl=DEFAULT_USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> (expires_at, snapshot)
+        # Bumped by invalidate() (per user) and clear() (all users), so a load that raced
+        # with an invalidation does not store its stale snapshot
+        self._invalidations = {}  # user_id -> count
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=DEFAULT_USER_CACHE_SIZE, ttl=DEFAULT_USER_CACHE_TTL):
+        """
+        Change the cache limits and drop all entries.
+
+        Args:
+            maxsize (int): Maximum number of cached users (0 disables caching).
+            ttl (float): Seconds before an entry is reloaded from the database.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._entries.clear()
+            self._epoch += 1
+
+    def get(self, user_id):
+        """
+        Return the snapshot for user_id, loading it from the database on a miss.
+
+        Args:
+            user_id (int | str): The user's primary key.
+        Returns:
+            UserSnapshot | None: The user, or None if it does not exist or is archived.
+        """
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            loaded_at = (self._epoch, self._invalidations.get(user_id, 0))
+        user = User.get_or_none(User.user_id == user_id, User.archived_at.is_null())
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        with self._lock:
+            current = (self._epoch, self._invalidations.get(user_id, 0))
+            if self.maxsize > 0 and current == loaded_at:
+                self._entries[user_id] = (now + self.ttl, snapshot)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        """
+        Drop a user from the cache (call after the user is modified or deleted).
+
+        Args:
+            user_id (int | str): The user's primary key.
+        """
+        user_id = int(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidations[user_id] = self._invalidations.get(user_id, 0) + 1
+
+    def clear(self):
+        """
+        Drop every cached user.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self):
+        """
+        Cache counters for monitoring.
+
+        Returns:
+            dict: hits, misses, size and maxsize.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+# Shared cache used by app.load_user
+user_cache = UserCache()
@@ -0,0 +1,177 @@
+"""
+Rendered-view cache for the GroupProject Flask app.
+Serves the analytics and dashboard pages without recomputing them until data changes.
+
+Pages are cached per (endpoint, role, user_id, query string) together with the data
+generation (services/generation.py) they were rendered at. Every write that changes what the
+pages show bumps the generation, so the next request renders afresh. Entries also expire
+after a time-to-live, because the dashboards split classes into past and upcoming by the
+current time. The cache is bounded by entry count and total body size (least-recently-used
+entries are evicted first), and responses carry an ETag so browsers can revalidate with 304.
+"""
+
+from collections import OrderedDict
+from flask import request, make_response
+from flask_login import current_user
+from services.generation import current_generation
+import functools
+import hashlib
+import threading
+import time
+
+DEFAULT_VIEW_CACHE_SIZE = 256
+DEFAULT_VIEW_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_VIEW_CACHE_TTL = 30  # seconds
+
+# =============================
+# LRU Cache
+# =============================
+class ViewCache:
+    """
+    Thread-safe LRU cache of rendered page bodies, bounded by entry count and total size.
+
+    Attributes:
+        maxsize (int): Maximum number of cached pages.
+        max_bytes (int): Maximum total size of cached bodies.
+        ttl (float): Seconds before a page is rendered again even if the data did not change.
+        hits (int): Requests answered from the cache.
+        misses (int): Requests that rendered the page.
+    """
+
+    def __init__(self, maxsize=DEFAULT_VIEW_CACHE_SIZE, max_bytes=DEFAULT_VIEW_CACHE_MAX_BYTES,
+                 ttl=DEFAULT_VIEW_CACHE_TTL):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (generation, expires_at, etag, mimetype, body)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=DEFAULT_VIEW_CACHE_SIZE, max_bytes=DEFAULT_VIEW_CACHE_MAX_BYTES,
+                  ttl=DEFAULT_VIEW_CACHE_TTL):
+        """
+        Change the cache limits and drop all entries.
+
+        Args:
+            maxsize (int): Maximum number of cached pages (0 disables caching).
+            max_bytes (int): Maximum total size of cached bodies.
+            ttl (float): Seconds before a page is rendered again.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self.max_bytes = max_bytes
+            self.ttl = ttl
+            self._entries.clear()
+            self._bytes = 0
+
+    def get(self, key, generation):
+        """
+        Return a cached page if it was rendered at this generation and has not expired.
+
+        Args:
+            key (tuple): Cache key.
+            generation (int): Current data generation.
+        Returns:
+            tuple[str, str, bytes] | None: (etag, mimetype, body), or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2:]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, mimetype, body):
+        """
+        Store a rendered page, evicting least-recently-used pages to stay within the limits.
+
+        Args:
+            key (tuple): Cache key.
+            generation (int): Data generation the page was rendered at.
+            mimetype (str): Response mimetype.
+            body (bytes): Response body.
+        Returns:
+            str: The page's ETag.
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if self.maxsize <= 0 or len(body) > self.max_bytes:
+                return etag
+            self._remove(key)
+            self._entries[key] = (generation, time.monotonic() + self.ttl, etag, mimetype, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return etag
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[4])
+
+    def clear(self):
+        """
+        Drop every cached page.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Cache counters for monitoring.
+
+        Returns:
+            dict: hits, misses, size, bytes and limits.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'bytes': self._bytes, 'maxsize': self.maxsize, 'max_bytes': self.max_bytes}
+
+# Shared cache used by the cached_view decorator
+view_cache = ViewCache()
+
+# =============================
+# View Decorator
+# =============================
+def cached_view(view):
+    """
+    Cache a GET view's rendered page per endpoint, role, user and query string.
+
+    Apply below @login_required. Only successful, non-streamed responses are stored; a view
+    that aborts (e.g. 403 for the wrong role) is never cached for that user.
+
+    Args:
+        view (Callable): The Flask view function.
+    Returns:
+        Callable: The wrapped view.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+        key = (request.endpoint, 'admin' if current_user.is_admin else 'teacher',
+               current_user.user_id, request.query_string)
+        generation = current_generation()
+        entry = view_cache.get(key, generation)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            etag = view_cache.put(key, generation, response.mimetype, response.get_data())
+        else:
+            etag, mimetype, body = entry
+            response = make_response(body)
+            response.mimetype = mimetype
+        response.set_etag(etag)
+        # Per-user page: browsers may keep it but must revalidate before reuse
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
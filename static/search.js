@@ -0,0 +1,83 @@
+// Typeahead for the admin dashboard search box (results from /admin/search).
+// Requests are debounced, superseded requests are aborted, and answers are kept per query.
+(function () {
+    const input = document.getElementById('admin-search');
+    const list = document.getElementById('admin-search-results');
+    if (!input || !list) {
+        return;
+    }
+    const DEBOUNCE_MS = 150;
+    const MIN_LENGTH = 2;
+    const LABELS = {student: 'Student', teacher: 'Teacher', class: 'Class'};
+    const answers = new Map();
+    let timer = null;
+    let pending = null;
+
+    function render(results) {
+        list.replaceChildren();
+        for (const result of results) {
+            const item = document.createElement('a');
+            item.className = 'list-group-item list-group-item-action';
+            item.href = result.url;
+            const badge = document.createElement('span');
+            badge.className = 'badge bg-secondary me-2';
+            badge.textContent = LABELS[result.kind] || result.kind;
+            const label = document.createElement('span');
+            label.textContent = result.label;
+            item.append(badge, label);
+            if (result.detail) {
+                const detail = document.createElement('small');
+                detail.className = 'text-muted ms-2';
+                detail.textContent = result.detail;
+                item.append(detail);
+            }
+            list.append(item);
+        }
+    }
+
+    async function lookup(query) {
+        if (answers.has(query)) {
+            render(answers.get(query));
+            return;
+        }
+        if (pending) {
+            pending.abort();
+        }
+        pending = new AbortController();
+        try {
+            const response = await fetch(input.dataset.url + '?q=' + encodeURIComponent(query),
+                                         {signal: pending.signal, headers: {Accept: 'application/json'}});
+            if (!response.ok) {
+                return;
+            }
+            const body = await response.json();
+            answers.set(query, body.results);
+            if (input.value.trim() === query) {
+                render(body.results);
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                throw error;
+            }
+        }
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (query.length < MIN_LENGTH) {
+            list.replaceChildren();
+            return;
+        }
+        timer = setTimeout(function () { lookup(query); }, DEBOUNCE_MS);
+    });
+    input.addEventListener('keydown', function (event) {
+        const first = list.querySelector('a');
+        if (event.key === 'Enter' && first) {
+            event.preventDefault();
+            window.location = first.href;
+        } else if (event.key === 'Escape') {
+            list.replaceChildren();
+        }
+    });
+})();
@@ -0,0 +1,9 @@
+"""
+Pytest configuration for the GroupProject Flask app tests.
+Puts the project root on sys.path so the tests import the app modules however pytest is invoked.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
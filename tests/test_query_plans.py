@@ -0,0 +1,21 @@
+"""
+Query-plan regression test for the GroupProject Flask app.
+Fails when a hot query (dashboards, attendance sheets, student profile) falls back to a full table scan.
+"""
+
+from migrations import check_query_plans, migrate
+from models import configure_database, db
+import pytest
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """A freshly migrated database file; the default database is restored afterwards."""
+    configure_database(str(tmp_path / 'plans.db'))
+    db.connect()
+    migrate()
+    yield db
+    db.close()
+    configure_database()
+
+def test_hot_queries_use_indexes(scratch_db):
+    assert check_query_plans() == []
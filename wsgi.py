@@ -0,0 +1,15 @@
+"""
+WSGI entry point for the GroupProject Flask app.
+
+Point a production WSGI server at wsgi:app after running the one-time init command:
+
+    flask --app app init-db
+    gunicorn -c gunicorn.conf.py wsgi:app          # pre-fork workers x threads (see gunicorn.conf.py)
+    waitress-serve --threads 8 wsgi:app            # single process, threaded (e.g. on Windows)
+
+Settings are read from the file named by CLASSESAPP_SETTINGS (see app.create_app).
+"""
+
+from app import create_app
+
+app = create_app()